@@ -0,0 +1,101 @@
+# (C) 2018 The University of Chicago
+# See COPYRIGHT in top-level directory.
+"""
+Serialization of numpy arrays as SDSKV values. A value starts with a header
+holding the dtype, the shape and the memory order (C or Fortran) of the array,
+padded to a multiple of 64 bytes, followed by the raw content of the array.
+Since the content is contiguous, the strides follow from the shape, the dtype
+and the memory order. Decoding returns an array viewing the value's memory.
+"""
+import ast
+import struct
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+MAGIC = b'SKVA'
+VERSION = 1
+ALIGNMENT = 64
+
+_FORTRAN_ORDER = 0x1
+_PREAMBLE = struct.Struct('<4sBBHI')
+
+
+def _require_numpy():
+    if(numpy is None):
+        raise ImportError("numpy is required to store and load arrays")
+
+
+def _descr(dtype):
+    if(dtype.hasobject):
+        raise ValueError("arrays of Python objects cannot be stored")
+    return repr(numpy.lib.format.dtype_to_descr(dtype)).encode('ascii')
+
+
+def encode_header(array):
+    """Returns the header describing a contiguous array."""
+    descr = _descr(array.dtype)
+    flags = 0
+    if(array.ndim > 1 and array.flags.f_contiguous and not array.flags.c_contiguous):
+        flags |= _FORTRAN_ORDER
+    header = _PREAMBLE.pack(MAGIC, VERSION, flags, array.ndim, len(descr))
+    header += descr + struct.pack('<{}Q'.format(array.ndim), *array.shape)
+    padding = (-len(header)) % ALIGNMENT
+    return header + b'\0' * padding
+
+
+def decode_header(data):
+    """
+    Parses the header at the beginning of data (a bytes-like object) and
+    returns a tuple (dtype, shape, order, offset of the content).
+    """
+    _require_numpy()
+    view = memoryview(data)
+    if(len(view) < _PREAMBLE.size):
+        raise ValueError("value too short to hold an array")
+    magic, version, flags, ndim, descr_len = _PREAMBLE.unpack_from(view)
+    if(magic != MAGIC):
+        raise ValueError("value does not hold an array")
+    if(version != VERSION):
+        raise ValueError("unsupported array format version {}".format(version))
+    offset = _PREAMBLE.size
+    descr = ast.literal_eval(bytes(view[offset:offset+descr_len]).decode('ascii'))
+    dtype = numpy.lib.format.descr_to_dtype(descr)
+    offset += descr_len
+    shape = struct.unpack_from('<{}Q'.format(ndim), view, offset)
+    offset += 8 * ndim
+    offset += (-offset) % ALIGNMENT
+    order = 'F' if flags & _FORTRAN_ORDER else 'C'
+    return dtype, shape, order, offset
+
+
+def pack(array):
+    """
+    Serializes an array into a bytearray (header followed by the content).
+    Non-contiguous arrays are made contiguous first.
+    """
+    _require_numpy()
+    array = numpy.asanyarray(array)
+    if(not (array.flags.c_contiguous or array.flags.f_contiguous)):
+        array = numpy.ascontiguousarray(array)
+    header = encode_header(array)
+    result = bytearray(len(header) + array.nbytes)
+    result[:len(header)] = header
+    if(array.nbytes != 0):
+        content = array.reshape(-1, order='A').view(numpy.uint8)
+        numpy.frombuffer(result, dtype=numpy.uint8, offset=len(header))[:] = content
+    return result
+
+
+def unpack(data):
+    """
+    Returns an array viewing the content of a serialized array without copying
+    it. The array is read-only if data is (e.g. a bytes object).
+    """
+    dtype, shape, order, offset = decode_header(data)
+    count = 1
+    for dim in shape:
+        count *= dim
+    flat = numpy.frombuffer(data, dtype=dtype, count=count, offset=offset)
+    return flat.reshape(shape, order=order)
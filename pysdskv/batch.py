@@ -0,0 +1,204 @@
+# (C) 2018 The University of Chicago
+# See COPYRIGHT in top-level directory.
+import threading
+import time
+from .client import _nbytes
+
+
+class _Erase():
+    """Marker for a pending erase in an SDSKVBatchWriter."""
+    pass
+
+_ERASE = _Erase()
+
+
+class SDSKVBatchWriter():
+    """
+    The SDSKVBatchWriter is returned by SDSKVDatabase.batch_writer(). It buffers
+    put() and erase() operations and sends them to the database in batches using
+    put_multi() and erase_multi(). Repeated operations on the same key are
+    collapsed, only the last one being sent.
+
+    Values are not copied: buffers (bytearray, numpy arrays, etc.) passed to put()
+    should not be modified until they have been flushed.
+
+    Errors occurring during a background flush are raised by the next call to
+    put(), erase(), flush() or close(). The operations of a batch that failed
+    are kept pending (unless the same keys were written again in the meantime)
+    and are sent again by the next flush; while a background flush error has
+    not been raised, the background thread does not flush.
+    """
+
+    def __init__(self, db, max_items=1024, max_bytes=4*1024*1024,
+            max_delay=None, background=False):
+        """
+        Constructor. Should not be called by users.
+        Users should call batch_writer() on the Database instance.
+        """
+        self._db = db
+        self._max_items = max_items
+        self._max_bytes = max_bytes
+        self._max_delay = max_delay
+        self._lock = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._pending = {}
+        self._pending_bytes = 0
+        self._oldest = None
+        self._error = None
+        self._closed = False
+        self._num_flushes = 0
+        self._thread = None
+        if(background):
+            self._thread = threading.Thread(target=self._run, name='pysdskv-batch', daemon=True)
+            self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __setitem__(self, key, value):
+        """Equivalent to put()."""
+        self.put(key, value)
+
+    def __delitem__(self, key):
+        """Equivalent to erase()."""
+        self.erase(key)
+
+    def __len__(self):
+        """Number of pending operations."""
+        return len(self._pending)
+
+    @property
+    def num_flushes(self):
+        """Number of batches sent so far."""
+        return self._num_flushes
+
+    def put(self, key, value):
+        """Buffers a put of a key value pair."""
+        pkey = self._db._key_bytes(key)
+        self._add(pkey, key, value, len(pkey) + _nbytes(value))
+
+    def erase(self, key):
+        """Buffers an erase of a key."""
+        pkey = self._db._key_bytes(key)
+        self._add(pkey, key, _ERASE, len(pkey))
+
+    def _add(self, pkey, key, value, size):
+        # operations are collapsed on the bytes the key is stored as, the
+        # key itself being sent to put_multi and erase_multi, which encode it
+        self._raise_error()
+        if(self._closed):
+            raise RuntimeError("Operation on a closed SDSKVBatchWriter")
+        with self._lock:
+            previous = self._pending.pop(pkey, None)
+            if(previous is not None):
+                self._pending_bytes -= previous[2]
+            self._pending[pkey] = (key, value, size)
+            self._pending_bytes += size
+            if(self._oldest is None):
+                self._oldest = time.monotonic()
+            if(not self._full(1)):
+                return
+            if(self._thread is not None and not self._full(2)):
+                self._lock.notify()
+                return
+        # flush inline, which also throttles producers that are
+        # faster than the background thread
+        self.flush()
+
+    def _full(self, factor):
+        if(len(self._pending) >= factor * self._max_items):
+            return True
+        if(self._pending_bytes >= factor * self._max_bytes):
+            return True
+        if(self._max_delay is not None and self._oldest is not None):
+            return time.monotonic() - self._oldest >= self._max_delay
+        return False
+
+    def flush(self):
+        """Sends all the pending operations to the database."""
+        self._flush()
+        self._raise_error()
+
+    def _flush(self):
+        with self._flush_lock:
+            with self._lock:
+                pending = self._pending
+                self._pending = {}
+                self._pending_bytes = 0
+                self._oldest = None
+            if(len(pending) == 0):
+                return
+            puts = {}
+            erases = {}
+            for pkey, entry in pending.items():
+                if(entry[1] is _ERASE):
+                    erases[pkey] = entry
+                else:
+                    puts[pkey] = entry
+            failed = None
+            try:
+                if(len(puts) != 0):
+                    failed = pending
+                    self._db.put_multi([ e[0] for e in puts.values() ],
+                            [ e[1] for e in puts.values() ])
+                if(len(erases) != 0):
+                    failed = erases
+                    self._db.erase_multi([ e[0] for e in erases.values() ])
+                failed = None
+            except Exception as e:
+                if(self._error is None):
+                    self._error = e
+            if(failed is not None):
+                self._restore(failed)
+            self._num_flushes += 1
+
+    def _restore(self, failed):
+        """Puts back the operations of a failed batch that were not superseded."""
+        with self._lock:
+            for pkey, entry in failed.items():
+                if(pkey in self._pending):
+                    continue
+                self._pending[pkey] = entry
+                self._pending_bytes += entry[2]
+            if(self._oldest is None and len(self._pending) != 0):
+                self._oldest = time.monotonic()
+
+    def _raise_error(self):
+        if(self._error is not None):
+            e = self._error
+            self._error = None
+            raise e
+
+    def _run(self):
+        while(True):
+            with self._lock:
+                while(not self._closed and (self._error is not None or not self._full(1))):
+                    timeout = None
+                    if(self._max_delay is not None and self._oldest is not None):
+                        timeout = max(0.0, self._oldest + self._max_delay - time.monotonic())
+                    elif(self._max_delay is not None):
+                        timeout = self._max_delay
+                    self._lock.wait(timeout)
+                if(self._closed):
+                    return
+            self._flush()
+
+    def close(self):
+        """
+        Flushes the pending operations and stops the background thread, if any.
+        If the final flush fails, the operations stay pending and flush() can
+        be called again.
+        """
+        if(self._closed):
+            self._raise_error()
+            return
+        with self._lock:
+            self._closed = True
+            self._lock.notify()
+        if(self._thread is not None):
+            self._thread.join()
+            self._thread = None
+        self.flush()
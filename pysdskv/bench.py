@@ -0,0 +1,360 @@
+# (C) 2018 The University of Chicago
+# See COPYRIGHT in top-level directory.
+"""
+YCSB-style benchmark of the SDSKV bindings.
+
+By default, starts an SDSKVProvider in the current process for each backend
+and runs the same workload against each of them:
+
+    python -m pysdskv.bench --backends map,leveldb --workload a
+
+or runs the workload against a database held by an existing provider:
+
+    python -m pysdskv.bench --address ofi+tcp://10.0.0.1:1234 --provider-id 42 \\
+        --database mydatabase --workload c --distribution zipfian
+
+A run first loads --records records (in put_multi batches), then issues
+--operations operations drawn from the read/update/scan proportions of the
+workload, on keys drawn uniformly or following a Zipfian distribution. With
+--batch-size N, reads and updates are issued as get_multi/put_multi of N keys.
+The report, printed as JSON, gives the throughput of each phase, latency
+percentiles of each kind of operation, and the RPCs counted by SDSKVMetrics.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import shutil
+import tempfile
+import time
+from .metrics import SDSKVMetrics
+from .sizing import SizeHintPolicy
+
+# proportions of reads, updates and scans of the YCSB core workloads
+# (workload E inserts new records, treated as updates here; workload D, which
+# reads the latest inserted records, is not provided; w is write-only)
+WORKLOADS = {
+    'a': (0.50, 0.50, 0.00),
+    'b': (0.95, 0.05, 0.00),
+    'c': (1.00, 0.00, 0.00),
+    'e': (0.00, 0.05, 0.95),
+    'f': (0.50, 0.50, 0.00),
+    'w': (0.00, 1.00, 0.00)
+}
+
+BACKENDS = ('map', 'bwtree', 'leveldb', 'berkeleydb')
+
+KEY_PREFIX = b'user'
+
+
+class ZipfianGenerator():
+    """
+    Draws integers in [0, n) following a Zipfian distribution of parameter
+    theta, item 0 being the most popular (algorithm from Gray et al., "Quickly
+    generating billion-record synthetic databases", as used by YCSB).
+    """
+
+    def __init__(self, n, theta=0.99, rng=None):
+        self._n = n
+        self._theta = theta
+        self._rng = rng or random.Random()
+        self._zetan = sum(1.0 / (i ** theta) for i in range(1, n + 1))
+        zeta2 = 1.0 + 1.0 / (2 ** theta)
+        self._alpha = 1.0 / (1.0 - theta)
+        self._eta = (1.0 - (2.0 / n) ** (1.0 - theta)) / (1.0 - zeta2 / self._zetan)
+        self._half_pow_theta = 1.0 + 0.5 ** theta
+
+    def next(self):
+        u = self._rng.random()
+        uz = u * self._zetan
+        if(uz < 1.0):
+            return 0
+        if(uz < self._half_pow_theta):
+            return 1
+        return min(self._n - 1, int(self._n * ((self._eta * u - self._eta + 1.0) ** self._alpha)))
+
+
+class UniformGenerator():
+    """Draws integers uniformly in [0, n)."""
+
+    def __init__(self, n, rng=None):
+        self._n = n
+        self._rng = rng or random.Random()
+
+    def next(self):
+        return self._rng.randrange(self._n)
+
+
+def _fnv(value):
+    """FNV-1a hash of a 64-bit integer, used to scatter the popular Zipfian items."""
+    h = 0xCBF29CE484222325
+    for _ in range(8):
+        h ^= value & 0xFF
+        h = (h * 0x100000001B3) & 0xFFFFFFFFFFFFFFFF
+        value >>= 8
+    return h
+
+
+def make_key(index, key_size):
+    """Returns the key of a record, KEY_PREFIX followed by a zero-padded index."""
+    digits = max(1, key_size - len(KEY_PREFIX))
+    return KEY_PREFIX + str(index).zfill(digits).encode('ascii')
+
+
+def percentiles(samples):
+    """Returns a dictionary of statistics (in seconds) of a list of latencies."""
+    if(len(samples) == 0):
+        return { 'count': 0 }
+    ordered = sorted(samples)
+    def at(p):
+        return ordered[min(len(ordered) - 1, int(math.ceil(p * len(ordered))) - 1)]
+    return {
+        'count': len(ordered),
+        'mean': sum(ordered) / len(ordered),
+        'p50': at(0.50),
+        'p90': at(0.90),
+        'p99': at(0.99),
+        'p999': at(0.999),
+        'max': ordered[-1]
+    }
+
+
+def load(db, args):
+    """Inserts the records of the benchmark, returns the statistics of the phase."""
+    value = os.urandom(args.value_size)
+    latencies = []
+    start = time.perf_counter()
+    for first in range(0, args.records, args.load_batch_size):
+        last = min(args.records, first + args.load_batch_size)
+        keys = [ make_key(i, args.key_size) for i in range(first, last) ]
+        t = time.perf_counter()
+        db.put_multi(keys, [ value ] * len(keys))
+        latencies.append(time.perf_counter() - t)
+    seconds = time.perf_counter() - start
+    return {
+        'records': args.records,
+        'seconds': seconds,
+        'records_per_second': args.records / seconds if seconds > 0 else None,
+        'put_multi': percentiles(latencies)
+    }
+
+
+def proportions(args):
+    """
+    Returns the proportions of reads, updates and scans of the workload,
+    --read-proportion replacing the proportion of reads, the rest of the
+    operations that are not scans being updates.
+    """
+    read_p, update_p, scan_p = WORKLOADS[args.workload]
+    if(args.read_proportion is not None):
+        if(not 0.0 <= args.read_proportion <= 1.0 - scan_p):
+            raise ValueError("--read-proportion should be between 0 and {:g} for workload {} "
+                "({:g} of its operations are scans)".format(1.0 - scan_p, args.workload, scan_p))
+        read_p = args.read_proportion
+        update_p = max(0.0, 1.0 - read_p - scan_p)
+    return read_p, update_p, scan_p
+
+
+def scan_after(index, key_size):
+    """
+    Returns the key after which a scan starting at the record of the given
+    index lists (list_keyvals excludes its after key), so the scan includes
+    the starting record.
+    """
+    if(index == 0):
+        return KEY_PREFIX
+    return make_key(index - 1, key_size)
+
+
+def run(db, args, rng):
+    """Runs the operations of the workload, returns the statistics of the phase."""
+    read_p, update_p, scan_p = proportions(args)
+    if(args.distribution == 'zipfian'):
+        generator = ZipfianGenerator(args.records, args.zipf_theta, rng)
+        next_index = lambda: _fnv(generator.next()) % args.records
+    else:
+        generator = UniformGenerator(args.records, rng)
+        next_index = generator.next
+    value = os.urandom(args.value_size)
+    value_hint = args.value_size if args.hints else 0
+    key_hint = len(make_key(args.records - 1, args.key_size)) if args.hints else 0
+    batch = args.batch_size
+    latencies = { 'read': [], 'update': [], 'scan': [] }
+    items = 0
+    start = time.perf_counter()
+    for _ in range(args.operations):
+        u = rng.random()
+        if(u < read_p):
+            kind = 'read'
+        elif(u < read_p + update_p):
+            kind = 'update'
+        else:
+            kind = 'scan'
+        indices = [ next_index() for _ in range(batch) ]
+        keys = [ make_key(i, args.key_size) for i in indices ]
+        t = time.perf_counter()
+        if(kind == 'scan'):
+            after = scan_after(indices[0], args.key_size)
+            items += len(db.list_keyvals(after=after, num_keys=args.scan_length,
+                prefix=KEY_PREFIX, key_size=key_hint,
+                val_size=value_hint)[0])
+        elif(batch == 1 and kind == 'read'):
+            db.get(keys[0], value_hint)
+            items += 1
+        elif(batch == 1):
+            db.put(keys[0], value)
+            items += 1
+        elif(kind == 'read'):
+            items += len(db.get_multi(keys, value_hint))
+        else:
+            db.put_multi(keys, [ value ] * batch)
+            items += batch
+        latencies[kind].append(time.perf_counter() - t)
+    seconds = time.perf_counter() - start
+    return {
+        'operations': args.operations,
+        'items': items,
+        'seconds': seconds,
+        'operations_per_second': args.operations / seconds if seconds > 0 else None,
+        'items_per_second': items / seconds if seconds > 0 else None,
+        'latency': { kind: percentiles(samples)
+            for kind, samples in latencies.items() if len(samples) != 0 }
+    }
+
+
+def benchmark(db, args):
+    """Loads and runs the workload on a database, returns the report."""
+    metrics = SDSKVMetrics()
+    db.metrics = metrics
+    if(args.size_hints):
+        db.size_hints = SizeHintPolicy()
+    report = {}
+    if(args.records != 0 and not args.skip_load):
+        report['load'] = load(db, args)
+    metrics.reset()
+    report['run'] = run(db, args, random.Random(args.seed))
+    snapshot = metrics.snapshot()
+    report['rpcs'] = snapshot['rpcs']
+    report['probes'] = snapshot['probes']
+    report['bytes'] = snapshot['bytes'].get(db.name, {})
+    db.metrics = None
+    return report
+
+
+def _local(args, engine):
+    """Benchmarks each backend with a provider running in this process."""
+    import pysdskv.server
+    from .client import SDSKVClient
+    from .server import SDSKVProvider
+    client = SDSKVClient(engine)
+    results = []
+    for i, backend in enumerate(args.backends.split(',')):
+        if(backend not in BACKENDS):
+            raise ValueError("unknown backend {}".format(backend))
+        db_type = getattr(pysdskv.server, 'stdmap' if backend == 'map' else backend)
+        provider_id = args.provider_id + i
+        path = tempfile.mkdtemp(prefix='pysdskv-bench-', dir=args.path)
+        result = { 'backend': backend }
+        provider = SDSKVProvider(engine, provider_id)
+        try:
+            db_name = 'bench_' + backend
+            provider.attach_database(db_name, path, db_type)
+            db = client.open(str(engine.addr()), db_name, provider_id, binary=True)
+            result.update(benchmark(db, args))
+            del db
+        except Exception as e:
+            result['error'] = str(e)
+        finally:
+            provider.remove_all_databases()
+            del provider
+            shutil.rmtree(path, ignore_errors=True)
+        results.append(result)
+    client.clear_pool()
+    return results
+
+
+def _remote(args, engine):
+    """Benchmarks a database held by an existing provider."""
+    from .client import SDSKVClient
+    client = SDSKVClient(engine)
+    db = client.open(args.address, args.database, args.provider_id, binary=True)
+    result = { 'address': args.address, 'provider_id': args.provider_id,
+            'database': args.database }
+    result.update(benchmark(db, args))
+    del db
+    client.clear_pool()
+    return [ result ]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m pysdskv.bench',
+            description='YCSB-style benchmark of the SDSKV bindings.')
+    target = parser.add_argument_group('target')
+    target.add_argument('--protocol', default='tcp',
+            help='Mercury protocol of the local engine (default: tcp)')
+    target.add_argument('--backends', default=','.join(BACKENDS),
+            help='comma-separated backends to benchmark with a local provider')
+    target.add_argument('--path', default=None,
+            help='directory in which the local databases are created')
+    target.add_argument('--address', default=None,
+            help='address of an existing provider (disables the local providers)')
+    target.add_argument('--provider-id', type=int, default=1)
+    target.add_argument('--database', default='bench',
+            help='name of the database of the existing provider')
+    workload = parser.add_argument_group('workload')
+    workload.add_argument('--workload', choices=sorted(WORKLOADS), default='a',
+            help='YCSB core workload giving the proportions of operations')
+    workload.add_argument('--read-proportion', type=float, default=None,
+            help='overrides the proportion of reads (the operations that are '
+            'neither reads nor scans being updates)')
+    workload.add_argument('--records', type=int, default=10000)
+    workload.add_argument('--operations', type=int, default=10000)
+    workload.add_argument('--key-size', type=int, default=16)
+    workload.add_argument('--value-size', type=int, default=100)
+    workload.add_argument('--batch-size', type=int, default=1,
+            help='number of keys per read/update (get_multi/put_multi if > 1)')
+    workload.add_argument('--load-batch-size', type=int, default=1000)
+    workload.add_argument('--scan-length', type=int, default=100)
+    workload.add_argument('--distribution', choices=('uniform', 'zipfian'), default='uniform')
+    workload.add_argument('--zipf-theta', type=float, default=0.99)
+    workload.add_argument('--hints', action='store_true',
+            help='pass the known key and value sizes, avoiding size queries')
+    workload.add_argument('--size-hints', action='store_true',
+            help='let a SizeHintPolicy learn the sizes of the values')
+    workload.add_argument('--skip-load', action='store_true',
+            help='do not load the records (with --address, if already loaded)')
+    workload.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None,
+            help='file to which the JSON report is written (default: stdout)')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if(args.records <= 0 and not args.skip_load):
+        raise SystemExit("--records should be positive")
+    try:
+        proportions(args)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    from pymargo.core import Engine
+    engine = Engine(args.protocol)
+    try:
+        if(args.address is None):
+            results = _local(args, engine)
+        else:
+            results = _remote(args, engine)
+    finally:
+        engine.finalize()
+    params = { k: v for k, v in vars(args).items() if k != 'output' }
+    report = json.dumps({ 'parameters': params, 'results': results }, indent=2)
+    if(args.output is None):
+        print(report)
+    else:
+        with open(args.output, 'w') as f:
+            f.write(report + '\n')
+
+
+if __name__ == '__main__':
+    main()
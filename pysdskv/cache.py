@@ -0,0 +1,161 @@
+# (C) 2018 The University of Chicago
+# See COPYRIGHT in top-level directory.
+import collections
+import threading
+import time
+
+
+class SDSKVCache():
+    """
+    The SDSKVCache is a bounded client-side cache of values read from a
+    database. Entries are evicted in least-recently-used order when the total
+    size of the cached keys and values exceeds max_bytes, and optionally
+    expire ttl seconds after being inserted.
+
+    A database with a cache (see SDSKVDatabase.cache) serves get() and
+    get_multi() from the cache when possible, and invalidates the entries
+    it modifies through put(), put_multi() and erase(). Modifications made
+    by other clients are only seen once the entry is evicted or expires.
+
+    A read takes a generation() before fetching a value and passes it to
+    put(), which does not cache the value if its key was invalidated in
+    between: the fetched value may predate the write that invalidated it.
+    The most recent invalidations are remembered for this purpose; a read
+    that started before older ones does not cache its value.
+    """
+
+    # approximate per-entry overhead, in bytes, accounted against max_bytes
+    ENTRY_OVERHEAD = 64
+
+    # number of recent invalidations remembered to detect racing reads
+    INVALIDATION_LOG = 4096
+
+    def __init__(self, max_bytes, ttl=None, clock=time.monotonic):
+        """
+        Constructor.
+
+        Args:
+            max_bytes (int): maximum size of the cached keys and values.
+            ttl (float): time in seconds after which an entry expires
+                (None means entries never expire).
+            clock (callable): function returning the current time in seconds.
+        """
+        self._max_bytes = max_bytes
+        self._ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()
+        self._size = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._generation = 0
+        self._invalidated = collections.OrderedDict()
+        self._floor = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def size(self):
+        """Total size in bytes accounted for the cached entries."""
+        return self._size
+
+    def _entry_size(self, key, value):
+        return len(key) + len(value) + self.ENTRY_OVERHEAD
+
+    def _remove(self, key):
+        value, _ = self._entries.pop(key)
+        self._size -= self._entry_size(key, value)
+
+    def get(self, key):
+        """Returns the value cached for key (bytes), or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if(entry is None):
+                self._misses += 1
+                return None
+            value, expires = entry
+            if(expires is not None and expires <= self._clock()):
+                self._remove(key)
+                self._expirations += 1
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def generation(self):
+        """Returns the generation to pass to put() for a value about to be fetched."""
+        with self._lock:
+            return self._generation
+
+    def put(self, key, value, generation=None):
+        """
+        Caches a value, evicting least recently used entries if needed. If a
+        generation is given, the value is not cached if the key may have been
+        invalidated since that generation was taken.
+        """
+        size = self._entry_size(key, value)
+        expires = None
+        if(self._ttl is not None):
+            expires = self._clock() + self._ttl
+        with self._lock:
+            if(generation is not None and (generation < self._floor
+                    or self._invalidated.get(key, 0) > generation)):
+                return
+            if(key in self._entries):
+                self._remove(key)
+            if(size > self._max_bytes):
+                return
+            self._entries[key] = (value, expires)
+            self._size += size
+            while(self._size > self._max_bytes):
+                old_key = next(iter(self._entries))
+                self._remove(old_key)
+                self._evictions += 1
+
+    def invalidate(self, key):
+        """Removes the entry associated with key, if any."""
+        with self._lock:
+            if(key in self._entries):
+                self._remove(key)
+            self._generation += 1
+            self._invalidated.pop(key, None)
+            self._invalidated[key] = self._generation
+            if(len(self._invalidated) > self.INVALIDATION_LOG):
+                _, self._floor = self._invalidated.popitem(last=False)
+
+    def clear(self):
+        """Removes all the entries."""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+            self._generation += 1
+            self._invalidated.clear()
+            self._floor = self._generation
+
+    @property
+    def stats(self):
+        """
+        Returns a dictionary with the number of hits, misses, evictions
+        and expirations, as well as the current number of entries and size.
+        """
+        with self._lock:
+            return {
+                'hits': self._hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+                'expirations': self._expirations,
+                'entries': len(self._entries),
+                'bytes': self._size
+            }
+
+    def reset_stats(self):
+        """Resets the hit/miss/eviction/expiration counters."""
+        with self._lock:
+            self._hits = 0
+            self._misses = 0
+            self._evictions = 0
+            self._expirations = 0
@@ -1,36 +1,542 @@
 # (C) 2018 The University of Chicago
 # See COPYRIGHT in top-level directory.
+import array
+import asyncio
+import bisect
+import collections
+import functools
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as _FutureTimeout
 import _pysdskvclient
 import pymargo
+from .sizing import SizeHintPolicy
+from .cache import SDSKVCache
+from .metrics import SDSKVMetrics
+from .retry import RetryPolicy, SDSKVTimeoutError
+from . import arrays
+
+SizeError = _pysdskvclient.SizeError
+
+
+def _as_bytes(key):
+    """Returns the bytes a key is stored as, to compare keys in SDSKV's order."""
+    if(isinstance(key, str)):
+        return key.encode('utf-8')
+    return bytes(key)
+
+
+def _nbytes(data):
+    """Size in bytes of a key or value."""
+    if(isinstance(data, (str, bytes, bytearray))):
+        return len(data)
+    return memoryview(data).nbytes
+
+
+def _packed_sizes(sizes):
+    """
+    Converts a list of sizes into an array of 64-bit unsigned integers;
+    buffers (array.array('Q'), numpy uint64 arrays, etc.) are used as is.
+    """
+    if(isinstance(sizes, (list, tuple))):
+        return array.array('Q', sizes)
+    return sizes
+
+
+def _unpack(data, sizes):
+    """Splits a packed buffer into a list of memoryviews given the sizes of its items."""
+    view = memoryview(data)
+    result = []
+    offset = 0
+    for size in sizes:
+        result.append(view[offset:offset+size])
+        offset += size
+    return result
+
+
+def _chunks(count, chunk_items=None, chunk_bytes=None, nbytes=None):
+    """
+    Yields (start, end) ranges splitting count items into chunks of at most
+    chunk_items items and chunk_bytes bytes, nbytes(i) giving the size of
+    item i. A chunk always contains at least one item.
+    """
+    start = 0
+    while(start < count):
+        end = count if chunk_items is None else min(count, start + chunk_items)
+        if(chunk_bytes is not None):
+            size = 0
+            for i in range(start, end):
+                size += nbytes(i)
+                if(size > chunk_bytes and i > start):
+                    end = i
+                    break
+        yield start, end
+        start = end
+
+
+def _measured(op):
+    """
+    Decorator of the SDSKVDatabase methods reporting their latency
+    to the database's metrics, if any.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            metrics = self._metrics
+            if(metrics is None):
+                return method(self, *args, **kwargs)
+            error = True
+            start = time.perf_counter()
+            try:
+                result = method(self, *args, **kwargs)
+                error = False
+                return result
+            finally:
+                metrics.record_op(self._db_name, op, time.perf_counter() - start, error)
+        return wrapper
+    return decorator
+
+
+# set in the threads running a call with a timeout, so that the operations
+# it calls internally are not submitted with a timeout again
+_timed_state = threading.local()
+
+
+def _timed(idempotent=False):
+    """
+    Decorator of the SDSKVDatabase methods adding the timeout and deadline
+    keyword arguments (see SDSKVClient.call). Failed calls to idempotent
+    methods are retried according to the client's retry policy.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, timeout=None, deadline=None, **kwargs):
+            if(getattr(_timed_state, 'active', False)):
+                return method(self, *args, **kwargs)
+            return self._timed_call(functools.partial(method, self, *args, **kwargs),
+                    timeout, deadline, idempotent)
+        return wrapper
+    return decorator
+
+
+class _MeasuredBinding():
+    """
+    Replaces the _pysdskvclient module in a database with metrics, forwarding
+    the calls to the module while counting the RPCs they issue (the binding
+    queries sizes with a first RPC when called with sizes of 0) and the
+    bytes of keys and values they move.
+    """
+
+    def __init__(self, metrics, db_name):
+        self._metrics = metrics
+        self._db_name = db_name
+
+    def _bytes(self, **kwargs):
+        self._metrics.record_bytes(self._db_name, **kwargs)
+
+    def put(self, ph, db_id, key, value):
+        self._metrics.record_rpc('put')
+        _pysdskvclient.put(ph, db_id, key, value)
+        self._bytes(key_out=_nbytes(key), value_out=_nbytes(value))
+
+    def put_multi(self, ph, db_id, keys, values):
+        self._metrics.record_rpc('put_multi')
+        _pysdskvclient.put_multi(ph, db_id, keys, values)
+        self._bytes(key_out=sum(map(_nbytes, keys)), value_out=sum(map(_nbytes, values)))
+
+    def get(self, ph, db_id, key, value_size):
+        if(value_size == 0):
+            self._metrics.record_rpc('length', probe=True)
+        try:
+            val = _pysdskvclient.get(ph, db_id, key, value_size)
+        except SizeError:
+            self._metrics.record_rpc('get')
+            raise
+        if(value_size != 0 or val is not None):
+            self._metrics.record_rpc('get')
+        self._bytes(key_out=_nbytes(key), value_in=0 if val is None else len(val))
+        return val
+
+    def get_into(self, ph, db_id, key, buffer):
+        self._metrics.record_rpc('get')
+        size = _pysdskvclient.get_into(ph, db_id, key, buffer)
+        self._bytes(key_out=_nbytes(key), value_in=size or 0)
+        return size
+
+    def get_multi(self, ph, db_id, keys, value_sizes):
+        if(len(keys) != 0 and value_sizes[0] == 0):
+            self._metrics.record_rpc('length_multi', probe=True)
+        self._metrics.record_rpc('get_multi')
+        vals = _pysdskvclient.get_multi(ph, db_id, keys, value_sizes)
+        self._bytes(key_out=sum(map(_nbytes, keys)), value_in=sum(map(len, vals)))
+        return vals
+
+    def get_multi_into(self, ph, db_id, keys, buffers):
+        self._metrics.record_rpc('get_multi')
+        sizes = _pysdskvclient.get_multi_into(ph, db_id, keys, buffers)
+        self._bytes(key_out=sum(map(_nbytes, keys)), value_in=sum(sizes))
+        return sizes
+
+    def length(self, ph, db_id, key):
+        self._metrics.record_rpc('length')
+        self._bytes(key_out=_nbytes(key))
+        return _pysdskvclient.length(ph, db_id, key)
+
+    def length_multi(self, ph, db_id, keys):
+        self._metrics.record_rpc('length_multi')
+        self._bytes(key_out=sum(map(_nbytes, keys)))
+        return _pysdskvclient.length_multi(ph, db_id, keys)
+
+    def exists(self, ph, db_id, key):
+        self._metrics.record_rpc('length')
+        self._bytes(key_out=_nbytes(key))
+        return _pysdskvclient.exists(ph, db_id, key)
+
+    def erase(self, ph, db_id, key):
+        self._metrics.record_rpc('erase')
+        self._bytes(key_out=_nbytes(key))
+        _pysdskvclient.erase(ph, db_id, key)
+
+    def erase_multi(self, ph, db_id, keys):
+        self._metrics.record_rpc('erase_multi')
+        self._bytes(key_out=sum(map(_nbytes, keys)))
+        _pysdskvclient.erase_multi(ph, db_id, keys)
+
+    def list_keys(self, ph, db_id, after, prefix, num_keys, key_size, max_bytes=0):
+        if(num_keys != 0 and key_size == 0):
+            self._metrics.record_rpc('list_keys', probe=True)
+        self._metrics.record_rpc('list_keys')
+        keys = _pysdskvclient.list_keys(ph, db_id, after, prefix, num_keys, key_size, max_bytes)
+        self._bytes(key_in=sum(map(len, keys)))
+        return keys
+
+    def list_keyvals(self, ph, db_id, after, prefix, num_keys, key_size, val_size, max_bytes=0):
+        if(num_keys != 0 and (key_size == 0 or val_size == 0)):
+            self._metrics.record_rpc('list_keyvals', probe=True)
+        self._metrics.record_rpc('list_keyvals')
+        keys, vals = _pysdskvclient.list_keyvals(ph, db_id, after, prefix, num_keys, key_size, val_size, max_bytes)
+        self._bytes(key_in=sum(map(len, keys)), value_in=sum(map(len, vals)))
+        return keys, vals
+
+    def put_packed(self, ph, db_id, keys, key_sizes, values, value_sizes):
+        self._metrics.record_rpc('put_packed')
+        _pysdskvclient.put_packed(ph, db_id, keys, key_sizes, values, value_sizes)
+        self._bytes(key_out=_nbytes(keys), value_out=_nbytes(values))
+
+    def get_packed(self, ph, db_id, keys, key_sizes, buffer_size):
+        if(buffer_size == 0):
+            self._metrics.record_rpc('length_packed', probe=True)
+        self._metrics.record_rpc('get_packed')
+        values, value_sizes = _pysdskvclient.get_packed(ph, db_id, keys, key_sizes, buffer_size)
+        self._bytes(key_out=_nbytes(keys), value_in=len(values))
+        return values, value_sizes
+
+    def list_keyvals_packed(self, ph, db_id, after, prefix, num_keys, key_size, val_size, max_bytes=0):
+        if(num_keys != 0 and (key_size == 0 or val_size == 0)):
+            self._metrics.record_rpc('list_keyvals', probe=True)
+        self._metrics.record_rpc('list_keyvals')
+        result = _pysdskvclient.list_keyvals_packed(ph, db_id, after, prefix, num_keys, key_size, val_size, max_bytes)
+        self._bytes(key_in=len(result[0]), value_in=len(result[2]))
+        return result
+
 
 class SDSKVClient():
     """
     The SDSKVClient is the object that holds the RPCs that can be made
     towards and SDSKVProvider.
+
+    The SDSKVDatabase operations sending RPCs accept the timeout and deadline
+    keyword arguments (see call() and SDSKVDatabase), the timeout defaulting
+    to the client's timeout. Failed reads are retried according to the
+    client's RetryPolicy, if any.
+
+    Provider handles towards a provider running on the client's own engine
+    (co-located provider) use the engine's self address, for which Mercury
+    executes the RPCs locally instead of going through the network plugin,
+    and the statistics of a co-located provider are read without RPC.
+    libsdskv does not expose its databases to the process, so the SDSKV
+    operations themselves still go through the RPC handlers.
     """
 
-    def __init__(self, engine):
+    def __init__(self, engine, max_workers=16, metrics=None, colocated=True,
+            timeout=None, retry=None, max_abandoned=None):
         """
         Constructor.
 
         Args:
             engine (pymargo.Engine): engine used to issue RPCs.
+            max_workers (int): number of worker threads used to issue the
+                RPCs of the asynchronous (a*) database methods concurrently,
+                which bounds the number of asynchronous operations in flight.
+            metrics (SDSKVMetrics): metrics collecting the measurements of
+                the databases opened through this client, or None.
+            colocated (bool): whether to detect co-located providers.
+            timeout (float): default timeout (seconds) of the operations,
+                or None (no timeout).
+            retry (RetryPolicy): policy retrying the reads that failed,
+                or None (no retry).
+            max_abandoned (int): maximum number of timed-out calls to a
+                provider that may still hold a thread (see call()), by
+                default a quarter of max_workers.
         """
+        self._engine = engine
+        self._metrics = metrics
         self._client = _pysdskvclient.client_init(engine.get_internal_mid())
+        self._max_workers = max_workers
+        self._executor = None
+        self._pool_lock = threading.Lock()
+        self._addresses = {}
+        self._handles = {}
+        self._db_ids = {}
+        self._rpc_ids = {}
+        self._colocated = colocated
+        self._self_addr = None
+        self._timeout = timeout
+        self._retry = retry
+        self._timed_executor = None
+        if(max_abandoned is None):
+            max_abandoned = max(1, max_workers // 4)
+        self._max_abandoned = max_abandoned
+        self._abandoned = {}
+
+    @property
+    def metrics(self):
+        """
+        SDSKVMetrics used by default by the databases opened through this
+        client, or None (the default).
+        """
+        return self._metrics
+
+    @metrics.setter
+    def metrics(self, metrics):
+        self._metrics = metrics
+
+    @property
+    def timeout(self):
+        """Default timeout (seconds) of the database operations, or None."""
+        return self._timeout
+
+    @timeout.setter
+    def timeout(self, timeout):
+        self._timeout = timeout
+
+    @property
+    def retry(self):
+        """RetryPolicy applied to the reads, or None."""
+        return self._retry
+
+    @retry.setter
+    def retry(self, policy):
+        self._retry = policy
+
+    def call(self, fn, timeout=None, deadline=None, retry=None, provider=None):
+        """
+        Calls fn() and returns its result, raising an SDSKVTimeoutError if it
+        does not complete within timeout seconds or before deadline (a time
+        given by time.monotonic()). If retry is a RetryPolicy, failed attempts
+        are retried (each attempt having its own timeout) until the deadline.
+
+        SDSKV does not provide timed RPCs, so fn() runs on a separate pool of
+        max_workers threads while the caller waits. A call that times out is
+        abandoned, not cancelled: it keeps a thread of this pool until the
+        provider answers (a write may therefore still be applied), and calls
+        queued behind stuck threads time out as well, so that the callers'
+        threads never wait longer than their timeout.
+
+        provider identifies the provider fn() sends its RPCs to (an (address,
+        provider id) tuple). Once max_abandoned calls to a provider have been
+        abandoned and are still running, further calls to it fail immediately
+        with an SDSKVTimeoutError instead of taking another thread, so that a
+        stuck provider does not starve the calls to the other providers.
+        """
+        attempts = 0
+        while(True):
+            limit = timeout
+            if(deadline is not None):
+                remaining = deadline - time.monotonic()
+                if(remaining <= 0):
+                    raise SDSKVTimeoutError("deadline exceeded")
+                limit = remaining if limit is None else min(limit, remaining)
+            if(limit is not None and provider is not None):
+                with self._pool_lock:
+                    stuck = self._abandoned.get(provider, 0)
+                if(stuck >= self._max_abandoned):
+                    raise SDSKVTimeoutError("{} timed-out calls to provider {} of {} "
+                        "have not completed".format(stuck, provider[1], provider[0]))
+            try:
+                if(limit is None):
+                    return self._run_timed(fn)
+                future = self._timed_pool().submit(self._run_timed, fn)
+                try:
+                    return future.result(timeout=limit)
+                except _FutureTimeout:
+                    if(not future.cancel() and provider is not None):
+                        self._abandon(provider, future)
+                    raise SDSKVTimeoutError("operation did not complete within {:.3f} s".format(limit))
+            except Exception as e:
+                error = e
+            attempts += 1
+            if(retry is None or not retry.should_retry(error, attempts)):
+                raise error
+            delay = retry.delay(attempts)
+            if(deadline is not None):
+                delay = min(delay, max(0.0, deadline - time.monotonic()))
+            time.sleep(delay)
+
+    def _abandon(self, provider, future):
+        """Counts a running call to a provider as abandoned until it completes."""
+        with self._pool_lock:
+            self._abandoned[provider] = self._abandoned.get(provider, 0) + 1
+        def done(f):
+            with self._pool_lock:
+                count = self._abandoned.pop(provider) - 1
+                if(count != 0):
+                    self._abandoned[provider] = count
+        future.add_done_callback(done)
+
+    @property
+    def abandoned(self):
+        """Number of timed-out calls still running, by (address, provider id)."""
+        with self._pool_lock:
+            return dict(self._abandoned)
+
+    @staticmethod
+    def _run_timed(fn):
+        _timed_state.active = True
+        try:
+            return fn()
+        finally:
+            _timed_state.active = False
+
+    def _timed_pool(self):
+        """
+        Pool running the calls with a timeout, distinct from executor so that
+        operations using executor (e.g. chunked put_multi) cannot deadlock.
+        """
+        with self._pool_lock:
+            if(self._timed_executor is None):
+                self._timed_executor = ThreadPoolExecutor(max_workers=self._max_workers,
+                        thread_name_prefix='pysdskv-timed')
+            return self._timed_executor
+
+    @property
+    def executor(self):
+        """
+        Pool of worker threads used by the asynchronous API. The bindings
+        only have blocking RPCs, so each asynchronous operation runs on a
+        thread of this pool; all the RPC wrappers release the GIL, so up to
+        max_workers RPCs can be in flight at the same time. The pool is
+        created on first use.
+        """
+        if(self._executor is None):
+            self._executor = ThreadPoolExecutor(max_workers=self._max_workers,
+                    thread_name_prefix='pysdskv')
+        return self._executor
+
+    def lookup(self, addr):
+        """
+        Looks up an address (str) and returns the corresponding pymargo.Address.
+        Results are cached, so only the first lookup of an address costs a
+        call to the engine's lookup.
+        """
+        with self._pool_lock:
+            result = self._addresses.get(addr)
+        if(result is None):
+            result = self._engine.lookup(addr)
+            with self._pool_lock:
+                result = self._addresses.setdefault(addr, result)
+        return result
 
     def create_provider_handle(self, addr, provider_id=0):
         """
-        Creates a provider handle givem an address (string) and a provider id (int).
+        Creates a provider handle givem an address and a provider id (int).
 
         Args:
-            addr (str): Address of the provider.
+            addr (pymargo.Address or str): Address of the provider.
             provider_id (int): Provider id.
 
         Returns:
             An SDSKVProviderHandle instance.
         """
+        if(isinstance(addr, str)):
+            addr = self.lookup(addr)
+        if(self._colocated):
+            addr = self._local_addr(addr)
         ph = _pysdskvclient.provider_handle_create(self._client, addr.get_internal_hg_addr(), provider_id)
-        return SDSKVProviderHandle(ph)
+        return SDSKVProviderHandle(ph, self, addr=addr, provider_id=provider_id)
+
+    def _local_addr(self, addr):
+        """Returns the engine's self address if addr designates the engine, addr otherwise."""
+        if(self._self_addr is None):
+            self._self_addr = self._engine.addr()
+            self._self_addr_str = str(self._self_addr)
+        if(addr is not self._self_addr and str(addr) == self._self_addr_str):
+            return self._self_addr
+        return addr
+
+    def provider_handle(self, addr, provider_id=0):
+        """
+        Returns a provider handle from the client's pool of provider handles.
+        The pool keeps one underlying handle per (address, provider id) pair;
+        the returned SDSKVProviderHandle holds a reference to it, and databases
+        opened through it have their id memoized so that opening the same
+        database again does not require an RPC.
+
+        Args:
+            addr (pymargo.Address or str): Address of the provider.
+            provider_id (int): Provider id.
+
+        Returns:
+            An SDSKVProviderHandle instance.
+        """
+        addr_str = addr if isinstance(addr, str) else str(addr)
+        key = (addr_str, provider_id)
+        with self._pool_lock:
+            pooled = self._handles.get(key)
+        if(pooled is None):
+            pooled = self.create_provider_handle(addr, provider_id)
+            with self._pool_lock:
+                pooled = self._handles.setdefault(key, pooled)
+        _pysdskvclient.provider_handle_ref_incr(pooled._ph)
+        return SDSKVProviderHandle(pooled._ph, self, pool_key=key,
+                addr=pooled._addr, provider_id=provider_id)
+
+    def open(self, addr, db_name, provider_id=0, **kwargs):
+        """
+        Opens a database given the address of its provider, the provider id and
+        the name of the database, using the client's pool of provider handles
+        (see provider_handle). Additional arguments are passed to
+        SDSKVProviderHandle.open().
+        """
+        return self.provider_handle(addr, provider_id).open(db_name, **kwargs)
+
+    def clear_pool(self):
+        """
+        Releases the provider handles and cached addresses held by the pool, and
+        forgets memoized database ids. Handles and databases previously returned
+        remain valid.
+        """
+        with self._pool_lock:
+            self._handles.clear()
+            self._addresses.clear()
+            self._db_ids.clear()
+
+    def _forward(self, addr, provider_id, rpc_name, request):
+        """
+        Sends an RPC registered by the provider in Python (e.g. STATS_RPC),
+        taking and returning JSON, and returns the decoded response.
+        """
+        with self._pool_lock:
+            rpc_id = self._rpc_ids.get(rpc_name)
+            if(rpc_id is None):
+                rpc_id = self._engine.register(rpc_name)
+                self._rpc_ids[rpc_name] = rpc_id
+        handle = self._engine.create_handle(addr, rpc_id)
+        response = json.loads(handle.forward(provider_id, json.dumps(request)))
+        if('error' in response):
+            raise RuntimeError('{} failed: {}'.format(rpc_name, response['error']))
+        return response
 
     def shutdown_service(self, addr):
         """
@@ -45,6 +551,14 @@ class SDSKVClient():
         """
         Finalizes the client.
         """
+        if(self._executor is not None):
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        if(self._timed_executor is not None):
+            # threads stuck on a provider cannot be joined
+            self._timed_executor.shutdown(wait=False)
+            self._timed_executor = None
+        self.clear_pool()
         _pysdskvclient.client_finalize(self._client)
 
 
@@ -53,12 +567,24 @@ class SDSKVProviderHandle():
     The SDSKVProviderHandle object represents the interface to a particular provider.
     """
 
-    def __init__(self, ph):
+    def __init__(self, ph, client=None, pool_key=None, addr=None, provider_id=None):
         """
         Constructor. Not supposed to be called by users. Use SDSKVClient.create_provider_handle
-        to create an instance of SDSKVProviderHandle.
+        or SDSKVClient.provider_handle to create an instance of SDSKVProviderHandle.
         """
         self._ph = ph
+        self._client = client
+        self._pool_key = pool_key
+        self._addr = addr
+        self._provider_id = provider_id
+        self._key = pool_key
+
+    @property
+    def _provider_key(self):
+        """(address, provider id) identifying the provider, or None if unknown."""
+        if(self._key is None and self._addr is not None):
+            self._key = (str(self._addr), self._provider_id)
+        return self._key
 
     def __del__(self):
         """
@@ -68,14 +594,45 @@ class SDSKVProviderHandle():
             _pysdskvclient.provider_handle_release(self._ph)
             self._ph = None
 
-    def open(self, db_name):
+    def open(self, db_name, binary=False, size_hints=None, cache=None, key_codec=None,
+            metrics=None, compression=None, comparator=None):
         """
         Open a database identified by db_name from the provider,
-        and returns a SDSKVDatabase instance.
+        and returns a SDSKVDatabase instance. If binary is True, the
+        database will return keys and values as bytes objects instead
+        of decoding them into str. size_hints can be set to a SizeHintPolicy
+        instance to let the database guess the size of keys and values
+        instead of querying them (see SDSKVDatabase.size_hints). cache can
+        be set to an SDSKVCache instance to cache the values read
+        (see SDSKVDatabase.cache). key_codec can be set to a key codec, e.g.
+        pysdskv.keys.TupleCodec(), to use composite keys (see
+        SDSKVDatabase.key_codec). metrics can be set to an SDSKVMetrics
+        instance to measure the operations on the database; it defaults
+        to the metrics of the client. compression can be set to an
+        SDSKVCompression instance to compress the values stored
+        (see SDSKVDatabase.compression). comparator is the name of the
+        comparator the database was attached with, if any (see
+        SDSKVDatabase.comparator); it is detected when the provider runs
+        in this process.
         """
-        db_id = _pysdskvclient.open(self._ph, db_name)
+        db_id = None
+        if(self._pool_key is not None):
+            db_key = self._pool_key + (db_name,)
+            db_id = self._client._db_ids.get(db_key)
+        if(db_id is None):
+            db_id = _pysdskvclient.open(self._ph, db_name)
+            if(db_id != 0 and self._pool_key is not None):
+                self._client._db_ids[db_key] = db_id
+        if(metrics is None and self._client is not None):
+            metrics = self._client.metrics
+        if(comparator is None and db_id != 0):
+            provider = self.colocated
+            if(provider is not None):
+                comparator = provider.comparator(db_id)
         if(db_id != 0):
-            return SDSKVDatabase(self, db_id, db_name)
+            return SDSKVDatabase(self, db_id, db_name, binary=binary,
+                    size_hints=size_hints, cache=cache, key_codec=key_codec,
+                    metrics=metrics, compression=compression, comparator=comparator)
         else:
             raise RuntimeError('Could not open database {}'.format(db_name))
 
@@ -85,20 +642,88 @@ class SDSKVProviderHandle():
         Lists the Databases held by the provider.
         """
         l = _pysdskvclient.list_databases(self._ph)
+        provider = self.colocated
         result = []
         for db_info in l:
             db_name, db_id = db_info
             if(db_id != 0):
-                result.append(SDSKVDatabase(self, db_id, db_name))
+                comparator = None if provider is None else provider.comparator(db_id)
+                result.append(SDSKVDatabase(self, db_id, db_name, comparator=comparator))
         return result
 
+    @property
+    def colocated(self):
+        """
+        SDSKVProvider the handle points to if it runs in this process on the
+        engine of the client, None otherwise.
+        """
+        if(self._client is None or not self._client._colocated or self._addr is None):
+            return None
+        try:
+            from .server import local_provider
+        except ImportError:
+            # the server module is not available
+            return None
+        return local_provider(self._addr, self._provider_id)
+
+    def stats(self, count_keys=False, max_keys=None):
+        """
+        Queries the statistics of the databases held by the provider and returns
+        a list of dictionaries (see SDSKVProvider.stats). If count_keys is True,
+        the provider scans the databases to count their keys and values, up to
+        max_keys keys per database.
+        """
+        return self._stats(None, count_keys, max_keys)
+
+    def _stats(self, db_id, count_keys, max_keys):
+        provider = self.colocated
+        if(provider is not None):
+            return provider.stats(db_id, count_keys, max_keys)
+        from .server import STATS_RPC
+        if(self._client is None or self._addr is None):
+            raise RuntimeError("stats() requires a provider handle created by an SDSKVClient")
+        response = self._client._forward(self._addr, self._provider_id, STATS_RPC,
+                { 'db_id': db_id, 'count_keys': count_keys, 'max_keys': max_keys })
+        return response['stats']
+
 
 class SDSKVDatabase():
     """
     The SDSKVDatabase object represents the entry point to a given database.
+
+    Keys and values passed to the database can be str objects (stored as UTF-8)
+    or any object supporting the buffer protocol (bytes, bytearray, memoryview,
+    numpy arrays, etc.), which are sent without being copied. Keys and values
+    returned by the database are str objects, unless the database was opened
+    with binary=True, in which case they are bytes objects.
+
+    If the database is opened with a key codec (see key_codec), keys are
+    encoded by the codec before being sent and decoded when returned.
+    Similarly, values are compressed and decompressed if the database is
+    opened with an SDSKVCompression (see compression).
+
+    The operations sending RPCs (put, get, length, exists, erase, list_keys,
+    list_keyvals and their variants, the array and packed methods, and the
+    asynchronous a* methods) accept timeout and deadline keyword arguments,
+    and raise an SDSKVTimeoutError if they expire (see SDSKVClient.call).
+    The operations that may issue a sequence of RPCs (put_multi, get_multi,
+    iget_multi and erase_multi when sent in chunks, erase_prefix,
+    erase_range, keys, items and their asynchronous versions, parallel_scan)
+    apply the timeout to each RPC and the deadline to the whole operation.
+    copy_to, rebalance, export, import_, migrate and the batch writers do
+    not take a timeout.
+
+    The asynchronous a* methods and async iterators are not backed by
+    non-blocking RPCs: the SDSKV client library only provides blocking
+    calls, so each of them runs the blocking method on the client's worker
+    pool (see SDSKVClient.executor). They spare the event loop from blocking,
+    but each operation holds a worker thread while its RPCs are in flight,
+    the number of concurrent operations is bounded by max_workers, and each
+    one pays a thread handoff on top of the RPC latency.
     """
 
-    def __init__(self, ph, db_id, name):
+    def __init__(self, ph, db_id, name, binary=False, size_hints=None, cache=None,
+            key_codec=None, metrics=None, compression=None, comparator=None):
         """
         Constructor. Not supposed to be called by users. Use SDSKVProviderHandle.open()
         to create an instance of SDSKVDatabase.
@@ -106,29 +731,261 @@ class SDSKVDatabase():
         self._sdskv_ph = ph
         self._db_id = db_id
         self._db_name = name
+        self._comparator = comparator
+        self._binary = binary
+        self._size_hints = size_hints
+        self._cache = cache
+        self._key_codec = key_codec
+        self._compression = compression
+        self.metrics = metrics
 
     @property
     def name(self):
         """Name of the database."""
         return self._db_name
 
+    @property
+    def binary(self):
+        """Whether keys and values are returned as bytes rather than str."""
+        return self._binary
+
+    @property
+    def comparator(self):
+        """
+        Name of the comparator ordering the keys of the database (see
+        SDSKVProvider.attach_database), or None for the lexicographic order.
+
+        The operations bounding a range of keys on the client side (start and
+        end of keys() and items(), erase_range(), parallel_scan() and
+        copy_to() with split keys, start or end) compare the stored keys
+        bytewise, so they raise a ValueError on a database with a comparator.
+        Prefix listings and full scans are ordered by the provider and work
+        with any comparator.
+        """
+        return self._comparator
+
+    def _check_bytewise(self, operation):
+        """Raises a ValueError if the keys are not in lexicographic order."""
+        if(self._comparator is not None):
+            raise ValueError("{} compares keys bytewise, database {} is ordered by "
+                    "comparator {}".format(operation, self._db_name, self._comparator))
+
+    @property
+    def size_hints(self):
+        """
+        SizeHintPolicy used by get(), get_multi(), list_keys() and list_keyvals()
+        when they are called without explicit size, or None (the default), in which
+        case these functions query the sizes with a first RPC. With a policy, the
+        functions fetch the data using the size learned by the policy, and only
+        query the actual size if SDSKV reports that this size was too small.
+        """
+        return self._size_hints
+
+    @size_hints.setter
+    def size_hints(self, policy):
+        self._size_hints = policy
+
+    @property
+    def cache(self):
+        """
+        SDSKVCache used to serve get() and get_multi() without RPC when the
+        requested values have been read recently, or None (the default).
+        Entries are invalidated when this database instance modifies them.
+        """
+        return self._cache
+
+    @cache.setter
+    def cache(self, cache):
+        self._cache = cache
+
+    @property
+    def metrics(self):
+        """
+        SDSKVMetrics collecting the number, latency, RPCs and bytes of the
+        operations made on this database, or None (no measurement).
+        """
+        return self._metrics
+
+    @metrics.setter
+    def metrics(self, metrics):
+        self._metrics = metrics
+        if(metrics is None):
+            self._kv = _pysdskvclient
+        else:
+            self._kv = _MeasuredBinding(metrics, self._db_name)
+
+    @property
+    def key_codec(self):
+        """
+        Codec used to encode keys into the bytes stored by SDSKV and to decode
+        the keys returned by list_keys(), list_keyvals(), keys() and items(),
+        or None (the default). With pysdskv.keys.TupleCodec(), keys are tuples
+        stored in an order-preserving encoding, so that key ranges and prefixes
+        can be scanned in the order of the tuples. The packed functions
+        (put_packed, get_packed, list_keyvals_packed) work on encoded keys.
+        """
+        return self._key_codec
+
+    @property
+    def compression(self):
+        """
+        SDSKVCompression compressing the values above its size threshold before
+        they are stored, and decompressing them when they are read, or None (the
+        default). Every value stored through a database with a compression starts
+        with a header byte, so a database should always be opened with one, or
+        never. The packed functions (put_packed, get_packed, list_keyvals_packed),
+        length() and length_multi() work on the stored values, and copy_to(),
+        rebalance(), export() and import_() copy the stored values as they are.
+        """
+        return self._compression
+
+    def _encode_key(self, key):
+        if(self._key_codec is None):
+            return key
+        return self._key_codec.encode(key)
+
+    def _encode_keys(self, keys):
+        if(self._key_codec is None):
+            return keys
+        encode = self._key_codec.encode
+        return [ encode(k) for k in keys ]
+
+    def _encode_bound(self, key):
+        """Encodes the after/prefix argument of a listing, '' meaning no bound."""
+        if(isinstance(key, (str, bytes)) and len(key) == 0):
+            return key
+        return self._encode_key(key)
+
+    def _key_bytes(self, key):
+        """Returns the bytes a key is stored as."""
+        return _as_bytes(self._encode_key(key))
+
+    def _timed_call(self, fn, timeout, deadline, idempotent):
+        """
+        Calls fn() with a timeout (by default the client's) and deadline, and
+        the client's retry policy if idempotent is True (see SDSKVClient.call).
+        """
+        if(getattr(_timed_state, 'active', False)):
+            return fn()
+        client = self._sdskv_ph._client
+        retry = None
+        if(client is not None):
+            if(timeout is None):
+                timeout = client.timeout
+            if(idempotent):
+                retry = client.retry
+        if(timeout is None and deadline is None and retry is None):
+            return fn()
+        if(client is None):
+            raise RuntimeError("timeouts require a provider handle created by an SDSKVClient")
+        return client.call(fn, timeout=timeout, deadline=deadline, retry=retry,
+                provider=self._sdskv_ph._provider_key)
+
+    def _invalidate(self, key):
+        if(self._cache is not None):
+            self._cache.invalidate(_as_bytes(key))
+
+    def _decode(self, data):
+        """Converts bytes returned by the binding into what the user expects."""
+        if(self._binary):
+            return data
+        return data.decode('utf-8')
+
+    def _decode_list(self, data):
+        """Same as _decode, for a list of bytes objects."""
+        if(self._binary):
+            return data
+        return [ d.decode('utf-8') for d in data ]
+
+    def _compress(self, values):
+        """Returns the stored form of a list of values."""
+        if(self._compression is None):
+            return values
+        return self._compression.encode_multi(values)
+
+    def _decompress(self, values):
+        """Returns the values (bytes) of a list of stored values."""
+        if(self._compression is None):
+            return values
+        return self._compression.decode_multi(values)
+
+    def _decode_values(self, values):
+        """Same as _decode_list, for a list of stored values."""
+        return self._decode_list(self._decompress(values))
+
+    def _decode_keys(self, keys):
+        """Same as _decode_list, for a list of keys."""
+        if(self._key_codec is None):
+            return self._decode_list(keys)
+        decode = self._key_codec.decode
+        return [ decode(k) for k in keys ]
+
+    @_measured('put')
+    @_timed()
     def put(self, key, value):
-        """Puts a key (str) value (str) pair in the database."""
-        _pysdskvclient.put(self._sdskv_ph._ph, self._db_id, key, value)
+        """Puts a key value pair in the database."""
+        key = self._encode_key(key)
+        if(self._compression is not None):
+            value = self._compression.encode(value)
+        self._kv.put(self._sdskv_ph._ph, self._db_id, key, value)
+        self._invalidate(key)
 
     def __setitem__(self, key, value):
         """Equivalent to put()."""
         self.put(key, value)
 
-    def put_multi(self, keys, values):
+    @_measured('put_multi')
+    def put_multi(self, keys, values, chunk_items=None, chunk_bytes=None, inflight=1,
+            timeout=None, deadline=None):
         """
-        Puts multiple key value pairs (keys and values must be lists of strings,
-        these lists must be the same size.
+        Puts multiple key value pairs (keys and values must be lists of str or
+        bytes-like objects, these lists must be the same size).
+        If chunk_items and/or chunk_bytes are set, the batch is sent in chunks of
+        at most chunk_items pairs and chunk_bytes bytes (keys and values), with up
+        to inflight chunks being sent concurrently. The timeout applies to each chunk.
         """
         if(len(keys) != len(values)):
             raise RuntimeError("Number of keys and values do not match")
-        _pysdskvclient.put_multi(self._sdskv_ph._ph, self._db_id, keys, values)
+        keys = self._encode_keys(keys)
+        values = self._compress(values)
+        put = lambda k, v: self._timed_call(functools.partial(self._put_multi, k, v),
+                timeout, deadline, False)
+        if(chunk_items is None and chunk_bytes is None):
+            put(keys, values)
+            return
+        chunks = _chunks(len(keys), chunk_items, chunk_bytes,
+                lambda i: _nbytes(keys[i]) + _nbytes(values[i]))
+        for _ in self._pipeline(chunks, inflight,
+                lambda start, end: put(keys[start:end], values[start:end])):
+            pass
+
+    def _put_multi(self, keys, values):
+        """Puts encoded keys and stored values."""
+        self._kv.put_multi(self._sdskv_ph._ph, self._db_id, keys, values)
+        if(self._cache is not None):
+            for key in keys:
+                self._invalidate(key)
+
+    def _pipeline(self, chunks, inflight, call):
+        """
+        Yields call(start, end) for each (start, end) chunk, in order, running up
+        to inflight calls concurrently on the client's worker pool.
+        """
+        if(inflight <= 1 or self._sdskv_ph._client is None):
+            for start, end in chunks:
+                yield call(start, end)
+            return
+        executor = self._sdskv_ph._client.executor
+        pending = collections.deque()
+        for start, end in chunks:
+            pending.append(executor.submit(call, start, end))
+            if(len(pending) >= inflight):
+                yield pending.popleft().result()
+        while(len(pending) != 0):
+            yield pending.popleft().result()
 
+    @_measured('get')
+    @_timed(idempotent=True)
     def get(self, key, value_size=0):
         """
         Gets the value associated with a key.
@@ -140,19 +997,100 @@ class SDSKVDatabase():
         Note: the value_size is used to allocate a buffer to hold the value, so if
         the user doesn't know the size, it is a very bad practice to conservatively
         set value_size to a large value that could cause the program to run out of
-        memory.
+        memory. If the database has a SizeHintPolicy (see size_hints), leaving
+        value_size to 0 lets the policy provide a reasonable hint.
         """
-        val = _pysdskvclient.get(self._sdskv_ph._ph, self._db_id, key, value_size)
+        val = self._get_raw(self._encode_key(key), value_size)
         if(val is None):
             raise KeyError(key)
         else:
-            return val
+            return self._decode(val)
+
+    def _get_raw(self, key, value_size=0):
+        """Gets the value (bytes) associated with a key, or None if the key does not exist."""
+        cache = self._cache
+        if(cache is not None):
+            cache_key = _as_bytes(key)
+            val = cache.get(cache_key)
+            if(val is not None):
+                return val
+            generation = cache.generation()
+        if(value_size == 0 and self._size_hints is not None):
+            val = self._get_hinted(key)
+        else:
+            val = self._kv.get(self._sdskv_ph._ph, self._db_id, key, value_size)
+        if(self._compression is not None and val is not None):
+            val = self._compression.decode(val)
+        if(cache is not None and val is not None):
+            cache.put(cache_key, val, generation)
+        return val
+
+    def _get_stored(self, key):
+        """Gets the value associated with a key as stored, or None if the key does not exist."""
+        if(self._compression is None):
+            return self._get_raw(key)
+        return self._kv.get(self._sdskv_ph._ph, self._db_id, key, 0)
+
+    def _get_hinted(self, key):
+        """Gets a value using the size hint provided by the database's SizeHintPolicy."""
+        policy = self._size_hints
+        hint = policy.value_hint(key)
+        val = None
+        if(hint != 0):
+            try:
+                val = self._kv.get(self._sdskv_ph._ph, self._db_id, key, hint)
+                policy.record_hit()
+            except SizeError:
+                policy.record_miss()
+                hint = 0
+        else:
+            policy.record_probe()
+        if(hint == 0):
+            val = self._kv.get(self._sdskv_ph._ph, self._db_id, key, 0)
+        if(val is not None):
+            policy.record_value(key, len(val))
+        return val
+
+    @_measured('get_into')
+    @_timed(idempotent=True)
+    def get_into(self, key, buffer):
+        """
+        Gets the value associated with a key and writes it directly into
+        a writable bytes-like object (bytearray, memoryview, numpy array, etc.).
+        The size of the buffer is used as the maximum size of the value; if the
+        value is larger, an exception will be thrown.
+        Returns the number of bytes written.
+        If the database has a compression, the value is decompressed and then
+        copied into the buffer.
+        """
+        if(self._compression is not None):
+            val = self._get_raw(self._encode_key(key))
+            if(val is None):
+                raise KeyError(key)
+            return self._copy_into(val, buffer)
+        size = self._kv.get_into(self._sdskv_ph._ph, self._db_id,
+                self._encode_key(key), buffer)
+        if(size is None):
+            raise KeyError(key)
+        else:
+            return size
+
+    @staticmethod
+    def _copy_into(val, buffer):
+        view = memoryview(buffer).cast('B')
+        if(len(val) > len(view)):
+            raise SizeError("value of {} bytes does not fit in a buffer of {} bytes".format(
+                len(val), len(view)))
+        view[:len(val)] = val
+        return len(val)
 
     def __getitem__(self, key):
         """Equivalent to get() with a value_size of 0."""
         return self.get(key)
 
-    def get_multi(self, keys, value_sizes=0):
+    @_measured('get_multi')
+    def get_multi(self, keys, value_sizes=0, chunk_items=None, chunk_bytes=None, inflight=1,
+            timeout=None, deadline=None):
         """
         Gets the values associated with an array of keys.
         If value_sizes is unspecified or set to 0, a first RPC will query the
@@ -162,52 +1100,325 @@ class SDSKVDatabase():
         If value_sizes is a list of ints, this list should be the same length
         as the keys list and each int will be used as a hint of the size of the
         corresponding value.
+        If chunk_items and/or chunk_bytes are set, the values are fetched in chunks
+        of at most chunk_items keys and chunk_bytes bytes, with up to inflight chunks
+        being fetched concurrently. The size of a chunk accounts for its keys and,
+        when known, for the value_sizes hints. The timeout applies to each chunk.
         """
         if(len(keys) == 0):
             return []
+        if(not isinstance(value_sizes, int) and len(keys) != len(value_sizes)):
+            raise ValueError("length of value_sizes differs from length of keys list")
+        keys = self._encode_keys(keys)
+        fetch = lambda k, v: self._timed_call(functools.partial(self._get_multi_raw, k, v),
+                timeout, deadline, True)
+        if(chunk_items is None and chunk_bytes is None):
+            return self._decode_list(fetch(keys, value_sizes))
+        result = []
+        for vals in self._get_multi_chunks(keys, value_sizes, chunk_items, chunk_bytes, inflight,
+                fetch):
+            result.extend(vals)
+        return result
+
+    def iget_multi(self, keys, value_sizes=0, chunk_items=1024, chunk_bytes=None, inflight=2,
+            timeout=None, deadline=None):
+        """
+        Same as get_multi, but returns a generator yielding the values in the order
+        of the keys as chunks arrive, so that only up to inflight chunks of values
+        are held in memory at any time. The timeout applies to each chunk.
+        """
+        if(not isinstance(value_sizes, int) and len(keys) != len(value_sizes)):
+            raise ValueError("length of value_sizes differs from length of keys list")
+        keys = self._encode_keys(keys)
+        fetch = lambda k, v: self._timed_call(functools.partial(self._get_multi_raw, k, v),
+                timeout, deadline, True)
+        for vals in self._get_multi_chunks(keys, value_sizes, chunk_items, chunk_bytes, inflight,
+                fetch):
+            yield from vals
+
+    def _get_multi_chunks(self, keys, value_sizes, chunk_items, chunk_bytes, inflight,
+            fetch=None):
+        if(isinstance(value_sizes, int)):
+            nbytes = lambda i: _nbytes(keys[i]) + value_sizes
+            sizes = lambda start, end: value_sizes
+        else:
+            nbytes = lambda i: _nbytes(keys[i]) + value_sizes[i]
+            sizes = lambda start, end: value_sizes[start:end]
+        chunks = _chunks(len(keys), chunk_items, chunk_bytes, nbytes)
+        if(fetch is None):
+            fetch = self._get_multi_raw
+        return self._pipeline(chunks, inflight,
+                lambda start, end: self._decode_list(fetch(keys[start:end], sizes(start, end))))
+
+    def _get_multi_raw(self, keys, value_sizes=0):
+        """
+        Gets the values (bytes) associated with a list of keys, serving the ones
+        present in the cache from the cache and fetching only the others.
+        """
+        cache = self._cache
+        if(cache is None):
+            return self._fetch_multi(keys, value_sizes)
+        cache_keys = [ _as_bytes(k) for k in keys ]
+        vals = [ cache.get(k) for k in cache_keys ]
+        missing = [ i for i, v in enumerate(vals) if v is None ]
+        if(len(missing) == 0):
+            return vals
+        generation = cache.generation()
+        if(not isinstance(value_sizes, int)):
+            value_sizes = [ value_sizes[i] for i in missing ]
+        fetched = self._fetch_multi([ keys[i] for i in missing ], value_sizes)
+        for i, v in zip(missing, fetched):
+            vals[i] = v
+            # empty values may stand for missing keys, they are not cached
+            if(len(v) != 0):
+                cache.put(cache_keys[i], v, generation)
+        return vals
+
+    def _fetch_multi(self, keys, value_sizes=0):
+        """Fetches the values (bytes) associated with a list of keys from the provider."""
+        if(value_sizes == 0 and self._size_hints is not None):
+            return self._decompress(self._get_multi_hinted(keys))
         if(isinstance(value_sizes, int)):
             value_sizes = [ value_sizes ] * len(keys)
-        if(len(keys) != len(value_sizes)):
-            raise ValueError("length of value_sizes differs from length of keys list")
-        return _pysdskvclient.get_multi(self._sdskv_ph._ph, self._db_id, keys, value_sizes)
+        return self._decompress(self._kv.get_multi(self._sdskv_ph._ph, self._db_id, keys, value_sizes))
+
+    def _get_multi_hinted(self, keys):
+        """Gets multiple values using the size hints provided by the database's SizeHintPolicy."""
+        policy = self._size_hints
+        hints = [ policy.value_hint(k) for k in keys ]
+        vals = None
+        if(0 not in hints):
+            try:
+                vals = self._kv.get_multi(self._sdskv_ph._ph, self._db_id, keys, hints)
+            except SizeError:
+                policy.record_miss()
+        else:
+            policy.record_probe()
+        if(vals is None):
+            vals = self._kv.get_multi(self._sdskv_ph._ph, self._db_id, keys, [0] * len(keys))
+        else:
+            # empty results are ambiguous (the hint may have been too small),
+            # so the sizes of the corresponding values are queried
+            empty = [ i for i, v in enumerate(vals) if len(v) == 0 ]
+            if(len(empty) == 0):
+                policy.record_hit()
+            else:
+                policy.record_miss()
+                refetched = self._kv.get_multi(self._sdskv_ph._ph, self._db_id,
+                        [ keys[i] for i in empty ], [0] * len(empty))
+                for i, v in zip(empty, refetched):
+                    vals[i] = v
+        for k, v in zip(keys, vals):
+            policy.record_value(k, len(v))
+        return vals
+
+    @_measured('get_multi_into')
+    @_timed(idempotent=True)
+    def get_multi_into(self, keys, buffers):
+        """
+        Gets the values associated with a list of keys and writes them directly
+        into a list of writable bytes-like objects (one per key). The size of each
+        buffer is used as the maximum size of the corresponding value.
+        Returns the list of the number of bytes written in each buffer.
+        If the database has a compression, the values are decompressed and then
+        copied into the buffers.
+        """
+        if(len(keys) != len(buffers)):
+            raise ValueError("Number of keys and buffers do not match")
+        if(len(keys) == 0):
+            return []
+        if(self._compression is not None):
+            vals = self._get_multi_raw(self._encode_keys(keys))
+            return [ self._copy_into(v, b) for v, b in zip(vals, buffers) ]
+        return self._kv.get_multi_into(self._sdskv_ph._ph, self._db_id,
+                self._encode_keys(keys), buffers)
 
+    @_measured('length')
+    @_timed(idempotent=True)
     def length(self, key):
         """
         Returns the length of the value associated with a given key.
         Raises a KeyError exception if the key does not exist in the database.
         """
-        l = _pysdskvclient.length(self._sdskv_ph._ph, self._db_id, key)
+        l = self._kv.length(self._sdskv_ph._ph, self._db_id, self._encode_key(key))
         if(l is None):
             raise KeyError(key)
         else:
             return l
 
+    @_measured('length_multi')
+    @_timed(idempotent=True)
     def length_multi(self, keys):
         """
         Returns the lengths of the values associated with the specified list of keys.
         Note that is a key does not exist in the database, the corresponding length
         will be 0 but the function will not fail.
         """
-        return _pysdskvclient.length_multi(self._sdskv_ph._ph, self._db_id, keys)
+        return self._kv.length_multi(self._sdskv_ph._ph, self._db_id,
+                self._encode_keys(keys))
 
+    @_measured('exists')
+    @_timed(idempotent=True)
     def exists(self, key):
         """
         Returns True if the specified key exists in the database, false otherwise.
         """
-        return _pysdskvclient.exists(self._sdskv_ph._ph, self._db_id, key)
+        return self._kv.exists(self._sdskv_ph._ph, self._db_id, self._encode_key(key))
 
+    @_measured('exists_multi')
+    @_timed(idempotent=True)
+    def exists_multi(self, keys, empty_values=True):
+        """
+        Returns a list of booleans indicating whether each of the specified keys
+        exists in the database, using a single length_multi RPC.
+
+        Missing keys and keys with an empty value both have a length of 0, so
+        the existence of each key with a length of 0 is checked with an
+        additional exists RPC. If the database is known not to hold empty
+        values, setting empty_values to False skips these RPCs, keys with an
+        empty value then being reported as missing. Databases opened with a
+        compression never store empty values (every stored value has a
+        header), so they never need the additional RPCs.
+        """
+        if(len(keys) == 0):
+            return []
+        keys = self._encode_keys(keys)
+        lengths = self._kv.length_multi(self._sdskv_ph._ph, self._db_id, keys)
+        result = [ l != 0 for l in lengths ]
+        if(empty_values and self._compression is None):
+            for i, l in enumerate(lengths):
+                if(l == 0):
+                    result[i] = self._kv.exists(self._sdskv_ph._ph, self._db_id, keys[i])
+        return result
+
+    @_measured('erase')
+    @_timed()
     def erase(self, key):
         """
         Erases the key from the database.
         """
-        _pysdskvclient.erase(self._sdskv_ph._ph, self._db_id, key)
+        key = self._encode_key(key)
+        self._kv.erase(self._sdskv_ph._ph, self._db_id, key)
+        self._invalidate(key)
 
     def __delitem__(self, key):
         """Equivalent to erase()."""
         self.erase(key)
 
+    @_measured('erase_multi')
+    def erase_multi(self, keys, chunk_items=None, chunk_bytes=None, inflight=1,
+            timeout=None, deadline=None):
+        """
+        Erases multiple keys from the database in a single RPC. If chunk_items
+        and/or chunk_bytes are set, the keys are sent in chunks of at most
+        chunk_items keys and chunk_bytes bytes, with up to inflight chunks
+        being sent concurrently. The timeout applies to each chunk.
+        """
+        if(len(keys) == 0):
+            return
+        keys = self._encode_keys(keys)
+        erase = lambda k: self._timed_call(functools.partial(self._erase_multi, k),
+                timeout, deadline, False)
+        if(chunk_items is None and chunk_bytes is None):
+            erase(keys)
+            return
+        chunks = _chunks(len(keys), chunk_items, chunk_bytes, lambda i: _nbytes(keys[i]))
+        for _ in self._pipeline(chunks, inflight,
+                lambda start, end: erase(keys[start:end])):
+            pass
+
+    @_measured('erase_prefix')
+    def erase_prefix(self, prefix, keys_per_request=4096, key_size=0, inflight=2,
+            timeout=None, deadline=None):
+        """
+        Erases all the keys starting with prefix. Keys are listed by pages of
+        keys_per_request keys, each page being erased with an erase_multi while
+        the next page is listed, with up to inflight erase_multi in flight.
+        The timeout applies to each RPC. Returns the number of keys erased.
+        """
+        prefix = self._encode_bound(prefix)
+        return self._erase_scan(prefix, None, prefix, keys_per_request, key_size, inflight,
+                timeout, deadline)
+
+    @_measured('erase_range')
+    def erase_range(self, start, end, keys_per_request=4096, key_size=0, inflight=2,
+            timeout=None, deadline=None):
+        """
+        Erases all the keys k such that start <= k < end (end=None meaning no
+        upper bound), the same way as erase_prefix. Returns the number of keys erased.
+        Requires the lexicographic order of keys (see comparator).
+        """
+        self._check_bytewise('erase_range')
+        lo = self._key_bytes(start)
+        hi = None if end is None else self._key_bytes(end)
+        if(hi is not None and lo >= hi):
+            return 0
+        return self._erase_scan(lo, hi, '', keys_per_request, key_size, inflight,
+                timeout, deadline)
+
+    def _erase_scan(self, lo, hi, prefix, keys_per_request, key_size, inflight,
+            timeout=None, deadline=None):
+        """Erases the keys k such that lo <= k < hi and starting with prefix (all encoded)."""
+        call = lambda idempotent, fn, *args: self._timed_call(functools.partial(fn, *args),
+                timeout, deadline, idempotent)
+        count = 0
+        executor = None
+        if(inflight > 1 and self._sdskv_ph._client is not None):
+            executor = self._sdskv_ph._client.executor
+        pending = collections.deque()
+        # listing starts strictly after lo, which belongs to the range
+        if(len(lo) != 0 and call(True, self._kv.exists, self._sdskv_ph._ph, self._db_id, lo)):
+            call(False, self._erase_multi, [ lo ])
+            count += 1
+        after = lo
+        while(True):
+            keys = call(True, self._list_keys, after, prefix, keys_per_request, key_size)
+            done = len(keys) < keys_per_request
+            if(hi is not None and len(keys) != 0 and keys[-1] >= hi):
+                keys = keys[:bisect.bisect_left(keys, hi)]
+                done = True
+            if(len(keys) != 0):
+                count += len(keys)
+                after = keys[-1]
+                if(executor is None):
+                    call(False, self._erase_multi, keys)
+                else:
+                    pending.append(executor.submit(call, False, self._erase_multi, keys))
+                    if(len(pending) >= inflight):
+                        pending.popleft().result()
+            if(done or len(keys) == 0):
+                break
+        while(len(pending) != 0):
+            pending.popleft().result()
+        return count
+
+    def _erase_multi(self, keys):
+        self._kv.erase_multi(self._sdskv_ph._ph, self._db_id, keys)
+        if(self._cache is not None):
+            for key in keys:
+                self._invalidate(key)
+
+    def batch_writer(self, max_items=1024, max_bytes=4*1024*1024, max_delay=None, background=False):
+        """
+        Returns an SDSKVBatchWriter that buffers put() and erase() operations on this
+        database and sends them using put_multi() and erase_multi() once max_items
+        operations or max_bytes bytes are pending, or once the oldest pending operation
+        is max_delay seconds old. It is meant to be used as a context manager:
+
+            with db.batch_writer(max_items=4096) as batch:
+                for k, v in records:
+                    batch[k] = v
+
+        If background is True, flushes happen on a background thread.
+        """
+        from .batch import SDSKVBatchWriter
+        return SDSKVBatchWriter(self, max_items=max_items, max_bytes=max_bytes,
+                max_delay=max_delay, background=background)
+
 
-    def list_keys(self, after='', num_keys=1, prefix='', key_size=0):
+    @_measured('list_keys')
+    @_timed(idempotent=True)
+    def list_keys(self, after='', num_keys=1, prefix='', key_size=0, max_bytes=0):
         """
         Lists up to num_keys keys from the database.
         If "after" is specified, the returned keys will come strictly after
@@ -217,101 +1428,704 @@ class SDSKVDatabase():
         for the maximum size any given key can take. If it is unspecified,
         a first RPC will collect the key sizes before a second RPC actually
         fetches the keys.
+        If max_bytes is non-zero, fewer keys are returned if needed so that their
+        total size does not exceed max_bytes (at least one key is returned if
+        there is one). When sizes are queried, only the keys returned are
+        allocated; with a key_size hint, at most max_bytes // key_size keys are
+        requested.
         """
-        return _pysdskvclient.list_keys(self._sdskv_ph._ph, self._db_id, after, prefix, num_keys, key_size)
+        keys = self._list_keys(self._encode_bound(after), self._encode_bound(prefix),
+                num_keys, key_size, max_bytes)
+        return self._decode_keys(keys)
 
-    def list_keyvals(self, after='', num_keys=1, prefix='', key_size=0, val_size=0):
+    def _list_keys(self, after, prefix, num_keys, key_size=0, max_bytes=0):
+        """Lists keys (bytes) given an encoded start key and prefix."""
+        policy = self._size_hints
+        if(key_size != 0 or policy is None):
+            return self._kv.list_keys(self._sdskv_ph._ph, self._db_id, after, prefix, num_keys, key_size, max_bytes)
+        keys = None
+        key_size = policy.key_hint()
+        if(key_size != 0):
+            try:
+                keys = self._kv.list_keys(self._sdskv_ph._ph, self._db_id, after, prefix, num_keys, key_size, max_bytes)
+                policy.record_hit()
+            except SizeError:
+                policy.record_miss()
+        else:
+            policy.record_probe()
+        if(keys is None):
+            keys = self._kv.list_keys(self._sdskv_ph._ph, self._db_id, after, prefix, num_keys, 0, max_bytes)
+        for k in keys:
+            policy.record_key(len(k))
+        return keys
+
+    @_measured('list_keyvals')
+    @_timed(idempotent=True)
+    def list_keyvals(self, after='', num_keys=1, prefix='', key_size=0, val_size=0, max_bytes=0):
         """
         Lists up to num_keys key/value pairs from the database.
         The semantic of this function is the same as list_keys, but the function
         returns a list of pairs (key, value) and the val_size argument is used to
         hint at the maximum value size. If either key_size or val_size is 0, a first
-        RPC will query the size of the keys and values.
+        RPC will query the size of the keys and values. max_bytes bounds the total
+        size of the keys and values returned (see list_keys).
+        """
+        keys, vals = self._list_keyvals(self._encode_bound(after), self._encode_bound(prefix),
+                num_keys, key_size, val_size, max_bytes)
+        return self._decode_keys(keys), self._decode_values(vals)
+
+    def _list_keyvals(self, after, prefix, num_keys, key_size=0, val_size=0, max_bytes=0):
+        """Lists keys and values (bytes) given an encoded start key and prefix."""
+        policy = self._size_hints
+        if((key_size != 0 and val_size != 0) or policy is None):
+            return self._kv.list_keyvals(self._sdskv_ph._ph, self._db_id, after, prefix, num_keys,
+                    key_size, val_size, max_bytes)
+        result = None
+        key_size = key_size or policy.key_hint()
+        val_size = val_size or policy.value_hint()
+        if(key_size != 0 and val_size != 0):
+            try:
+                result = self._kv.list_keyvals(self._sdskv_ph._ph, self._db_id, after, prefix, num_keys,
+                        key_size, val_size, max_bytes)
+                policy.record_hit()
+            except SizeError:
+                policy.record_miss()
+        else:
+            policy.record_probe()
+        if(result is None):
+            result = self._kv.list_keyvals(self._sdskv_ph._ph, self._db_id, after, prefix, num_keys,
+                    0, 0, max_bytes)
+        keys, vals = result
+        for k, v in zip(keys, vals):
+            policy.record_key(len(k))
+            policy.record_value(k, len(v))
+        return keys, vals
+
+    @_measured('put_packed')
+    @_timed()
+    def put_packed(self, keys, key_sizes, values, value_sizes):
+        """
+        Puts multiple key value pairs provided in packed form: keys is a single
+        bytes-like object holding all the keys back to back, key_sizes gives the
+        size of each key, and similarly for values and value_sizes. The sizes can
+        be lists of ints or buffers of 64-bit unsigned integers (e.g. numpy uint64
+        arrays, whose numpy.cumsum gives the offsets of the items).
+        """
+        key_sizes = _packed_sizes(key_sizes)
+        self._kv.put_packed(self._sdskv_ph._ph, self._db_id,
+                keys, key_sizes, values, _packed_sizes(value_sizes))
+        if(self._cache is not None):
+            for key in _unpack(keys, memoryview(key_sizes).cast('B').cast('Q')):
+                self._invalidate(key)
+
+    @_measured('get_packed')
+    @_timed(idempotent=True)
+    def get_packed(self, keys, key_sizes, buffer_size=0):
+        """
+        Gets the values associated with keys provided in packed form (see
+        put_packed). Returns a pair (values, value_sizes) where values is a bytes
+        object holding the values back to back and value_sizes is a memoryview of
+        64-bit unsigned integers holding their sizes. buffer_size is the size of
+        the buffer allocated to receive the values; if 0, a first RPC queries the
+        size of the values.
+        """
+        values, value_sizes = self._kv.get_packed(self._sdskv_ph._ph, self._db_id,
+                keys, _packed_sizes(key_sizes), buffer_size)
+        return values, memoryview(value_sizes).cast('Q')
+
+    @_measured('list_keyvals_packed')
+    @_timed(idempotent=True)
+    def list_keyvals_packed(self, after='', num_keys=1, prefix='', key_size=0, val_size=0, max_bytes=0):
+        """
+        Same as list_keyvals, but returns the keys and values in packed form:
+        a tuple (keys, key_sizes, values, value_sizes) where keys and values are
+        bytes objects holding the keys (respectively values) back to back, and
+        key_sizes and value_sizes are memoryviews of 64-bit unsigned integers.
+        """
+        keys, key_sizes, vals, val_sizes = self._kv.list_keyvals_packed(
+                self._sdskv_ph._ph, self._db_id, self._encode_bound(after),
+                self._encode_bound(prefix), num_keys, key_size, val_size, max_bytes)
+        return keys, memoryview(key_sizes).cast('Q'), vals, memoryview(val_sizes).cast('Q')
+
+    @_timed()
+    def put_array(self, key, array):
+        """
+        Stores a numpy array as the value associated with a key. The value holds
+        a small header (dtype, shape, memory order) followed by the raw content
+        of the array (see the pysdskv.arrays module).
+        """
+        self.put(key, arrays.pack(array))
+
+    @_timed(idempotent=True)
+    def get_array(self, key, value_size=0):
+        """
+        Loads a numpy array stored with put_array(). The returned array is a
+        read-only view of the received value, no copy is made.
+        Raises a KeyError if the key does not exist.
+        """
+        val = self._get_raw(self._encode_key(key), value_size)
+        if(val is None):
+            raise KeyError(key)
+        return arrays.unpack(val)
+
+    def put_arrays(self, keys, array_list, **kwargs):
         """
-        return _pysdskvclient.list_keyvals(self._sdskv_ph._ph, self._db_id, after, prefix, num_keys, key_size, val_size)
+        Stores multiple numpy arrays in a single put_multi call (additional
+        arguments, e.g. chunk_bytes, are passed to put_multi).
+        """
+        self.put_multi(keys, [ arrays.pack(a) for a in array_list ], **kwargs)
+
+    @_timed(idempotent=True)
+    def get_arrays(self, keys, value_sizes=0):
+        """
+        Loads multiple numpy arrays stored with put_array() or put_arrays(),
+        as read-only views of the received values.
+        """
+        if(len(keys) == 0):
+            return []
+        return [ arrays.unpack(v) for v in self._get_multi_raw(self._encode_keys(keys), value_sizes) ]
 
     def migrate(self, dest_addr_str, dest_provider_id, dest_root, remove_source=False):
         """
         Asks the provider to migrate the database to a destination provider given its
         address and provider id, and a destination root path where to place the database files.
         If remove_source is True, this database instance will not be valid after the migration.
+        The migration is done by the providers in a single operation; see copy_to() and
+        rebalance() for a client-driven, parallel and resumable alternative.
+        """
+        _pysdskvclient.migrate_database(self._sdskv_ph._ph, self._db_id, dest_addr_str, dest_provider_id, dest_root, remove_source)
+
+    def copy_to(self, dest, boundaries=1, prefix='', start=None, end=None, workers=4,
+            keys_per_request=1024, key_size=0, val_size=0, checkpoint=None,
+            progress=None, erase_source=False):
         """
-        _pysdskvclient.migrate_database(self._sdskv_ph._ph, self._db, dest_addr, dest_provider_id, dest_root, remove_source)
+        Copies the entries of this database (or only the ones starting with prefix,
+        and/or in the range [start, end)) into the dest SDSKVDatabase, which may be
+        held by another provider. The key space is split into ranges [lo, b[0]),
+        [b[0], b[1]), ..., [b[n-1], hi) by the split keys given by boundaries (a
+        sorted list of keys, or an int as for parallel_scan), which are copied
+        concurrently by up to workers threads, each holding at most one page of
+        keys_per_request entries.
+
+        If checkpoint is the path of a file, the progress of each range is saved
+        in this file, and calling copy_to() again with the same arguments resumes
+        an interrupted copy. progress, if set, is called with a dictionary of
+        statistics (see SDSKVTransfer.stats) after each page.
+
+        If erase_source is True, the entries are erased from this database once
+        copied (see rebalance). Returns the final statistics.
+
+        Split keys, start and end require the lexicographic order of keys
+        (see comparator).
+        """
+        from .transfer import SDSKVTransfer
+        transfer = SDSKVTransfer(self, dest, boundaries=boundaries, prefix=prefix,
+                start=start, end=end, workers=workers, keys_per_request=keys_per_request,
+                key_size=key_size, val_size=val_size, checkpoint=checkpoint,
+                progress=progress, erase_source=erase_source)
+        return transfer.run()
+
+    def rebalance(self, dest, start=None, end=None, **kwargs):
+        """
+        Moves the entries in the range [start, end) (None meaning unbounded)
+        to the dest SDSKVDatabase: same as copy_to() with erase_source=True.
+        """
+        return self.copy_to(dest, start=start, end=end, erase_source=True, **kwargs)
+
+    def export(self, path, prefix='', compression=None, level=None, block_bytes=4*1024*1024,
+            keys_per_request=4096, key_size=0, val_size=0):
+        """
+        Writes the entries of the database (or only the ones starting with prefix)
+        into a binary file (see the pysdskv.export module), streaming them by pages
+        of keys_per_request entries. compression can be None, 'zlib' or 'lzma'
+        (level being the compression level), and is applied per block of about
+        block_bytes bytes. Returns the number of records written.
+        """
+        from . import export
+        return export.export(self, path, prefix=prefix, compression=compression,
+                level=level, block_bytes=block_bytes, keys_per_request=keys_per_request,
+                key_size=key_size, val_size=val_size)
+
+    def import_(self, path, inflight=4):
+        """
+        Loads the records of a file written by export() into the database. The
+        file is mapped in memory and each of its blocks is sent with a put_multi,
+        up to inflight blocks being decompressed and sent concurrently.
+        Returns the number of records loaded.
+        """
+        from . import export
+        return export.import_(self, path, inflight=inflight)
 
     def get_id(self):
         """Get the internal database id."""
         return self._db_id
 
-    def keys(self, after='', keys_per_request=1, prefix='', key_size=0):
-        """Returns a convenient iterator that will call list_keys to get the next keys."""
+    def stats(self, count_keys=False, max_keys=None):
+        """
+        Queries the statistics of this database from its provider: name, type,
+        path and, if count_keys is True (which scans the database, up to
+        max_keys keys), number of keys, approximate size and rates of change
+        (see SDSKVProvider.stats).
+        """
+        return self._sdskv_ph._stats(self._db_id, count_keys, max_keys)
+
+    def keys(self, after='', keys_per_request=1, prefix='', key_size=0,
+            prefetch=True, target_bytes=None, start=None, end=None, max_bytes=0,
+            timeout=None, deadline=None):
+        """
+        Returns a convenient iterator that will call list_keys to get the next keys.
+        If prefetch is True, the next page of keys is fetched in the background while
+        the current one is consumed. If target_bytes is set, keys_per_request is only
+        the initial page size and is adjusted to approach target_bytes per request.
+        start (inclusive, replacing after) and end (exclusive) restrict the
+        iteration to a range of keys, compared in their stored form (e.g. in the
+        order of the tuples with a pysdskv.keys.TupleCodec key codec); they
+        require the lexicographic order of keys (see comparator).
+        If max_bytes is non-zero, each page is also limited to max_bytes bytes
+        (see list_keys), bounding the memory used by a page whatever the size
+        of the entries. The timeout applies to the request of each page, the
+        deadline to the whole iteration.
+        """
         return SDSKVIterator(self, after=after, prefix=prefix,
                 items_per_request=keys_per_request,
                 include_values=False, 
-                key_size=key_size, val_size=0)
+                key_size=key_size, val_size=0,
+                prefetch=prefetch, target_bytes=target_bytes,
+                start=start, end=end, max_bytes=max_bytes,
+                timeout=timeout, deadline=deadline)
 
-    def items(self, after='', keys_per_request=1, prefix='', key_size=0, val_size=0):
-        """Returns a convenient iterator that will call list_keyvals to get the next keys and values."""
+    def items(self, after='', keys_per_request=1, prefix='', key_size=0, val_size=0,
+            prefetch=True, target_bytes=None, start=None, end=None, max_bytes=0,
+            timeout=None, deadline=None):
+        """
+        Returns a convenient iterator that will call list_keyvals to get the next keys
+        and values. See keys() for the meaning of prefetch, target_bytes, start, end,
+        max_bytes, timeout and deadline.
+        """
         return SDSKVIterator(self, after=after, prefix=prefix,
                 items_per_request=keys_per_request,
                 include_values=True,
-                key_size=key_size, val_size=val_size)
-        
+                key_size=key_size, val_size=val_size,
+                prefetch=prefetch, target_bytes=target_bytes,
+                start=start, end=end, max_bytes=max_bytes,
+                timeout=timeout, deadline=deadline)
+
+    def parallel_scan(self, boundaries, workers=4, prefix='', include_values=True,
+            keys_per_request=1024, key_size=0, val_size=0, timeout=None, deadline=None):
+        """
+        Scans the database (or only the keys starting with prefix) by splitting the
+        key space into ranges that are scanned concurrently by up to workers threads.
+
+        boundaries is either a sorted list of split keys, or an int N, in which case
+        N-1 split keys are placed uniformly over the values of the byte following the
+        prefix. Given split keys b[0] < ... < b[n-1], the ranges are [prefix, b[0]),
+        [b[0], b[1]), ..., [b[n-1], end of prefix), each range including its first
+        key and excluding its last one, as in copy_to(). Split keys require the
+        lexicographic order of keys (see comparator).
+
+        Returns a generator yielding the keys (or (key, value) pairs if include_values
+        is True) in key order. Ranges are scanned at most workers ranges ahead of the
+        one being consumed and each range is held in memory until consumed, so using
+        more ranges than workers bounds memory usage. The timeout applies to each
+        page request, the deadline to the whole scan.
+        """
+        prefix = self._encode_bound(prefix)
+        boundaries = self._split_keys(boundaries, prefix)
+        if(len(boundaries) != 0):
+            self._check_bytewise('parallel_scan with boundaries')
+        ranges = list(zip([ prefix ] + boundaries, boundaries + [ None ]))
+        return self._parallel_scan(ranges, workers, prefix, include_values,
+                keys_per_request, key_size, val_size, timeout, deadline)
+
+    def _split_keys(self, boundaries, prefix):
+        """
+        Returns the sorted split keys (bytes) given by boundaries, either a list of
+        keys or an int N for N-1 keys spread over the byte following the encoded prefix.
+        """
+        if(isinstance(boundaries, int)):
+            p = _as_bytes(prefix)
+            return sorted(set(p + bytes([ (i * 256) // boundaries ]) for i in range(1, boundaries)))
+        return [ self._key_bytes(b) for b in boundaries ]
+
+    def _parallel_scan(self, ranges, workers, prefix, include_values,
+            keys_per_request, key_size, val_size, timeout, deadline):
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = collections.deque()
+            for lo, hi in ranges:
+                pending.append(executor.submit(self._scan_range, lo, hi, prefix,
+                    include_values, keys_per_request, key_size, val_size, timeout, deadline))
+                if(len(pending) >= workers):
+                    yield from pending.popleft().result()
+            while(len(pending) != 0):
+                yield from pending.popleft().result()
+
+    def _scan_range(self, lo, hi, prefix, include_values,
+            keys_per_request, key_size, val_size, timeout=None, deadline=None):
+        """
+        Returns the entries whose stored key k satisfies lo <= k < hi
+        (hi=None means no bound), lo, hi and prefix being encoded keys.
+        """
+        call = lambda fn, *args: self._timed_call(functools.partial(fn, *args),
+                timeout, deadline, True)
+        keys = []
+        vals = []
+        # listing starts strictly after lo, which belongs to the range
+        first = _as_bytes(lo)
+        if(len(first) != 0 and first.startswith(_as_bytes(prefix))):
+            if(include_values):
+                val = call(self._get_stored, first)
+                if(val is not None):
+                    keys.append(first)
+                    vals.append(val)
+            elif(call(self._kv.exists, self._sdskv_ph._ph, self._db_id, first)):
+                keys.append(first)
+        after = lo
+        while(True):
+            if(include_values):
+                page, page_vals = call(self._list_keyvals, after, prefix, keys_per_request,
+                        key_size, val_size)
+            else:
+                page = call(self._list_keys, after, prefix, keys_per_request, key_size)
+            done = len(page) < keys_per_request
+            if(hi is not None and len(page) != 0 and page[-1] >= hi):
+                end = bisect.bisect_left(page, hi)
+                page = page[:end]
+                if(include_values):
+                    page_vals = page_vals[:end]
+                done = True
+            keys.extend(page)
+            if(include_values):
+                vals.extend(page_vals)
+            if(done or len(page) == 0):
+                break
+            after = page[-1]
+        if(include_values):
+            return list(zip(self._decode_keys(keys), self._decode_values(vals)))
+        return self._decode_keys(keys)
+
+    def _run_async(self, method, *args, **kwargs):
+        """
+        Schedules a call to one of the blocking methods of this database on the
+        client's worker pool and returns an awaitable for its result.
+
+        This is run_in_executor, not a non-blocking forward: the SDSKV client
+        library (and so client.cpp) has no asynchronous RPC, so each call
+        occupies a worker thread while it waits for the provider and hops
+        between that thread and the event loop. The number of concurrent a*
+        operations is bounded by the client's max_workers, and each one adds
+        a thread handoff to the latency of the RPC.
+        """
+        loop = asyncio.get_running_loop()
+        executor = self._sdskv_ph._client.executor
+        return loop.run_in_executor(executor,
+                functools.partial(method, *args, **kwargs))
+
+    async def aput(self, key, value, timeout=None, deadline=None):
+        """Asynchronous version of put()."""
+        return await self._run_async(self.put, key, value,
+                timeout=timeout, deadline=deadline)
+
+    async def aput_multi(self, keys, values, timeout=None, deadline=None):
+        """Asynchronous version of put_multi()."""
+        return await self._run_async(self.put_multi, keys, values,
+                timeout=timeout, deadline=deadline)
+
+    async def aget(self, key, value_size=0, timeout=None, deadline=None):
+        """Asynchronous version of get()."""
+        return await self._run_async(self.get, key, value_size,
+                timeout=timeout, deadline=deadline)
+
+    async def aget_multi(self, keys, value_sizes=0, timeout=None, deadline=None):
+        """Asynchronous version of get_multi()."""
+        return await self._run_async(self.get_multi, keys, value_sizes,
+                timeout=timeout, deadline=deadline)
+
+    async def alength(self, key, timeout=None, deadline=None):
+        """Asynchronous version of length()."""
+        return await self._run_async(self.length, key,
+                timeout=timeout, deadline=deadline)
+
+    async def alength_multi(self, keys, timeout=None, deadline=None):
+        """Asynchronous version of length_multi()."""
+        return await self._run_async(self.length_multi, keys,
+                timeout=timeout, deadline=deadline)
+
+    async def aexists(self, key, timeout=None, deadline=None):
+        """Asynchronous version of exists()."""
+        return await self._run_async(self.exists, key,
+                timeout=timeout, deadline=deadline)
+
+    async def aerase(self, key, timeout=None, deadline=None):
+        """Asynchronous version of erase()."""
+        return await self._run_async(self.erase, key,
+                timeout=timeout, deadline=deadline)
+
+    async def alist_keys(self, after='', num_keys=1, prefix='', key_size=0, max_bytes=0,
+            timeout=None, deadline=None):
+        """Asynchronous version of list_keys()."""
+        return await self._run_async(self.list_keys,
+                after=after, num_keys=num_keys, prefix=prefix, key_size=key_size,
+                max_bytes=max_bytes, timeout=timeout, deadline=deadline)
+
+    async def alist_keyvals(self, after='', num_keys=1, prefix='', key_size=0, val_size=0,
+            max_bytes=0, timeout=None, deadline=None):
+        """Asynchronous version of list_keyvals()."""
+        return await self._run_async(self.list_keyvals,
+                after=after, num_keys=num_keys, prefix=prefix,
+                key_size=key_size, val_size=val_size, max_bytes=max_bytes,
+                timeout=timeout, deadline=deadline)
+
+    def akeys(self, after='', keys_per_request=1, prefix='', key_size=0,
+            prefetch=True, target_bytes=None, start=None, end=None, max_bytes=0,
+            timeout=None, deadline=None):
+        """
+        Returns an asynchronous iterator (async for) over the keys of the
+        database. The arguments have the same meaning as for keys().
+        """
+        return SDSKVAsyncIterator(self, after=after, prefix=prefix,
+                items_per_request=keys_per_request,
+                include_values=False,
+                key_size=key_size, val_size=0,
+                prefetch=prefetch, target_bytes=target_bytes,
+                start=start, end=end, max_bytes=max_bytes,
+                timeout=timeout, deadline=deadline)
+
+    def aitems(self, after='', keys_per_request=1, prefix='', key_size=0, val_size=0,
+            prefetch=True, target_bytes=None, start=None, end=None, max_bytes=0,
+            timeout=None, deadline=None):
+        """
+        Returns an asynchronous iterator (async for) over the key/value pairs
+        of the database. The arguments have the same meaning as for items().
+        """
+        return SDSKVAsyncIterator(self, after=after, prefix=prefix,
+                items_per_request=keys_per_request,
+                include_values=True,
+                key_size=key_size, val_size=val_size,
+                prefetch=prefetch, target_bytes=target_bytes,
+                start=start, end=end, max_bytes=max_bytes,
+                timeout=timeout, deadline=deadline)
 
 
 class SDSKVIterator():
     """This SDSKVIterator is returned by SDSKVDatabase's keys() and items() methods
-    to enable iteration over the database's entries."""
+    to enable iteration over the database's entries.
+
+    The iterator fetches entries by pages of items_per_request items. If prefetch
+    is enabled, the next page is requested on the client's worker pool as soon
+    as the current page has arrived, so that the RPC overlaps with the consumption
+    of the current page. If target_bytes is set, the number of items per request
+    is adjusted after each page so that pages approach this size in bytes. If
+    max_bytes is set, no page exceeds this size (unless it holds a single item)."""
 
     def __init__(self, db, after='', prefix='',
             items_per_request=1, include_values=False,
-            key_size=0, val_size=0):
+            key_size=0, val_size=0,
+            prefetch=True, target_bytes=None,
+            min_items_per_request=1, max_items_per_request=65536,
+            start=None, end=None, max_bytes=0, timeout=None, deadline=None):
         """
         Constructor. Should not be called by users.
         Users should call keys() or items() on the Database instance.
         """
         self._db = db
-        self._after = after
-        self._prefix = prefix
+        self._after = db._encode_bound(after)
+        self._prefix = db._encode_bound(prefix)
+        self._start = None
+        self._end = None
+        if(start is not None or end is not None):
+            db._check_bytewise('iterating from start or to end')
+        if(start is not None):
+            if(not (isinstance(after, (str, bytes)) and len(after) == 0)):
+                raise ValueError("after and start cannot be both specified")
+            self._start = db._key_bytes(start)
+            self._after = self._start
+        if(end is not None):
+            self._end = db._key_bytes(end)
         self._items_per_request = items_per_request
         self._include_values = include_values
         self._needs_to_stop = False
         self._key_size = key_size
         self._val_size = val_size
-        self._cache_keys = []
-        self._cache_vals = []
+        self._target_bytes = target_bytes
+        self._max_bytes = max_bytes
+        self._min_items_per_request = min_items_per_request
+        self._max_items_per_request = max_items_per_request
+        self._executor = None
+        if(prefetch and db._sdskv_ph._client is not None):
+            self._executor = db._sdskv_ph._client.executor
+        self._timeout = timeout
+        self._deadline = deadline
+        self._pending = None
+        self._cache = collections.deque()
 
     def __iter__(self):
         return self
 
     def __next__(self):
-        if(len(self._cache_keys) == 0 and self._needs_to_stop):
-            raise StopIteration
-        if(len(self._cache_keys) == 0):
-            if(self._include_values):
-                self._cache_keys, self._cache_vals = self._db.list_keyvals(
-                                    after=self._after,
-                                    num_keys=self._items_per_request,
-                                    prefix=self._prefix,
-                                    key_size=self._key_size,
-                                    val_size=self._val_size)
-            else:
-                self._cache_keys = self._db.list_keys(
-                                    after=self._after,
-                                    num_keys=self._items_per_request,
-                                    prefix=self._prefix,
-                                    key_size=self._key_size)
-        if(len(self._cache_keys) == 0):
+        if(len(self._cache) == 0):
+            self._next_page()
+        if(len(self._cache) == 0):
             raise StopIteration
-        if(len(self._cache_vals) != self._items_per_request):
+        return self._cache.popleft()
+
+    @property
+    def items_per_request(self):
+        """Number of items requested by the next page."""
+        return self._items_per_request
+
+    def _call(self, fn, *args):
+        """Calls fn(*args) with the timeout and deadline of the iteration."""
+        return self._db._timed_call(functools.partial(fn, *args),
+                self._timeout, self._deadline, True)
+
+    def _fetch(self, after, num_items):
+        """Fetches a page of num_items items (as bytes) after the given key."""
+        return self._call(self._list_page, after, num_items)
+
+    def _list_page(self, after, num_items):
+        if(self._include_values):
+            keys, vals = self._db._list_keyvals(after, self._prefix, num_items,
+                    self._key_size, self._val_size, self._max_bytes)
+        else:
+            keys = self._db._list_keys(after, self._prefix, num_items, self._key_size,
+                    self._max_bytes)
+            vals = None
+        return num_items, keys, vals
+
+    def _fetch_start(self):
+        """
+        Listing returns the keys strictly after a given key, so the start key
+        of the range, which is included in the range, is looked up first.
+        """
+        start = self._start
+        self._start = None
+        if(self._end is not None and start >= self._end):
             self._needs_to_stop = True
-        self._after = self._cache_keys[-1]
+            return
+        if(self._prefix and not start.startswith(_as_bytes(self._prefix))):
+            return
+        db = self._db
         if(self._include_values):
-            return self._cache_keys.pop(0), self._cache_vals.pop(0)
+            val = self._call(db._get_raw, start)
+            if(val is not None):
+                self._cache.append((db._decode_keys([ start ])[0], db._decode(val)))
+        elif(self._call(db._kv.exists, db._sdskv_ph._ph, db._db_id, start)):
+            self._cache.append(db._decode_keys([ start ])[0])
+
+    def _next_page(self):
+        """Fills the cache with the next page, and starts prefetching the following one."""
+        if(self._start is not None):
+            self._fetch_start()
+            if(len(self._cache) != 0):
+                return
+        while(len(self._cache) == 0):
+            if(self._pending is not None):
+                page = self._pending.result()
+                self._pending = None
+            elif(not self._needs_to_stop):
+                page = self._fetch(self._after, self._items_per_request)
+            else:
+                return
+            if(not self._add_page(*page)):
+                return
+
+    def _add_page(self, num_items, keys, vals):
+        """
+        Adds a page returned by _fetch() to the cache and starts prefetching
+        the following one. Returns False if the page was empty.
+        """
+        # a page cut by max_bytes may be short without being the last one
+        if(len(keys) < num_items and (self._max_bytes == 0 or len(keys) == 0)):
+            self._needs_to_stop = True
+        if(self._end is not None and len(keys) != 0 and keys[-1] >= self._end):
+            count = bisect.bisect_left(keys, self._end)
+            keys = keys[:count]
+            if(vals is not None):
+                vals = vals[:count]
+            self._needs_to_stop = True
+        if(len(keys) == 0):
+            return False
+        self._after = keys[-1]
+        self._adapt(keys, vals)
+        if(self._executor is not None and not self._needs_to_stop):
+            self._pending = self._executor.submit(self._fetch,
+                    self._after, self._items_per_request)
+        if(vals is None):
+            self._cache.extend(self._db._decode_keys(keys))
         else:
-            return self._cache_keys.pop(0)
+            self._cache.extend(zip(self._db._decode_keys(keys), self._db._decode_values(vals)))
+        return True
+
+    def _adapt(self, keys, vals):
+        """Adjusts the number of items per request toward the target page size."""
+        if(self._target_bytes is None):
+            return
+        page_bytes = sum(map(len, keys))
+        if(vals is not None):
+            page_bytes += sum(map(len, vals))
+        item_bytes = max(1, page_bytes // len(keys))
+        n = self._target_bytes // item_bytes
+        n = min(n, 2 * self._items_per_request)
+        n = max(n, self._items_per_request // 2)
+        n = min(n, self._max_items_per_request)
+        self._items_per_request = max(n, self._min_items_per_request)
+
+
+class SDSKVAsyncIterator():
+    """This SDSKVAsyncIterator is returned by SDSKVDatabase's akeys() and aitems()
+    methods to enable asynchronous iteration (async for) over the database's entries.
+
+    It pages through the database like an SDSKVIterator and accepts the same
+    options (prefetch, target_bytes, start, end, max_bytes). Pages are requested on the
+    client's worker pool; a prefetched page is awaited without occupying a
+    worker thread, and pages are decoded (e.g. decompressed) in the thread
+    running the event loop."""
+
+    def __init__(self, db, **kwargs):
+        """
+        Constructor. Should not be called by users.
+        Users should call akeys() or aitems() on the Database instance.
+        """
+        self._db = db
+        self._iterator = SDSKVIterator(db, **kwargs)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        it = self._iterator
+        if(len(it._cache) == 0):
+            await self._next_page()
+        if(len(it._cache) == 0):
+            raise StopAsyncIteration
+        return it._cache.popleft()
+
+    @property
+    def items_per_request(self):
+        """Number of items requested by the next page."""
+        return self._iterator.items_per_request
+
+    async def _next_page(self):
+        """Same as SDSKVIterator._next_page(), awaiting the pages."""
+        it = self._iterator
+        if(it._start is not None):
+            await self._db._run_async(it._fetch_start)
+            if(len(it._cache) != 0):
+                return
+        while(len(it._cache) == 0):
+            if(it._pending is not None):
+                page = await asyncio.wrap_future(it._pending)
+                it._pending = None
+            elif(not it._needs_to_stop):
+                page = await self._db._run_async(it._fetch, it._after, it._items_per_request)
+            else:
+                return
+            if(not it._add_page(*page)):
+                return
 
 
 Iterator = SDSKVIterator
+AsyncIterator = SDSKVAsyncIterator
 Client = SDSKVClient
 ProviderHandle = SDSKVProviderHandle
 Database = SDSKVDatabase
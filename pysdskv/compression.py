@@ -0,0 +1,183 @@
+# (C) 2018 The University of Chicago
+# See COPYRIGHT in top-level directory.
+"""
+Compression of the values of a database. A database opened with an
+SDSKVCompression stores each value with a one-byte header giving the codec
+the rest of the value is compressed with, 0 meaning that the value is
+stored as is. Values smaller than the threshold, or that do not shrink, are
+stored uncompressed, so compressed and uncompressed values coexist.
+
+Codecs are identified by a name and a header byte; zlib and lzma are always
+available, and zstd and lz4 are registered when the zstandard and lz4
+packages are installed. Other codecs can be added with register_codec().
+"""
+import lzma
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+RAW = 0
+
+_codecs_by_name = {}
+_codecs_by_id = {}
+
+
+class _Codec():
+
+    __slots__ = ('codec_id', 'name', 'compress', 'decompress')
+
+    def __init__(self, codec_id, name, compress, decompress):
+        self.codec_id = codec_id
+        self.name = name
+        self.compress = compress
+        self.decompress = decompress
+
+
+def register_codec(codec_id, name, compress, decompress):
+    """
+    Registers a codec. codec_id (1 to 255) is the header byte identifying
+    values compressed with the codec, and should never be reused for another
+    codec since it is stored in the databases. compress(data, level) and
+    decompress(data) take and return bytes-like objects.
+    """
+    if(not 0 < codec_id < 256):
+        raise ValueError("codec ids should be in [1, 255]")
+    existing = _codecs_by_id.get(codec_id)
+    if(existing is not None and existing.name != name):
+        raise ValueError("codec id {} is already used by {}".format(codec_id, existing.name))
+    codec = _Codec(codec_id, name, compress, decompress)
+    _codecs_by_id[codec_id] = codec
+    _codecs_by_name[name] = codec
+
+
+def codecs():
+    """Returns the names of the registered codecs."""
+    return sorted(_codecs_by_name)
+
+
+register_codec(1, 'zlib',
+        lambda data, level: zlib.compress(data, 6 if level is None else level),
+        zlib.decompress)
+register_codec(2, 'lzma',
+        lambda data, level: lzma.compress(data, preset=level),
+        lzma.decompress)
+try:
+    import zstandard
+    register_codec(3, 'zstd',
+            lambda data, level: zstandard.ZstdCompressor(level=3 if level is None else level).compress(data),
+            lambda data: zstandard.ZstdDecompressor().decompress(data))
+except ImportError:
+    pass
+try:
+    import lz4.frame
+    register_codec(4, 'lz4',
+            lambda data, level: lz4.frame.compress(data, compression_level=level or 0),
+            lz4.frame.decompress)
+except ImportError:
+    pass
+
+
+class SDSKVCompression():
+    """
+    The SDSKVCompression compresses the values written to a database and
+    decompresses the values read from it (see SDSKVDatabase.compression).
+
+    Batches whose total size exceeds parallel_bytes are compressed and
+    decompressed on a pool of worker threads; the zlib and lzma modules
+    release the GIL while they work.
+    """
+
+    def __init__(self, codec='zlib', level=None, threshold=256,
+            workers=4, parallel_bytes=1024*1024):
+        """
+        Constructor.
+
+        Args:
+            codec (str): name of the codec used to compress values.
+            level (int): compression level (None for the codec's default).
+            threshold (int): values smaller than this size are not compressed.
+            workers (int): number of threads compressing batches.
+            parallel_bytes (int): minimum size of a batch compressed in parallel.
+        """
+        if(codec not in _codecs_by_name):
+            raise ValueError("unknown codec {} (available: {})".format(codec, ', '.join(codecs())))
+        self._codec = _codecs_by_name[codec]
+        self._level = level
+        self._threshold = threshold
+        self._workers = workers
+        self._parallel_bytes = parallel_bytes
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def codec(self):
+        """Name of the codec used to compress values."""
+        return self._codec.name
+
+    @property
+    def threshold(self):
+        """Size under which values are stored uncompressed."""
+        return self._threshold
+
+    def __del__(self):
+        if(getattr(self, '_executor', None) is not None):
+            self._executor.shutdown(wait=False)
+
+    def encode(self, value):
+        """Returns the stored form (header byte and payload) of a value."""
+        if(isinstance(value, str)):
+            value = value.encode('utf-8')
+        view = memoryview(value).cast('B')
+        if(len(view) >= self._threshold):
+            compressed = self._codec.compress(view, self._level)
+            if(len(compressed) < len(view)):
+                return bytes([ self._codec.codec_id ]) + compressed
+        return b'\x00' + view.tobytes()
+
+    def decode(self, data):
+        """
+        Returns the value (bytes) stored as data. An empty data, which is what
+        SDSKV returns for missing keys in batches, is returned as is.
+        """
+        if(len(data) == 0):
+            return data
+        header = data[0]
+        if(header == RAW):
+            return data[1:]
+        codec = _codecs_by_id.get(header)
+        if(codec is None):
+            raise ValueError("value compressed with unknown codec id {}".format(header))
+        return codec.decompress(memoryview(data)[1:])
+
+    def encode_multi(self, values):
+        """Same as encode() for a list of values."""
+        return self._map(self.encode, values)
+
+    def decode_multi(self, values):
+        """Same as decode() for a list of values."""
+        return self._map(self.decode, values)
+
+    def _map(self, fn, values):
+        if(len(values) < 2 or self._workers <= 1):
+            return [ fn(v) for v in values ]
+        size = 0
+        for v in values:
+            size += len(v)
+            if(size >= self._parallel_bytes):
+                break
+        else:
+            return [ fn(v) for v in values ]
+        with self._lock:
+            if(self._executor is None):
+                self._executor = ThreadPoolExecutor(max_workers=self._workers,
+                        thread_name_prefix='pysdskv-compression')
+        chunk = (len(values) + self._workers - 1) // self._workers
+        parts = self._executor.map(lambda start: [ fn(v) for v in values[start:start+chunk] ],
+                range(0, len(values), chunk))
+        result = []
+        for part in parts:
+            result.extend(part)
+        return result
+
+
+Compression = SDSKVCompression
@@ -0,0 +1,288 @@
+# (C) 2018 The University of Chicago
+# See COPYRIGHT in top-level directory.
+"""
+Binary export format of a database, written by SDSKVDatabase.export() and
+loaded by SDSKVDatabase.import_().
+
+A file starts with a header (magic, version, compression) followed by blocks
+of records, an index and a trailer:
+
+    header:  b'SKVX' | version (u8) | compression (u8) | reserved (u16)
+    block:   stored size (u64) | size (u64) | record count (u32) | data
+    index:   block count (u64), then for each block:
+             offset (u64) | record count (u32) | first key size (u32) | first key
+    trailer: index offset (u64) | record count (u64) | b'SKVX'
+
+The data of a block is a sequence of records, each being key size (u32),
+value size (u64), key and value, possibly compressed as a whole. Blocks are
+independent so they can be decompressed and loaded concurrently. All the
+integers are little-endian.
+"""
+import lzma
+import mmap
+import struct
+import zlib
+
+MAGIC = b'SKVX'
+VERSION = 1
+
+NONE = 0
+ZLIB = 1
+LZMA = 2
+
+_COMPRESSIONS = { None: NONE, 'none': NONE, 'zlib': ZLIB, 'lzma': LZMA }
+
+_HEADER = struct.Struct('<4sBBH')
+_BLOCK = struct.Struct('<QQI')
+_RECORD = struct.Struct('<IQ')
+_INDEX_COUNT = struct.Struct('<Q')
+_INDEX_ENTRY = struct.Struct('<QII')
+_TRAILER = struct.Struct('<QQ4s')
+
+
+def _compress(codec, data, level):
+    if(codec == ZLIB):
+        return zlib.compress(data, 6 if level is None else level)
+    if(codec == LZMA):
+        return lzma.compress(data, preset=level)
+    return data
+
+
+def _decompress(codec, data):
+    if(codec == ZLIB):
+        return zlib.decompress(data)
+    if(codec == LZMA):
+        return lzma.decompress(data)
+    return data
+
+
+class _Writer():
+    """Writes records into an export file, block by block."""
+
+    def __init__(self, f, compression, level, block_bytes):
+        if(compression not in _COMPRESSIONS):
+            raise ValueError("unknown compression {}".format(compression))
+        self._f = f
+        self._codec = _COMPRESSIONS[compression]
+        self._level = level
+        self._block_bytes = block_bytes
+        self._block = bytearray()
+        self._block_count = 0
+        self._first_key = None
+        self._index = []
+        self._count = 0
+        f.write(_HEADER.pack(MAGIC, VERSION, self._codec, 0))
+
+    @property
+    def count(self):
+        return self._count
+
+    def write(self, keys, vals):
+        for k, v in zip(keys, vals):
+            if(self._first_key is None):
+                self._first_key = bytes(k)
+            self._block += _RECORD.pack(len(k), len(v))
+            self._block += k
+            self._block += v
+            self._block_count += 1
+            if(len(self._block) >= self._block_bytes):
+                self._flush()
+        self._count += len(keys)
+
+    def _flush(self):
+        if(self._block_count == 0):
+            return
+        data = _compress(self._codec, self._block, self._level)
+        self._index.append((self._f.tell(), self._block_count, self._first_key))
+        self._f.write(_BLOCK.pack(len(data), len(self._block), self._block_count))
+        self._f.write(data)
+        self._block = bytearray()
+        self._block_count = 0
+        self._first_key = None
+
+    def close(self):
+        self._flush()
+        index_offset = self._f.tell()
+        self._f.write(_INDEX_COUNT.pack(len(self._index)))
+        for offset, count, first_key in self._index:
+            self._f.write(_INDEX_ENTRY.pack(offset, count, len(first_key)))
+            self._f.write(first_key)
+        self._f.write(_TRAILER.pack(index_offset, self._count, MAGIC))
+
+
+def export(db, path, prefix='', compression=None, level=None, block_bytes=4*1024*1024,
+        keys_per_request=4096, key_size=0, val_size=0):
+    """
+    Writes the entries of a database (or only the ones starting with prefix)
+    into a file. Pages of keys_per_request entries are listed with
+    list_keyvals, the next page being requested while the current one is
+    written. Returns the number of records written.
+    """
+    prefix = db._encode_bound(prefix)
+    executor = None
+    if(db._sdskv_ph._client is not None):
+        executor = db._sdskv_ph._client.executor
+    fetch = lambda after: db._list_keyvals(after, prefix, keys_per_request, key_size, val_size)
+    with open(path, 'wb') as f:
+        writer = _Writer(f, compression, level, block_bytes)
+        keys, vals = fetch('')
+        while(len(keys) != 0):
+            pending = None
+            if(len(keys) == keys_per_request):
+                if(executor is not None):
+                    pending = executor.submit(fetch, keys[-1])
+                else:
+                    pending = _Done(fetch(keys[-1]))
+            writer.write(keys, vals)
+            if(pending is None):
+                break
+            keys, vals = pending.result()
+        writer.close()
+    return writer.count
+
+
+class _Done():
+    """Result of a fetch made synchronously, with the interface of a future."""
+
+    def __init__(self, result):
+        self._result = result
+
+    def result(self):
+        return self._result
+
+
+class SDSKVExportFile():
+    """
+    Read access to an export file, mapped in memory. Blocks are parsed into
+    lists of memoryviews of the mapped file (or of the decompressed block),
+    so that uncompressed records are never copied.
+    """
+
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # empty files cannot be mapped
+            self._file.close()
+            raise ValueError("{} is not an export file".format(path))
+        self._view = memoryview(self._map)
+        if(len(self._view) < _HEADER.size):
+            self.close()
+            raise ValueError("{} is not an export file".format(path))
+        magic, version, self._codec, _ = _HEADER.unpack_from(self._view, 0)
+        if(magic != MAGIC):
+            self.close()
+            raise ValueError("{} is not an export file".format(path))
+        if(version != VERSION):
+            self.close()
+            raise ValueError("unsupported export format version {}".format(version))
+        end = len(self._view) - _TRAILER.size
+        if(end < _HEADER.size):
+            self.close()
+            raise ValueError("{} is truncated".format(path))
+        index_offset, self._count, magic = _TRAILER.unpack_from(self._view, end)
+        if(magic != MAGIC):
+            self.close()
+            raise ValueError("{} is truncated".format(path))
+        try:
+            self._index = self._read_index(index_offset, end)
+        except ValueError:
+            self.close()
+            raise ValueError("{} is truncated".format(path))
+
+    def _read_index(self, offset, end):
+        """Parses the index found between offset and end, raising ValueError if it does not fit."""
+        if(offset < _HEADER.size or offset + _INDEX_COUNT.size > end):
+            raise ValueError("index out of bounds")
+        index = []
+        num_blocks = _INDEX_COUNT.unpack_from(self._view, offset)[0]
+        offset += _INDEX_COUNT.size
+        for _ in range(num_blocks):
+            if(offset + _INDEX_ENTRY.size > end):
+                raise ValueError("index out of bounds")
+            block_offset, count, key_len = _INDEX_ENTRY.unpack_from(self._view, offset)
+            offset += _INDEX_ENTRY.size
+            if(offset + key_len > end or block_offset + _BLOCK.size > end):
+                raise ValueError("index out of bounds")
+            index.append((block_offset, count, bytes(self._view[offset:offset+key_len])))
+            offset += key_len
+        return index
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        """Number of records in the file."""
+        return self._count
+
+    @property
+    def index(self):
+        """List of (offset, record count, first key) tuples, one per block."""
+        return list(self._index)
+
+    def block(self, i):
+        """Returns the keys and values of the i-th block as two lists of memoryviews."""
+        offset, count, _ = self._index[i]
+        stored, size, _ = _BLOCK.unpack_from(self._view, offset)
+        offset += _BLOCK.size
+        data = self._view[offset:offset+stored]
+        if(self._codec != NONE):
+            data = memoryview(_decompress(self._codec, data))
+        keys = []
+        vals = []
+        pos = 0
+        for _ in range(count):
+            key_len, val_len = _RECORD.unpack_from(data, pos)
+            pos += _RECORD.size
+            keys.append(data[pos:pos+key_len])
+            pos += key_len
+            vals.append(data[pos:pos+val_len])
+            pos += val_len
+        return keys, vals
+
+    def __iter__(self):
+        """Iterates over the (key, value) records as bytes objects."""
+        for i in range(len(self._index)):
+            keys, vals = self.block(i)
+            for k, v in zip(keys, vals):
+                yield bytes(k), bytes(v)
+
+    def close(self):
+        if(self._map is not None):
+            self._view.release()
+            try:
+                self._map.close()
+            except BufferError:
+                # memoryviews returned by block() are still alive, the
+                # mapping is unmapped once they are garbage collected
+                pass
+            self._map = None
+            self._file.close()
+
+
+def import_(db, path, inflight=4):
+    """
+    Loads the records of an export file into a database, one put_multi per
+    block, up to inflight blocks being decompressed and sent concurrently.
+    Returns the number of records loaded.
+    """
+    with SDSKVExportFile(path) as f:
+        def load(start, end):
+            for i in range(start, end):
+                keys, vals = f.block(i)
+                try:
+                    db._put_multi(keys, vals)
+                finally:
+                    for buf in keys + vals:
+                        buf.release()
+        blocks = ((i, i + 1) for i in range(len(f.index)))
+        for _ in db._pipeline(blocks, inflight, load):
+            pass
+        return len(f)
+
+
+ExportFile = SDSKVExportFile
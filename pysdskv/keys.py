@@ -0,0 +1,234 @@
+# (C) 2018 The University of Chicago
+# See COPYRIGHT in top-level directory.
+"""
+Order-preserving encoding of composite keys. SDSKV compares keys as raw
+bytes (memcmp order); this module encodes tuples of None, bool, int, float,
+str and bytes elements (and nested tuples) into bytes whose memcmp order is
+the natural order of the tuples, and decodes them back:
+
+    pack((2020, 'alice', 1.5)) < pack((2020, 'bob'))  < pack((2021,))
+
+Elements of different types are ordered by type: None < bytes < str
+< tuple < int < float < bool. Each element starts with a type code:
+
+    - bytes and str (as UTF-8) are terminated by 0x00, a 0x00 byte within
+      the data being escaped as 0x00 0xFF;
+    - ints are stored big-endian on as few bytes as possible, the number
+      of bytes being part of the type code (negative ints are stored in
+      one's complement so that they sort before positive ones);
+    - floats are stored as big-endian IEEE 754 doubles whose sign bit is
+      flipped (all bits for negative numbers).
+
+The encoding of a tuple is a prefix of the encoding of any tuple that
+extends it, so pack(prefix) can be used as the prefix argument of
+list_keys(), keys() and items() to scan the keys starting with given
+elements. The converse does not hold when the last element of prefix is a
+str, bytes or tuple: pack(('a\x00',)) also starts with pack(('a',)). Such
+scans may thus return a few extra keys, whereas prefix_range() returns
+exact bounds.
+"""
+import struct
+
+_NULL = 0x00
+_BYTES = 0x01
+_STRING = 0x02
+_NESTED = 0x05
+_INT_ZERO = 0x14
+_DOUBLE = 0x21
+_FALSE = 0x26
+_TRUE = 0x27
+
+_MAX_INT_BYTES = 8
+_DOUBLE_FORMAT = struct.Struct('>Q')
+
+
+def _escape(data):
+    return data.replace(b'\x00', b'\x00\xff') + b'\x00'
+
+
+def _encode_int(value, out):
+    if(value == 0):
+        out.append(_INT_ZERO)
+        return
+    magnitude = abs(value)
+    n = (magnitude.bit_length() + 7) // 8
+    if(n > _MAX_INT_BYTES):
+        raise OverflowError("int keys must fit in {} bytes".format(_MAX_INT_BYTES))
+    if(value > 0):
+        out.append(_INT_ZERO + n)
+        out += magnitude.to_bytes(n, 'big')
+    else:
+        out.append(_INT_ZERO - n)
+        out += ((1 << (8 * n)) - 1 - magnitude).to_bytes(n, 'big')
+
+
+def _encode_double(value, out):
+    bits = _DOUBLE_FORMAT.unpack(struct.pack('>d', value))[0]
+    if(bits & (1 << 63)):
+        bits ^= 0xFFFFFFFFFFFFFFFF
+    else:
+        bits ^= 1 << 63
+    out.append(_DOUBLE)
+    out += _DOUBLE_FORMAT.pack(bits)
+
+
+def _encode(value, out, nested):
+    if(value is None):
+        out.append(_NULL)
+        if(nested):
+            out.append(0xff)
+    elif(value is True):
+        out.append(_TRUE)
+    elif(value is False):
+        out.append(_FALSE)
+    elif(isinstance(value, int)):
+        _encode_int(value, out)
+    elif(isinstance(value, float)):
+        _encode_double(value, out)
+    elif(isinstance(value, str)):
+        out.append(_STRING)
+        out += _escape(value.encode('utf-8'))
+    elif(isinstance(value, (bytes, bytearray, memoryview))):
+        out.append(_BYTES)
+        out += _escape(bytes(value))
+    elif(isinstance(value, tuple)):
+        out.append(_NESTED)
+        for item in value:
+            _encode(item, out, True)
+        out.append(_NULL)
+    else:
+        raise TypeError("cannot encode {} in a key".format(type(value).__name__))
+
+
+def pack(key):
+    """
+    Encodes a tuple into bytes preserving the order of tuples. A value that
+    is not a tuple is encoded as a tuple with a single element.
+    """
+    if(not isinstance(key, tuple)):
+        key = (key,)
+    out = bytearray()
+    for item in key:
+        _encode(item, out, False)
+    return bytes(out)
+
+
+def _find_terminator(data, pos):
+    while(True):
+        pos = data.find(b'\x00', pos)
+        if(pos < 0):
+            raise IndexError("unterminated string")
+        if(pos + 1 < len(data) and data[pos+1] == 0xff):
+            pos += 2
+        else:
+            return pos
+
+
+def _decode(data, pos, nested):
+    """Decodes the element at position pos, returns (element, next position)."""
+    code = data[pos]
+    if(code == _NULL):
+        if(nested):
+            return None, pos + 2
+        return None, pos + 1
+    if(code == _BYTES or code == _STRING):
+        end = _find_terminator(data, pos + 1)
+        value = data[pos+1:end].replace(b'\x00\xff', b'\x00')
+        if(code == _STRING):
+            value = value.decode('utf-8')
+        return value, end + 1
+    if(code == _NESTED):
+        items = []
+        pos += 1
+        while(True):
+            if(data[pos] == _NULL):
+                if(pos + 1 < len(data) and data[pos+1] == 0xff):
+                    items.append(None)
+                    pos += 2
+                    continue
+                return tuple(items), pos + 1
+            item, pos = _decode(data, pos, True)
+            items.append(item)
+    if(_INT_ZERO - _MAX_INT_BYTES <= code <= _INT_ZERO + _MAX_INT_BYTES):
+        n = code - _INT_ZERO
+        if(pos + 1 + abs(n) > len(data)):
+            raise IndexError(pos)
+        if(n >= 0):
+            return int.from_bytes(data[pos+1:pos+1+n], 'big'), pos + 1 + n
+        n = -n
+        magnitude = (1 << (8 * n)) - 1 - int.from_bytes(data[pos+1:pos+1+n], 'big')
+        return -magnitude, pos + 1 + n
+    if(code == _DOUBLE):
+        bits = _DOUBLE_FORMAT.unpack_from(data, pos + 1)[0]
+        if(bits & (1 << 63)):
+            bits ^= 1 << 63
+        else:
+            bits ^= 0xFFFFFFFFFFFFFFFF
+        return struct.unpack('>d', _DOUBLE_FORMAT.pack(bits))[0], pos + 9
+    if(code == _FALSE):
+        return False, pos + 1
+    if(code == _TRUE):
+        return True, pos + 1
+    raise ValueError("unknown type code 0x{:02x} at position {}".format(code, pos))
+
+
+def unpack(data):
+    """Decodes bytes produced by pack() back into a tuple."""
+    data = bytes(data)
+    items = []
+    pos = 0
+    try:
+        while(pos < len(data)):
+            item, pos = _decode(data, pos, False)
+            items.append(item)
+    except (IndexError, struct.error):
+        raise ValueError("truncated key") from None
+    return tuple(items)
+
+
+def strinc(data):
+    """
+    Returns the first bytes object that is greater than all the bytes objects
+    starting with data, i.e. data with its trailing 0xFF bytes removed and
+    its last byte incremented.
+    """
+    data = bytes(data).rstrip(b'\xff')
+    if(len(data) == 0):
+        raise ValueError("no key follows all the keys starting with 0xFF bytes")
+    return data[:-1] + bytes([data[-1] + 1])
+
+
+def prefix_range(prefix):
+    """
+    Returns the bounds (begin, end) of the encoded keys of the tuples starting
+    with the elements of prefix: a tuple t starts with prefix if and only if
+    begin <= pack(t) < end.
+
+    A tuple extending prefix is encoded as pack(prefix) followed by the type
+    code of its next element, which is lower than 0xFF, whereas the encoding
+    of a str or bytes element extended with a 0x00 continues with the 0xFF
+    escape. The range is thus pack(prefix) itself and the keys between
+    pack(prefix) + 0x00 and pack(prefix) + 0xFF.
+    """
+    begin = pack(prefix)
+    return begin, begin + b'\xff'
+
+
+class TupleCodec():
+    """
+    Key codec encoding tuples with pack() and decoding them with unpack().
+    Databases opened with key_codec=TupleCodec() accept tuples wherever they
+    accept keys (including the after and prefix arguments of list_keys,
+    list_keyvals, keys and items) and return keys as tuples.
+
+    Any object with encode(key) and decode(data) methods can be used as a
+    key codec, provided encode() returns bytes.
+    """
+
+    def encode(self, key):
+        """Returns the bytes a key is stored as."""
+        return pack(key)
+
+    def decode(self, data):
+        """Returns the key stored as the given bytes."""
+        return unpack(data)
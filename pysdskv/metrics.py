@@ -0,0 +1,181 @@
+# (C) 2018 The University of Chicago
+# See COPYRIGHT in top-level directory.
+import math
+import threading
+
+
+class SDSKVMetrics():
+    """
+    The SDSKVMetrics object collects client-side measurements of the operations
+    made on databases: number of calls and latency histogram of each operation,
+    number of RPCs sent (including the RPCs querying sizes before fetching data,
+    reported as probes), and bytes of keys and values sent and received by each
+    database.
+
+    Metrics are opt-in: pass an instance to SDSKVClient (for all the databases
+    it opens) or set it as the metrics of an SDSKVDatabase. Databases without
+    metrics only pay for an attribute check per operation.
+
+    Latencies are counted in buckets of exponentially growing size: bucket 0
+    holds latencies up to min_latency, and bucket i latencies in
+    (min_latency * 2**(i-1), min_latency * 2**i]. The last bucket also holds
+    all the larger latencies.
+    """
+
+    def __init__(self, min_latency=1e-6, num_buckets=32):
+        """
+        Constructor.
+
+        Args:
+            min_latency (float): upper bound, in seconds, of the first bucket.
+            num_buckets (int): number of buckets of the latency histograms.
+        """
+        self._min_latency = min_latency
+        self._num_buckets = num_buckets
+        self._lock = threading.Lock()
+        self._hooks = []
+        self._ops = {}
+        self._rpcs = {}
+        self._probes = 0
+        self._bytes = {}
+
+    def _bucket(self, seconds):
+        x = seconds / self._min_latency
+        if(x <= 1.0):
+            return 0
+        m, e = math.frexp(x)
+        if(m == 0.5):
+            e -= 1
+        return min(e, self._num_buckets - 1)
+
+    def bucket_bound(self, index):
+        """Returns the upper bound, in seconds, of a bucket of the latency histograms."""
+        if(index >= self._num_buckets - 1):
+            return math.inf
+        return self._min_latency * (1 << index)
+
+    def record_op(self, db_name, op, seconds, error=False):
+        """Records a call to an operation of a database and its latency."""
+        bucket = self._bucket(seconds)
+        with self._lock:
+            stats = self._ops.get(op)
+            if(stats is None):
+                stats = _OpStats(self._num_buckets)
+                self._ops[op] = stats
+            stats.count += 1
+            if(error):
+                stats.errors += 1
+            stats.total += seconds
+            if(seconds > stats.max):
+                stats.max = seconds
+            stats.buckets[bucket] += 1
+            hooks = self._hooks
+        for hook in hooks:
+            hook(db_name, op, seconds, error)
+
+    def record_rpc(self, rpc, count=1, probe=False):
+        """
+        Records RPCs sent to a provider. probe indicates RPCs issued
+        only to query the size of the data to fetch.
+        """
+        with self._lock:
+            self._rpcs[rpc] = self._rpcs.get(rpc, 0) + count
+            if(probe):
+                self._probes += count
+
+    def record_bytes(self, db_name, key_out=0, value_out=0, key_in=0, value_in=0):
+        """Records bytes of keys and values sent (out) and received (in) by a database."""
+        with self._lock:
+            counters = self._bytes.get(db_name)
+            if(counters is None):
+                counters = [0, 0, 0, 0]
+                self._bytes[db_name] = counters
+            counters[0] += key_out
+            counters[1] += value_out
+            counters[2] += key_in
+            counters[3] += value_in
+
+    def add_hook(self, hook):
+        """
+        Registers a function called as hook(db_name, op, seconds, error) after
+        each operation. Hooks are called from the thread making the operation.
+        """
+        with self._lock:
+            self._hooks = self._hooks + [ hook ]
+
+    def remove_hook(self, hook):
+        """Unregisters a function registered with add_hook()."""
+        with self._lock:
+            self._hooks = [ h for h in self._hooks if h is not hook ]
+
+    def _percentile(self, stats, p):
+        threshold = p * stats.count
+        cumulated = 0
+        for i, n in enumerate(stats.buckets):
+            cumulated += n
+            if(n != 0 and cumulated >= threshold):
+                return min(self.bucket_bound(i), stats.max)
+        return stats.max
+
+    def snapshot(self):
+        """
+        Returns a dictionary with the current measurements:
+
+            {
+              'ops': { op: { 'count', 'errors', 'total_seconds', 'mean_seconds',
+                             'max_seconds', 'p50', 'p90', 'p99',
+                             'histogram': [ (bucket upper bound, count), ... ] } },
+              'rpcs': { rpc: count },
+              'probes': number of size-query RPCs,
+              'bytes': { db_name: { 'key_out', 'value_out', 'key_in', 'value_in' } }
+            }
+
+        Percentiles are upper bounds given by the histogram buckets, and the
+        histogram only lists non-empty buckets.
+        """
+        with self._lock:
+            ops = {}
+            for op, stats in self._ops.items():
+                ops[op] = {
+                    'count': stats.count,
+                    'errors': stats.errors,
+                    'total_seconds': stats.total,
+                    'mean_seconds': stats.total / stats.count,
+                    'max_seconds': stats.max,
+                    'p50': self._percentile(stats, 0.50),
+                    'p90': self._percentile(stats, 0.90),
+                    'p99': self._percentile(stats, 0.99),
+                    'histogram': [ (self.bucket_bound(i), n)
+                        for i, n in enumerate(stats.buckets) if n != 0 ]
+                }
+            return {
+                'ops': ops,
+                'rpcs': dict(self._rpcs),
+                'probes': self._probes,
+                'bytes': { name: {
+                        'key_out': c[0],
+                        'value_out': c[1],
+                        'key_in': c[2],
+                        'value_in': c[3] } for name, c in self._bytes.items() }
+            }
+
+    def reset(self):
+        """Resets all the measurements (hooks are kept)."""
+        with self._lock:
+            self._ops = {}
+            self._rpcs = {}
+            self._probes = 0
+            self._bytes = {}
+
+
+class _OpStats():
+    """Call count, errors and latency histogram of an operation."""
+
+    __slots__ = ('count', 'errors', 'total', 'max', 'buckets')
+
+    def __init__(self, num_buckets):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * num_buckets
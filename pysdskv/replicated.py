@@ -0,0 +1,366 @@
+# (C) 2018 The University of Chicago
+# See COPYRIGHT in top-level directory.
+import collections
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from .retry import SDSKVTimeoutError
+
+
+class _ReplicaStats():
+    """Latencies of the reads served by a replica."""
+
+    def __init__(self, window, alpha):
+        self._latencies = collections.deque(maxlen=window)
+        self._sorted = None
+        self._alpha = alpha
+        self.ewma = None
+        self.reads = 0
+        self.hedges = 0
+        self.wins = 0
+        self.errors = 0
+        # start times (time.monotonic) of the reads not answered yet
+        self.inflight = {}
+
+    def record(self, seconds):
+        self._latencies.append(seconds)
+        self._sorted = None
+        if(self.ewma is None):
+            self.ewma = seconds
+        else:
+            self.ewma += self._alpha * (seconds - self.ewma)
+
+    @property
+    def samples(self):
+        return len(self._latencies)
+
+    def score(self, now):
+        """
+        Expected latency used to rank the replica: the moving average of its
+        latencies, or the age of its oldest pending read if it is larger, so
+        that a replica that stopped answering is demoted without waiting for
+        its reads to complete. None if the replica was never measured.
+        """
+        if(len(self.inflight) != 0):
+            age = now - min(self.inflight.values())
+            if(self.ewma is None or age > self.ewma):
+                return age
+        return self.ewma
+
+    def percentile(self, p):
+        if(len(self._latencies) == 0):
+            return None
+        if(self._sorted is None):
+            self._sorted = sorted(self._latencies)
+        return self._sorted[min(len(self._sorted) - 1, int(math.ceil(p * len(self._sorted))) - 1)]
+
+
+class SDSKVReplicatedDatabase():
+    """
+    The SDSKVReplicatedDatabase accesses several databases holding the same
+    data, possibly held by different providers, to hide the stalls of a
+    single provider (e.g. a LevelDB compaction or a busy node).
+
+    Writes (put, put_multi, erase, erase_multi) are sent to all the replicas
+    concurrently, and return once all of them have completed. Reads are sent
+    to the replica with the lowest recent latency; if it has not answered
+    after the hedge_percentile latency of that replica, the read is also sent
+    to the next fastest replica and the first answer is returned. The latency
+    of every read, including the ones whose answer was not used, is recorded,
+    so a stalled replica stops being preferred.
+
+    A replica raising KeyError may lag behind the others, so a KeyError is
+    only raised once all the replicas have been asked: reads of missing keys
+    are sent to every replica. Other answers (e.g. exists() returning False)
+    are taken from the first replica answering.
+
+    A replica that stops answering is demoted as soon as its oldest pending
+    read is older than the latency of the other replicas. Each replica has
+    its own pool of workers_per_replica threads, so the reads stuck on a
+    replica cannot delay the reads sent to the others, and a replica with as
+    many pending reads as threads is not asked (unless all the replicas are
+    in this case). A read raises an SDSKVTimeoutError if no replica answers
+    within read_timeout seconds; the reads it sent keep their threads until
+    their replica answers (or the client's timeout expires, see
+    SDSKVClient.call).
+
+    These pools are not the client's worker pool, which the databases use
+    for pipelined chunks (inflight > 1), so that reads and writes never wait
+    for tasks queued behind them on the same pool.
+
+    Replicas are not repaired: a write failing on one replica raises an
+    exception after the other replicas have been written.
+    """
+
+    def __init__(self, client, replicas, hedge_percentile=0.95, min_hedge_delay=0.001,
+            initial_hedge_delay=0.01, window=1000, alpha=0.1, min_samples=20,
+            workers_per_replica=8, read_timeout=10.0, **kwargs):
+        """
+        Constructor.
+
+        Args:
+            client (SDSKVClient): client used to contact the providers.
+            replicas (list): list of (address, provider_id, db_name) tuples,
+                address being either a str or a pymargo.Address.
+            hedge_percentile (float): percentile of the latency of a replica
+                after which a read is hedged (None to disable hedging).
+            min_hedge_delay (float): minimum delay (seconds) before hedging.
+            initial_hedge_delay (float): delay used while a replica has
+                served fewer than min_samples reads.
+            window (int): number of recent latencies kept per replica.
+            alpha (float): weight of a new latency in the moving average
+                used to rank the replicas.
+            min_samples (int): number of reads before the percentile is used.
+            workers_per_replica (int): number of threads sending reads and
+                writes to each replica.
+            read_timeout (float): maximum time (seconds) a read waits for
+                an answer from the replicas, None for no limit.
+            kwargs: additional arguments passed to SDSKVProviderHandle.open()
+                (e.g. binary=True).
+        """
+        if(len(replicas) == 0):
+            raise ValueError("SDSKVReplicatedDatabase needs at least one replica")
+        self._client = client
+        self._replicas = []
+        self._databases = []
+        for addr, provider_id, db_name in replicas:
+            addr_str = addr if isinstance(addr, str) else str(addr)
+            self._replicas.append((addr_str, provider_id, db_name))
+            self._databases.append(client.open(addr_str, db_name, provider_id, **kwargs))
+        self._hedge_percentile = hedge_percentile
+        self._min_hedge_delay = min_hedge_delay
+        self._initial_hedge_delay = initial_hedge_delay
+        self._min_samples = min_samples
+        self._workers_per_replica = workers_per_replica
+        self._read_timeout = read_timeout
+        self._lock = threading.Lock()
+        self._stats = [ _ReplicaStats(window, alpha) for _ in self._databases ]
+        self._next = 0
+        self._executors = [ ThreadPoolExecutor(max_workers=workers_per_replica,
+                thread_name_prefix='pysdskv-replica{}'.format(i)) for i in range(len(self._databases)) ]
+
+    def __del__(self):
+        for executor in getattr(self, '_executors', []):
+            executor.shutdown(wait=False)
+
+    @property
+    def replicas(self):
+        """List of the SDSKVDatabase instances holding the replicas."""
+        return list(self._databases)
+
+    @property
+    def stats(self):
+        """
+        List of dictionaries (one per replica) giving the address, provider id
+        and database name of the replica, the number of reads sent to it, how
+        many of them were hedges and how many answers were used, the number of
+        errors and of reads not answered yet, and its moving average, median
+        and hedging latencies (seconds).
+        """
+        result = []
+        with self._lock:
+            for (addr, provider_id, db_name), s in zip(self._replicas, self._stats):
+                result.append({
+                    'address': addr,
+                    'provider_id': provider_id,
+                    'database': db_name,
+                    'reads': s.reads,
+                    'hedges': s.hedges,
+                    'wins': s.wins,
+                    'errors': s.errors,
+                    'pending': len(s.inflight),
+                    'mean_seconds': s.ewma,
+                    'p50': s.percentile(0.5),
+                    'hedge_delay': self._hedge_delay(s)
+                })
+        return result
+
+    def _ranking(self):
+        """
+        Returns the indices of the replicas to ask, fastest first (see
+        _ReplicaStats.score). Replicas without measurements come first, in
+        turn, so that every replica gets measured. Replicas with as many
+        pending reads as threads are left out, unless they all are.
+        """
+        now = time.monotonic()
+        with self._lock:
+            start = self._next
+            self._next = (self._next + 1) % len(self._databases)
+            order = [ (start + i) % len(self._databases) for i in range(len(self._databases)) ]
+            available = [ i for i in order
+                    if len(self._stats[i].inflight) < self._workers_per_replica ]
+            if(len(available) != 0):
+                order = available
+            scores = {}
+            for i in order:
+                score = self._stats[i].score(now)
+                scores[i] = -1.0 if score is None else score
+            return sorted(order, key=scores.get)
+
+    def _hedge_delay(self, stats):
+        """Delay after which a read sent to a replica is hedged (called with the lock held)."""
+        if(self._hedge_percentile is None):
+            return None
+        if(stats.samples < self._min_samples):
+            return self._initial_hedge_delay
+        return max(self._min_hedge_delay, stats.percentile(self._hedge_percentile))
+
+    def _submit(self, i, hedge, method, args):
+        """Sends a read to replica i, recording its latency."""
+        db = self._databases[i]
+        token = object()
+        start = time.monotonic()
+        with self._lock:
+            self._stats[i].reads += 1
+            if(hedge):
+                self._stats[i].hedges += 1
+            self._stats[i].inflight[token] = start
+        future = self._executors[i].submit(getattr(db, method), *args)
+        def done(f):
+            seconds = time.monotonic() - start
+            error = f.exception()
+            with self._lock:
+                del self._stats[i].inflight[token]
+                if(error is not None and not isinstance(error, KeyError)):
+                    self._stats[i].errors += 1
+                else:
+                    self._stats[i].record(seconds)
+        future.add_done_callback(done)
+        return future
+
+    def _read(self, method, *args):
+        """
+        Calls method(*args) on the fastest replica, hedging it on the next
+        replicas if it is too slow or fails, and returns the first answer.
+        A KeyError is raised if no replica holds the key, other exceptions
+        are raised if all the replicas failed, and an SDSKVTimeoutError if
+        no replica answered within the read timeout.
+        """
+        if(len(self._databases) == 1):
+            return getattr(self._databases[0], method)(*args)
+        ranking = self._ranking()
+        deadline = None
+        if(self._read_timeout is not None):
+            deadline = time.monotonic() + self._read_timeout
+        pending = {}
+        last_error = None
+        missing = None
+        for position, i in enumerate(ranking):
+            future = self._submit(i, position != 0, method, args)
+            pending[future] = i
+            with self._lock:
+                delay = self._hedge_delay(self._stats[i])
+            if(position == len(ranking) - 1):
+                delay = None
+            while(len(pending) != 0):
+                timeout = delay
+                if(deadline is not None):
+                    remaining = max(0.0, deadline - time.monotonic())
+                    timeout = remaining if timeout is None else min(timeout, remaining)
+                done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+                if(len(done) == 0):
+                    if(deadline is not None and time.monotonic() >= deadline):
+                        raise SDSKVTimeoutError("no replica answered {} within {:.3f} s".format(
+                            method, self._read_timeout))
+                    # no answer within the delay, hedge on the next replica
+                    break
+                for f in done:
+                    j = pending.pop(f)
+                    error = f.exception()
+                    if(error is None):
+                        with self._lock:
+                            self._stats[j].wins += 1
+                        return f.result()
+                    if(isinstance(error, KeyError)):
+                        # the replica may be behind, ask the other ones
+                        missing = error
+                    else:
+                        last_error = error
+                if(len(pending) == 0):
+                    # all the replicas contacted so far failed, try the next one
+                    break
+        if(missing is not None):
+            raise missing
+        raise last_error
+
+    def _broadcast(self, method, *args, **kwargs):
+        """Calls method(*args, **kwargs) on all the replicas concurrently, raising the first error."""
+        futures = [ executor.submit(getattr(db, method), *args, **kwargs)
+                for executor, db in zip(self._executors, self._databases) ]
+        wait(futures)
+        for f in futures:
+            f.result()
+
+    def put(self, key, value):
+        """Puts a key value pair in all the replicas."""
+        self._broadcast('put', key, value)
+
+    def __setitem__(self, key, value):
+        """Equivalent to put()."""
+        self.put(key, value)
+
+    def put_multi(self, keys, values, **kwargs):
+        """
+        Puts multiple key value pairs in all the replicas (additional arguments,
+        e.g. chunk_bytes, are passed to SDSKVDatabase.put_multi).
+        """
+        if(len(keys) != len(values)):
+            raise ValueError("Number of keys and values do not match")
+        self._broadcast('put_multi', keys, values, **kwargs)
+
+    def erase(self, key):
+        """Erases a key from all the replicas."""
+        self._broadcast('erase', key)
+
+    def __delitem__(self, key):
+        """Equivalent to erase()."""
+        self.erase(key)
+
+    def erase_multi(self, keys):
+        """Erases multiple keys from all the replicas."""
+        self._broadcast('erase_multi', keys)
+
+    def get(self, key, value_size=0):
+        """Gets the value associated with a key (see SDSKVDatabase.get)."""
+        return self._read('get', key, value_size)
+
+    def __getitem__(self, key):
+        """Equivalent to get() with a value_size of 0."""
+        return self.get(key)
+
+    def get_multi(self, keys, value_sizes=0):
+        """Gets the values associated with a list of keys (see SDSKVDatabase.get_multi)."""
+        if(len(keys) == 0):
+            return []
+        return self._read('get_multi', keys, value_sizes)
+
+    def length(self, key):
+        """Returns the length of the value associated with a key."""
+        return self._read('length', key)
+
+    def length_multi(self, keys):
+        """Returns the lengths of the values associated with a list of keys."""
+        return self._read('length_multi', keys)
+
+    def exists(self, key):
+        """Returns True if the specified key exists, False otherwise."""
+        return self._read('exists', key)
+
+    def exists_multi(self, keys, empty_values=True):
+        """
+        Returns a list of booleans indicating whether each key exists
+        (see SDSKVDatabase.exists_multi for empty_values).
+        """
+        return self._read('exists_multi', keys, empty_values)
+
+    def list_keys(self, after='', num_keys=1, prefix='', key_size=0, max_bytes=0):
+        """Lists up to num_keys keys (see SDSKVDatabase.list_keys)."""
+        return self._read('list_keys', after, num_keys, prefix, key_size, max_bytes)
+
+    def list_keyvals(self, after='', num_keys=1, prefix='', key_size=0, val_size=0, max_bytes=0):
+        """Lists up to num_keys key/value pairs (see SDSKVDatabase.list_keyvals)."""
+        return self._read('list_keyvals', after, num_keys, prefix, key_size, val_size, max_bytes)
+
+
+ReplicatedDatabase = SDSKVReplicatedDatabase
@@ -0,0 +1,59 @@
+# (C) 2018 The University of Chicago
+# See COPYRIGHT in top-level directory.
+import random
+
+
+class SDSKVTimeoutError(TimeoutError):
+    """Raised when an operation does not complete within its timeout or deadline."""
+    pass
+
+
+class RetryPolicy():
+    """
+    The RetryPolicy decides whether an idempotent read (get, get_multi,
+    length, exists, list_keys, etc.) that failed is attempted again, and how
+    long to wait before the next attempt (see SDSKVClient's retry argument).
+
+    The delay before attempt n+1 is backoff * multiplier**(n-1), bounded by
+    max_backoff, and randomized by +/- jitter (as a fraction of the delay) so
+    that clients retrying together do not hit the provider at the same time.
+    Retries never extend past the deadline of the call.
+    """
+
+    def __init__(self, max_attempts=3, backoff=0.01, multiplier=2.0, max_backoff=1.0,
+            jitter=0.1, retry_on=(SDSKVTimeoutError,)):
+        """
+        Constructor.
+
+        Args:
+            max_attempts (int): maximum number of attempts, including the first.
+            backoff (float): delay (seconds) before the first retry.
+            multiplier (float): factor applied to the delay after each retry.
+            max_backoff (float): upper bound for the delay.
+            jitter (float): relative randomization of the delay.
+            retry_on (tuple): exception types that lead to a retry.
+        """
+        if(max_attempts < 1):
+            raise ValueError("max_attempts should be at least 1")
+        self._max_attempts = max_attempts
+        self._backoff = backoff
+        self._multiplier = multiplier
+        self._max_backoff = max_backoff
+        self._jitter = jitter
+        self._retry_on = tuple(retry_on)
+        self._rng = random.Random()
+
+    @property
+    def max_attempts(self):
+        return self._max_attempts
+
+    def should_retry(self, error, attempts):
+        """Whether to retry after the given number of attempts failed with error."""
+        return attempts < self._max_attempts and isinstance(error, self._retry_on)
+
+    def delay(self, attempts):
+        """Delay (seconds) to wait after the given number of failed attempts."""
+        d = min(self._max_backoff, self._backoff * (self._multiplier ** (attempts - 1)))
+        if(self._jitter):
+            d *= 1.0 + self._jitter * (2.0 * self._rng.random() - 1.0)
+        return max(0.0, d)
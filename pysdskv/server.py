@@ -1,5 +1,10 @@
 # (C) 2018 The University of Chicago
 # See COPYRIGHT in top-level directory.
+import json
+import os
+import threading
+import time
+import weakref
 import _pysdskvserver
 import pymargo
 
@@ -8,21 +13,354 @@ bwtree     = _pysdskvserver.database_type.bwtree
 leveldb    = _pysdskvserver.database_type.leveldb
 berkeleydb = _pysdskvserver.database_type.berkeleydb
 
+_type_names = {
+    stdmap: 'map',
+    bwtree: 'bwtree',
+    leveldb: 'leveldb',
+    berkeleydb: 'berkeleydb'
+}
+
+_types_by_name = { name: db_type for db_type, name in _type_names.items() }
+_types_by_name['stdmap'] = stdmap
+
+# comparators implemented by the binding, usable as the comparator of a
+# database: reverse lexicographic order, and keys holding native integers
+# (keys of another size are ordered by size, then bytewise)
+COMPARATORS = ('reverse', 'uint64', 'int64', 'uint32', 'int32')
+
+# name of the RPC through which SDSKVProviderHandle.stats() queries the
+# statistics of the databases of a provider
+STATS_RPC = 'pysdskv_database_stats'
+
+# providers of this process, by (address of their engine, provider id)
+_providers = weakref.WeakValueDictionary()
+
+
+def local_provider(addr, provider_id):
+    """
+    Returns the SDSKVProvider registered in this process with the given
+    address (str or pymargo.Address) and provider id, or None.
+    """
+    return _providers.get((str(addr), provider_id))
+
+
 class SDSKVProvider(pymargo.Provider):
+    """
+    The SDSKVProvider holds databases and serves the RPCs of SDSKVClients.
 
-    def __init__(self, engine, provider_id):
+    Besides the RPCs of SDSKV, the provider serves an RPC returning the
+    statistics of its databases (see stats()), used by SDSKVProviderHandle.stats().
+    """
+
+    def __init__(self, engine, provider_id, pool=None, num_xstreams=0, max_scan_keys=None):
+        """
+        Constructor.
+
+        Args:
+            engine (pymargo.Engine): engine serving the RPCs.
+            provider_id (int): provider id.
+            pool: Argobots pool (capsule named "ABT_pool") in which the RPCs
+                are handled, or None for the engine's handler pool.
+            num_xstreams (int): if non-zero (and pool is None), the RPCs are
+                handled in a new pool served by this number of dedicated
+                execution streams, joined when the engine is finalized.
+            max_scan_keys (int): maximum number of keys listed by the scan
+                counting the keys of a database in stats(), whoever asks
+                for it, or None (no limit).
+        """
+        if(pool is not None and num_xstreams != 0):
+            raise ValueError("pool and num_xstreams cannot be both specified")
         super(SDSKVProvider, self).__init__(engine, provider_id)
-        self._provider = _pysdskvserver.register(engine.get_internal_mid(), provider_id)
+        self._provider = _pysdskvserver.register(engine.get_internal_mid(), provider_id,
+                pool, num_xstreams)
+        self._engine = engine
+        self._provider_id = provider_id
+        self._lock = threading.Lock()
+        self._info = {}
+        self._samples = {}
+        self._counters = { 'attached': 0, 'removed': 0, 'stats_requests': 0 }
+        self._client = None
+        self._ph = None
+        self._comparators = set()
+        self._max_scan_keys = max_scan_keys
+        self.register(STATS_RPC, '_stats_rpc')
+        _providers[(str(engine.addr()), provider_id)] = self
+
+    def __del__(self):
+        if(self._ph is not None):
+            import _pysdskvclient
+            _pysdskvclient.provider_handle_release(self._ph)
+            _pysdskvclient.client_finalize(self._client)
+            self._ph = None
+
+    def add_comparison_function(self, name):
+        """
+        Registers one of the comparators of the binding (see COMPARATORS) so that
+        databases can be attached with it. attach_database() registers them
+        when needed; comparators registered by native code loaded in the
+        process can be used by name without being added here.
+        """
+        with self._lock:
+            if(name in self._comparators):
+                return
+            _pysdskvserver.add_comparison_function(self._provider, name)
+            self._comparators.add(name)
+
+    def attach_database(self, name, path, db_type, comparator=None, no_overwrite=False):
+        """
+        Attaches a database and returns its id.
+
+        Args:
+            name (str): name of the database.
+            path (str): directory of the database files (persistent backends).
+            db_type: backend (stdmap, bwtree, leveldb, berkeleydb) or its name.
+            comparator (str): name of the comparison function ordering the
+                keys (see add_comparison_function), None for the lexicographic order.
+            no_overwrite (bool): if True, putting an existing key fails instead of
+                replacing its value, which spares the backend a read-modify-write.
+        """
+        db_type = self._db_type(db_type)
+        self._add_comparator(comparator)
+        db_id = _pysdskvserver.attach_database(self._provider, name, path, db_type,
+                comparator, no_overwrite)
+        self._attached(db_id, name, path, db_type, comparator, no_overwrite)
+        return db_id
+
+    def attach_from_config(self, config):
+        """
+        Attaches the databases described by a configuration, given as a JSON
+        string or as the corresponding dict, of the form:
 
-    def attach_database(self, name, path, db_type):
-        return _pysdskvserver.attach_database(self._provider, name, path, db_type)
+            {
+                "databases": [
+                    { "name": "db1", "path": "/data", "type": "leveldb",
+                      "comparator": null, "no_overwrite": false },
+                    ...
+                ]
+            }
+
+        where only the name is required (type defaulting to map, path to the
+        empty string). The databases are attached by a single call to the
+        binding, without the GIL. If some of them cannot be attached, the ones
+        that were are removed and a RuntimeError is raised.
+        Returns a dictionary associating the id of each database with its name.
+        """
+        if(isinstance(config, (str, bytes))):
+            config = json.loads(config)
+        configs = []
+        for entry in config.get('databases', []):
+            if('name' not in entry):
+                raise ValueError("database configurations require a name")
+            comparator = entry.get('comparator')
+            self._add_comparator(comparator)
+            configs.append((entry['name'], entry.get('path', ''),
+                self._db_type(entry.get('type', 'map')), comparator,
+                bool(entry.get('no_overwrite', False))))
+        ids = _pysdskvserver.attach_databases(self._provider, configs)
+        failed = [ c[0] for c, db_id in zip(configs, ids) if db_id == 0 ]
+        if(len(failed) != 0):
+            for db_id in ids:
+                if(db_id != 0):
+                    _pysdskvserver.remove_database(self._provider, db_id)
+            raise RuntimeError("could not attach databases {}".format(', '.join(failed)))
+        for (name, path, db_type, comparator, no_overwrite), db_id in zip(configs, ids):
+            self._attached(db_id, name, path, db_type, comparator, no_overwrite)
+        return { c[0]: db_id for c, db_id in zip(configs, ids) }
+
+    @staticmethod
+    def _db_type(db_type):
+        if(isinstance(db_type, str)):
+            if(db_type not in _types_by_name):
+                raise ValueError("unknown database type {}".format(db_type))
+            return _types_by_name[db_type]
+        return db_type
+
+    def _add_comparator(self, comparator):
+        if(comparator in COMPARATORS):
+            self.add_comparison_function(comparator)
+
+    def _attached(self, db_id, name, path, db_type, comparator, no_overwrite):
+        with self._lock:
+            self._info[db_id] = {
+                'id': db_id,
+                'name': name,
+                'type': _type_names.get(db_type, str(db_type)),
+                'path': path,
+                'comparator': comparator,
+                'no_overwrite': no_overwrite,
+                'attached_at': time.time()
+            }
+            self._counters['attached'] += 1
 
     def remove_database(self, db_id):
         _pysdskvserver.remove_database(self._provider, db_id)
+        with self._lock:
+            self._info.pop(db_id, None)
+            self._samples.pop(db_id, None)
+            self._counters['removed'] += 1
 
     def remove_all_databases(self):
         _pysdskvserver.remove_all_databases(self._provider)
+        with self._lock:
+            self._counters['removed'] += len(self._info)
+            self._info.clear()
+            self._samples.clear()
 
     @property
     def databases(self):
         return _pysdskvserver.databases(self._provider)
+
+    def comparator(self, db_id):
+        """
+        Name of the comparator the database was attached with, None for the
+        lexicographic order (or if it was not attached by this object).
+        """
+        with self._lock:
+            info = self._info.get(db_id)
+        return None if info is None else info['comparator']
+
+    @property
+    def counters(self):
+        """
+        Counters of the management operations handled by this SDSKVProvider
+        object: databases attached and removed, and statistics requests
+        served. These are not statistics of the operations on the databases
+        (see stats()).
+        """
+        with self._lock:
+            return dict(self._counters)
+
+    def stats(self, db_id=None, count_keys=False, max_keys=None):
+        """
+        Returns a list of dictionaries (or a single dictionary if db_id is given)
+        describing the databases of the provider:
+
+            - id, name, type and path of the database, and time it was attached;
+            - num_keys, key_bytes and value_bytes, obtained by scanning the
+              database if count_keys is True (None otherwise); the scan
+              lists the keys of the database and is as costly as reading them;
+            - complete: whether the scan reached the end of the database (None
+              if count_keys is False). The scan stops after max_keys keys (or
+              the max_scan_keys of the provider, if lower), in which case the
+              counts are lower bounds;
+            - size: approximate size in bytes, i.e. the size of the database's
+              files for persistent backends (leveldb, berkeleydb) and the total
+              size of the keys and values for in-memory backends;
+            - rates: change per second of the number of keys and of the size
+              since the previous call to stats() that counted all the keys
+              (insertions minus deletions; None on the first call, or if the
+              scan was stopped).
+
+        Per-operation statistics (number of get, put, list, etc. requests and
+        their rates) are not available: libsdskv handles its RPCs without
+        reporting them to the binding. Clients can count the operations they
+        issue with SDSKVMetrics.
+        """
+        if(self._max_scan_keys is not None):
+            max_keys = self._max_scan_keys if max_keys is None else min(max_keys, self._max_scan_keys)
+        if(db_id is not None):
+            return self._db_stats(db_id, count_keys, max_keys)
+        return [ self._db_stats(i, count_keys, max_keys) for i in self.databases ]
+
+    def _db_stats(self, db_id, count_keys, max_keys):
+        with self._lock:
+            info = self._info.get(db_id)
+            info = dict(info) if info is not None else { 'id': db_id }
+        result = info
+        result['num_keys'] = None
+        result['key_bytes'] = None
+        result['value_bytes'] = None
+        result['complete'] = None
+        result['size'] = self._disk_size(info)
+        result['rates'] = None
+        if(not count_keys):
+            return result
+        now = time.monotonic()
+        num_keys, key_bytes, value_bytes, complete = self._scan(db_id, max_keys)
+        result['num_keys'] = num_keys
+        result['key_bytes'] = key_bytes
+        result['value_bytes'] = value_bytes
+        result['complete'] = complete
+        if(result['size'] is None):
+            result['size'] = key_bytes + value_bytes
+        if(not complete):
+            return result
+        with self._lock:
+            previous = self._samples.get(db_id)
+            self._samples[db_id] = (now, num_keys, result['size'])
+        if(previous is not None and now > previous[0]):
+            elapsed = now - previous[0]
+            result['rates'] = {
+                'keys_per_second': (num_keys - previous[1]) / elapsed,
+                'bytes_per_second': (result['size'] - previous[2]) / elapsed
+            }
+        return result
+
+    def _disk_size(self, info):
+        """Size of the files of a persistent database, None for in-memory databases."""
+        if(info.get('type') not in ('leveldb', 'berkeleydb')):
+            return None
+        path = info['path']
+        named = os.path.join(path, info['name'])
+        if(os.path.exists(named)):
+            path = named
+        if(os.path.isfile(path)):
+            return os.path.getsize(path)
+        size = 0
+        for root, _, files in os.walk(path):
+            for f in files:
+                try:
+                    size += os.path.getsize(os.path.join(root, f))
+                except OSError:
+                    pass
+        return size
+
+    def _scan(self, db_id, max_keys=None, page_size=4096):
+        """
+        Returns the number of keys and the total size of the keys and values
+        of a database, listed through a client of the provider's own engine,
+        and whether all the keys were listed (the scan stopping after max_keys).
+        """
+        import _pysdskvclient
+        with self._lock:
+            if(self._ph is None):
+                self._client = _pysdskvclient.client_init(self._engine.get_internal_mid())
+                self._ph = _pysdskvclient.provider_handle_create(self._client,
+                        self._engine.addr().get_internal_hg_addr(), self._provider_id)
+        num_keys = 0
+        key_bytes = 0
+        value_bytes = 0
+        after = b''
+        while(True):
+            count = page_size
+            if(max_keys is not None):
+                count = min(count, max_keys - num_keys)
+                if(count <= 0):
+                    # the scan is complete if no key is left
+                    more = _pysdskvclient.list_keys(self._ph, db_id, after, b'', 1, 0)
+                    return num_keys, key_bytes, value_bytes, len(more) == 0
+            keys = _pysdskvclient.list_keys(self._ph, db_id, after, b'', count, 0)
+            if(len(keys) == 0):
+                break
+            num_keys += len(keys)
+            key_bytes += sum(map(len, keys))
+            value_bytes += sum(_pysdskvclient.length_multi(self._ph, db_id, keys))
+            if(len(keys) < count):
+                break
+            after = keys[-1]
+        return num_keys, key_bytes, value_bytes, True
+
+    def _stats_rpc(self, handle, input):
+        """Handler of the STATS_RPC, taking and returning JSON."""
+        with self._lock:
+            self._counters['stats_requests'] += 1
+        try:
+            request = json.loads(input) if input else {}
+            result = {
+                'stats': self.stats(request.get('db_id'), request.get('count_keys', False),
+                    request.get('max_keys')),
+                'counters': self.counters
+            }
+        except Exception as e:
+            result = { 'error': str(e) }
+        handle.respond(json.dumps(result))
@@ -0,0 +1,179 @@
+# (C) 2018 The University of Chicago
+# See COPYRIGHT in top-level directory.
+import bisect
+import hashlib
+
+
+def _hash(data):
+    """64-bit hash of a bytes object, stable across processes."""
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'little')
+
+
+class SDSKVShardedDatabase():
+    """
+    The SDSKVShardedDatabase distributes keys across several databases, possibly
+    held by different providers, using consistent hashing with virtual nodes.
+    Adding or removing a shard therefore only moves a fraction of the keys.
+
+    Batch operations (put_multi, get_multi, length_multi, erase_multi) split
+    the batch per shard, send the per-shard RPCs concurrently on the client's
+    worker pool (the bindings release the GIL), and reassemble the results in
+    the order of the keys.
+    """
+
+    def __init__(self, client, shards, vnodes=64, **kwargs):
+        """
+        Constructor.
+
+        Args:
+            client (SDSKVClient): client used to contact the providers.
+            shards (list): list of (address, provider_id, db_name) tuples,
+                address being either a str or a pymargo.Address.
+            vnodes (int): number of virtual nodes per shard on the hash ring.
+            kwargs: additional arguments passed to SDSKVProviderHandle.open()
+                (e.g. binary=True).
+        """
+        if(len(shards) == 0):
+            raise ValueError("SDSKVShardedDatabase needs at least one shard")
+        self._client = client
+        self._databases = []
+        ring = []
+        for i, (addr, provider_id, db_name) in enumerate(shards):
+            addr_str = addr if isinstance(addr, str) else str(addr)
+            self._databases.append(client.open(addr_str, db_name, provider_id, **kwargs))
+            for v in range(vnodes):
+                token = '{}/{}/{}#{}'.format(addr_str, provider_id, db_name, v)
+                ring.append((_hash(token.encode('utf-8')), i))
+        ring.sort()
+        self._ring_hashes = [ h for h, _ in ring ]
+        self._ring_shards = [ i for _, i in ring ]
+
+    @property
+    def shards(self):
+        """List of the SDSKVDatabase instances the keys are distributed across."""
+        return list(self._databases)
+
+    def shard_index(self, key):
+        """Returns the index of the shard responsible for the given key."""
+        i = bisect.bisect_right(self._ring_hashes, _hash(self._databases[0]._key_bytes(key)))
+        if(i == len(self._ring_hashes)):
+            i = 0
+        return self._ring_shards[i]
+
+    def shard(self, key):
+        """Returns the SDSKVDatabase responsible for the given key."""
+        return self._databases[self.shard_index(key)]
+
+    def put(self, key, value):
+        """Puts a key value pair in the shard responsible for the key."""
+        self.shard(key).put(key, value)
+
+    def __setitem__(self, key, value):
+        """Equivalent to put()."""
+        self.put(key, value)
+
+    def get(self, key, value_size=0):
+        """Gets the value associated with a key (see SDSKVDatabase.get)."""
+        return self.shard(key).get(key, value_size)
+
+    def __getitem__(self, key):
+        """Equivalent to get() with a value_size of 0."""
+        return self.get(key)
+
+    def length(self, key):
+        """Returns the length of the value associated with a key."""
+        return self.shard(key).length(key)
+
+    def exists(self, key):
+        """Returns True if the specified key exists, False otherwise."""
+        return self.shard(key).exists(key)
+
+    def erase(self, key):
+        """Erases a key from the shard responsible for it."""
+        self.shard(key).erase(key)
+
+    def __delitem__(self, key):
+        """Equivalent to erase()."""
+        self.erase(key)
+
+    def _split(self, keys):
+        """Groups the positions of the keys by shard."""
+        groups = {}
+        for pos, key in enumerate(keys):
+            groups.setdefault(self.shard_index(key), []).append(pos)
+        return groups
+
+    def _scatter(self, groups, call):
+        """
+        Calls call(db, positions) for each shard concurrently and returns
+        a dictionary associating the result with each shard index.
+        """
+        if(len(groups) == 1):
+            i, positions = next(iter(groups.items()))
+            return { i: call(self._databases[i], positions) }
+        executor = self._client.executor
+        futures = { i: executor.submit(call, self._databases[i], positions)
+                for i, positions in groups.items() }
+        return { i: f.result() for i, f in futures.items() }
+
+    def _gather(self, count, groups, results):
+        """Reassembles per-shard results in the order of the original batch."""
+        output = [ None ] * count
+        for i, positions in groups.items():
+            for pos, r in zip(positions, results[i]):
+                output[pos] = r
+        return output
+
+    def put_multi(self, keys, values):
+        """Puts multiple key value pairs, issuing one put_multi per shard."""
+        if(len(keys) != len(values)):
+            raise ValueError("Number of keys and values do not match")
+        groups = self._split(keys)
+        self._scatter(groups, lambda db, positions: db.put_multi(
+            [ keys[p] for p in positions ], [ values[p] for p in positions ]))
+
+    def get_multi(self, keys, value_sizes=0):
+        """Gets the values associated with a list of keys (see SDSKVDatabase.get_multi)."""
+        if(len(keys) == 0):
+            return []
+        if(not isinstance(value_sizes, int) and len(keys) != len(value_sizes)):
+            raise ValueError("length of value_sizes differs from length of keys list")
+        def call(db, positions):
+            sizes = value_sizes
+            if(not isinstance(sizes, int)):
+                sizes = [ value_sizes[p] for p in positions ]
+            return db.get_multi([ keys[p] for p in positions ], sizes)
+        groups = self._split(keys)
+        return self._gather(len(keys), groups, self._scatter(groups, call))
+
+    def length_multi(self, keys):
+        """Returns the lengths of the values associated with a list of keys."""
+        if(len(keys) == 0):
+            return []
+        groups = self._split(keys)
+        results = self._scatter(groups, lambda db, positions: db.length_multi(
+            [ keys[p] for p in positions ]))
+        return self._gather(len(keys), groups, results)
+
+    def exists_multi(self, keys, empty_values=True):
+        """
+        Returns a list of booleans indicating whether each key exists
+        (see SDSKVDatabase.exists_multi for empty_values).
+        """
+        if(len(keys) == 0):
+            return []
+        groups = self._split(keys)
+        results = self._scatter(groups, lambda db, positions: db.exists_multi(
+            [ keys[p] for p in positions ], empty_values))
+        return self._gather(len(keys), groups, results)
+
+    def erase_multi(self, keys):
+        """Erases multiple keys, issuing one erase_multi per shard."""
+        if(len(keys) == 0):
+            return
+        groups = self._split(keys)
+        self._scatter(groups, lambda db, positions: db.erase_multi(
+            [ keys[p] for p in positions ]))
+
+
+ShardedDatabase = SDSKVShardedDatabase
@@ -0,0 +1,154 @@
+# (C) 2018 The University of Chicago
+# See COPYRIGHT in top-level directory.
+import collections
+import threading
+
+
+class SizeHintPolicy():
+    """
+    The SizeHintPolicy learns the sizes of the keys and values of a database
+    and provides size hints to SDSKVDatabase's get(), get_multi(), list_keys()
+    and list_keyvals(). With a hint, these functions fetch the data right away
+    instead of first issuing an RPC to query its size. If the hint turns out to
+    be too small, SDSKV returns a size error and the database falls back to
+    querying the size.
+
+    Hints are computed as a high percentile of the most recently observed
+    sizes, multiplied by a slack factor. Value sizes can be tracked separately
+    for each key prefix of a given length.
+    """
+
+    def __init__(self, percentile=0.99, window=1024, slack=1.25,
+            prefix_length=0, max_prefixes=4096, min_samples=8, max_hint=1<<24):
+        """
+        Constructor.
+
+        Args:
+            percentile (float): percentile of the observed sizes used as hint.
+            window (int): number of recent sizes remembered per prefix.
+            slack (float): factor applied to the percentile to absorb growth.
+            prefix_length (int): length of the key prefix used to group value
+                sizes (0 to group all the values together).
+            max_prefixes (int): maximum number of prefixes tracked; values
+                with other prefixes only contribute to the global sizes.
+            min_samples (int): number of sizes to observe before hinting.
+            max_hint (int): upper bound for hints, to bound memory usage.
+        """
+        if(not 0.0 < percentile <= 1.0):
+            raise ValueError("percentile should be in (0, 1]")
+        self._percentile = percentile
+        self._window = window
+        self._slack = slack
+        self._prefix_length = prefix_length
+        self._max_prefixes = max_prefixes
+        self._min_samples = min_samples
+        self._max_hint = max_hint
+        self._recompute_every = max(1, window // 16)
+        self._lock = threading.Lock()
+        self._key_sizes = _SizeWindow(window)
+        self._val_sizes = _SizeWindow(window)
+        self._val_sizes_by_prefix = {}
+        self._hits = 0
+        self._misses = 0
+        self._probes = 0
+
+    def _hint(self, sizes):
+        if(len(sizes.samples) < self._min_samples):
+            return 0
+        if(sizes.dirty >= self._recompute_every or sizes.hint == 0):
+            ordered = sorted(sizes.samples)
+            index = min(len(ordered) - 1, int(self._percentile * len(ordered)))
+            sizes.hint = min(self._max_hint, max(1, int(ordered[index] * self._slack)))
+            sizes.dirty = 0
+        return sizes.hint
+
+    def key_hint(self):
+        """Returns the size hint for keys, 0 if no hint can be provided yet."""
+        with self._lock:
+            return self._hint(self._key_sizes)
+
+    def value_hint(self, key=None):
+        """
+        Returns the size hint for the value associated with the given key,
+        0 if no hint can be provided yet. If key is None, the hint is based
+        on the sizes of all the values observed.
+        """
+        with self._lock:
+            if(key is not None and self._prefix_length > 0):
+                sizes = self._val_sizes_by_prefix.get(key[:self._prefix_length])
+                if(sizes is not None and len(sizes.samples) >= self._min_samples):
+                    return self._hint(sizes)
+            return self._hint(self._val_sizes)
+
+    def record_key(self, size):
+        """Records the size of a key returned by the database."""
+        with self._lock:
+            self._key_sizes.add(size)
+
+    def record_value(self, key, size):
+        """Records the size of a value returned by the database."""
+        with self._lock:
+            self._val_sizes.add(size)
+            if(key is None or self._prefix_length == 0):
+                return
+            prefix = key[:self._prefix_length]
+            sizes = self._val_sizes_by_prefix.get(prefix)
+            if(sizes is None):
+                if(len(self._val_sizes_by_prefix) >= self._max_prefixes):
+                    return
+                sizes = _SizeWindow(self._window)
+                self._val_sizes_by_prefix[prefix] = sizes
+            sizes.add(size)
+
+    def record_hit(self):
+        """Records that a hinted request succeeded in a single RPC."""
+        with self._lock:
+            self._hits += 1
+
+    def record_miss(self):
+        """Records that a hint was too small and the size had to be queried."""
+        with self._lock:
+            self._misses += 1
+
+    def record_probe(self):
+        """Records that no hint was available and the size had to be queried."""
+        with self._lock:
+            self._probes += 1
+
+    @property
+    def stats(self):
+        """
+        Returns a dictionary with the number of hits (requests served in one
+        RPC thanks to a hint), misses (hints that were too small), probes
+        (requests issued without hint) and the hit rate.
+        """
+        with self._lock:
+            total = self._hits + self._misses + self._probes
+            return {
+                'hits': self._hits,
+                'misses': self._misses,
+                'probes': self._probes,
+                'hit_rate': (self._hits / total) if total else 0.0
+            }
+
+    def reset_stats(self):
+        """Resets the hit/miss/probe counters (learned sizes are kept)."""
+        with self._lock:
+            self._hits = 0
+            self._misses = 0
+            self._probes = 0
+
+
+class _SizeWindow():
+    """Recently observed sizes and the hint last computed from them."""
+
+    __slots__ = ('samples', 'dirty', 'hint')
+
+    def __init__(self, window):
+        self.samples = collections.deque(maxlen=window)
+        self.dirty = 0
+        self.hint = 0
+
+    def add(self, size):
+        self.samples.append(size)
+        self.dirty += 1
@@ -5,6 +5,7 @@
  */
 #include <pybind11/pybind11.h>
 #include <pybind11/stl.h>
+#include <algorithm>
 #include <sstream>
 #include <string>
 #include <vector>
@@ -85,49 +86,166 @@ static std::vector<std::pair<std::string,sdskv_database_id_t>> pysdskv_list_data
     return result;
 }
 
+/*
+ * Thrown when a buffer (or a size hint) is too small for the data
+ * SDSKV has to return. Translated into pysdskv's SizeError exception.
+ */
+class pysdskv_size_error : public std::runtime_error {
+    public:
+    using std::runtime_error::runtime_error;
+};
+
+/*
+ * Exposes the content of a Python object as a contiguous region of memory
+ * without copying it. str objects are exposed through their UTF-8
+ * representation, any other object must support the buffer protocol
+ * (bytes, bytearray, memoryview, numpy arrays, etc.) and be C-contiguous.
+ */
+class pysdskv_buffer {
+
+    py11::object m_obj;
+    Py_buffer    m_view;
+    bool         m_has_view = false;
+    char*        m_data = nullptr;
+    Py_ssize_t   m_size = 0;
+
+    public:
+
+    pysdskv_buffer(py11::handle obj, bool writable=false)
+    : m_obj(py11::reinterpret_borrow<py11::object>(obj)) {
+        if(!writable && PyUnicode_Check(obj.ptr())) {
+            const char* data = PyUnicode_AsUTF8AndSize(obj.ptr(), &m_size);
+            if(data == nullptr) throw py11::error_already_set();
+            m_data = const_cast<char*>(data);
+            return;
+        }
+        int flags = PyBUF_C_CONTIGUOUS;
+        if(writable) flags |= PyBUF_WRITABLE;
+        if(PyObject_GetBuffer(obj.ptr(), &m_view, flags) != 0)
+            throw py11::error_already_set();
+        m_has_view = true;
+        m_data = static_cast<char*>(m_view.buf);
+        m_size = m_view.len;
+    }
+
+    pysdskv_buffer(pysdskv_buffer&& other)
+    : m_obj(std::move(other.m_obj))
+    , m_view(other.m_view)
+    , m_has_view(other.m_has_view)
+    , m_data(other.m_data)
+    , m_size(other.m_size) {
+        other.m_has_view = false;
+    }
+
+    pysdskv_buffer(const pysdskv_buffer&) = delete;
+    pysdskv_buffer& operator=(const pysdskv_buffer&) = delete;
+
+    ~pysdskv_buffer() {
+        if(m_has_view) PyBuffer_Release(&m_view);
+    }
+
+    char* data() const { return m_data; }
+
+    hg_size_t size() const { return m_size; }
+};
+
+static std::vector<pysdskv_buffer> pysdskv_buffers(
+        const py11::sequence& seq, bool writable=false) {
+    std::vector<pysdskv_buffer> result;
+    result.reserve(seq.size());
+    for(auto item : seq) result.emplace_back(item, writable);
+    return result;
+}
+
+/*
+ * Allocates an uninitialized bytes object that SDSKV can write a value into,
+ * avoiding an intermediate std::string and the copy that goes with it.
+ */
+static py11::object pysdskv_alloc_bytes(hg_size_t size) {
+    PyObject* obj = PyBytes_FromStringAndSize(nullptr, size);
+    if(obj == nullptr) throw py11::error_already_set();
+    return py11::reinterpret_steal<py11::object>(obj);
+}
+
+/*
+ * Shrinks a bytes object allocated by pysdskv_alloc_bytes to the size
+ * actually written by SDSKV. The object must not be shared.
+ */
+static py11::bytes pysdskv_shrink_bytes(py11::object obj, hg_size_t size) {
+    PyObject* ptr = obj.release().ptr();
+    if(_PyBytes_Resize(&ptr, size) != 0) throw py11::error_already_set();
+    return py11::reinterpret_steal<py11::bytes>(ptr);
+}
+
 static py11::object pysdskv_get(
         pysdskv_provider_handle_t ph,
         sdskv_database_id_t id,
-        const std::string& key,
+        py11::object key,
         hg_size_t vsize) 
 {
+    pysdskv_buffer k(key);
     int ret;
     if(vsize == 0) {
         Py_BEGIN_ALLOW_THREADS
-        ret = sdskv_length(ph, id, key.c_str(), key.size(), &vsize);
+        ret = sdskv_length(ph, id, k.data(), k.size(), &vsize);
         Py_END_ALLOW_THREADS
         if(ret == SDSKV_ERR_UNKNOWN_KEY) return py11::none();
         if(ret != SDSKV_SUCCESS) {
             throw std::runtime_error(std::string("sdskv_length returned ")+std::to_string(ret));
         }
     }
-    std::string value(vsize, '\0');
+    py11::object value = pysdskv_alloc_bytes(vsize);
+    char* value_data = PyBytes_AS_STRING(value.ptr());
     Py_BEGIN_ALLOW_THREADS
-    ret = sdskv_get(ph, id, key.c_str(), key.size(), (void*)value.data(), &vsize);
+    ret = sdskv_get(ph, id, k.data(), k.size(), value_data, &vsize);
     Py_END_ALLOW_THREADS
     if(ret == SDSKV_ERR_UNKNOWN_KEY) return py11::none();
+    if(ret == SDSKV_ERR_SIZE)
+        throw pysdskv_size_error(std::string("sdskv_get returned ")+std::to_string(ret));
     if(ret != SDSKV_SUCCESS)
         throw std::runtime_error(std::string("sdskv_get returned ")+std::to_string(ret));
-    return py11::cast(value);
+    return pysdskv_shrink_bytes(std::move(value), vsize);
+}
+
+static py11::object pysdskv_get_into(
+        pysdskv_provider_handle_t ph,
+        sdskv_database_id_t id,
+        py11::object key,
+        py11::object buffer)
+{
+    pysdskv_buffer k(key);
+    pysdskv_buffer v(buffer, true);
+    hg_size_t vsize = v.size();
+    int ret;
+    Py_BEGIN_ALLOW_THREADS
+    ret = sdskv_get(ph, id, k.data(), k.size(), v.data(), &vsize);
+    Py_END_ALLOW_THREADS
+    if(ret == SDSKV_ERR_UNKNOWN_KEY) return py11::none();
+    if(ret == SDSKV_ERR_SIZE)
+        throw pysdskv_size_error(std::string("sdskv_get returned ")+std::to_string(ret));
+    if(ret != SDSKV_SUCCESS)
+        throw std::runtime_error(std::string("sdskv_get returned ")+std::to_string(ret));
+    return py11::cast(vsize);
 }
 
 static py11::object pysdskv_get_multi(
         pysdskv_provider_handle_t ph,
         sdskv_database_id_t id,
-        const std::vector<std::string>& keys,
+        const py11::sequence& keys,
         std::vector<hg_size_t>& val_sizes) 
 {
-    std::vector<hg_size_t> vsizes(keys.size());
-    std::vector<const void*> keys_ptr(keys.size());
-    std::vector<hg_size_t> keys_size(keys.size());
-    for(unsigned i=0; i < keys.size(); i++) {
-        keys_ptr[i]  = keys[i].data();
-        keys_size[i] = keys[i].size();
+    std::vector<pysdskv_buffer> kbufs = pysdskv_buffers(keys);
+    size_t count = kbufs.size();
+    std::vector<const void*> keys_ptr(count);
+    std::vector<hg_size_t> keys_size(count);
+    for(unsigned i=0; i < count; i++) {
+        keys_ptr[i]  = kbufs[i].data();
+        keys_size[i] = kbufs[i].size();
     }
     int ret;
     if(val_sizes[0] == 0) {
         Py_BEGIN_ALLOW_THREADS
-        ret = sdskv_length_multi(ph, id, keys.size(),
+        ret = sdskv_length_multi(ph, id, count,
                 keys_ptr.data(), keys_size.data(), val_sizes.data());
         Py_END_ALLOW_THREADS
         if(ret != SDSKV_SUCCESS) {
@@ -135,36 +253,76 @@ static py11::object pysdskv_get_multi(
                     + std::to_string(ret));
         }
     }
-    std::vector<std::string> values(keys.size());
-    std::vector<void*> val_ptrs(keys.size());
-    for(unsigned i=0; i < keys.size(); i++) {
-        values[i].resize(val_sizes[i]);
-        val_ptrs[i] = const_cast<char*>(values[i].data());
+    std::vector<py11::object> values(count);
+    std::vector<void*> val_ptrs(count);
+    for(unsigned i=0; i < count; i++) {
+        values[i] = pysdskv_alloc_bytes(val_sizes[i]);
+        val_ptrs[i] = PyBytes_AS_STRING(values[i].ptr());
     }
     Py_BEGIN_ALLOW_THREADS
-    ret = sdskv_get_multi(ph, id, keys.size(),
+    ret = sdskv_get_multi(ph, id, count,
             keys_ptr.data(), keys_size.data(),
             val_ptrs.data(), val_sizes.data());
     Py_END_ALLOW_THREADS
+    if(ret == SDSKV_ERR_SIZE)
+        throw pysdskv_size_error(std::string("sdskv_get_multi returned ")+std::to_string(ret));
     if(ret != SDSKV_SUCCESS) {
         throw std::runtime_error(std::string("sdskv_get_multi returned ")
                 + std::to_string(ret));
     }
-    for(unsigned i=0; i < keys.size(); i++) {
-        values[i].resize(val_sizes[i]);
+    py11::list result;
+    for(unsigned i=0; i < count; i++) {
+        result.append(pysdskv_shrink_bytes(std::move(values[i]), val_sizes[i]));
+    }
+    return result;
+}
+
+static py11::object pysdskv_get_multi_into(
+        pysdskv_provider_handle_t ph,
+        sdskv_database_id_t id,
+        const py11::sequence& keys,
+        const py11::sequence& buffers)
+{
+    std::vector<pysdskv_buffer> kbufs = pysdskv_buffers(keys);
+    std::vector<pysdskv_buffer> vbufs = pysdskv_buffers(buffers, true);
+    size_t count = kbufs.size();
+    if(vbufs.size() != count)
+        throw std::invalid_argument("Number of keys and buffers do not match");
+    std::vector<const void*> keys_ptr(count);
+    std::vector<hg_size_t> keys_size(count);
+    std::vector<void*> val_ptrs(count);
+    std::vector<hg_size_t> val_sizes(count);
+    for(unsigned i=0; i < count; i++) {
+        keys_ptr[i]  = kbufs[i].data();
+        keys_size[i] = kbufs[i].size();
+        val_ptrs[i]  = vbufs[i].data();
+        val_sizes[i] = vbufs[i].size();
+    }
+    int ret;
+    Py_BEGIN_ALLOW_THREADS
+    ret = sdskv_get_multi(ph, id, count,
+            keys_ptr.data(), keys_size.data(),
+            val_ptrs.data(), val_sizes.data());
+    Py_END_ALLOW_THREADS
+    if(ret == SDSKV_ERR_SIZE)
+        throw pysdskv_size_error(std::string("sdskv_get_multi returned ")+std::to_string(ret));
+    if(ret != SDSKV_SUCCESS) {
+        throw std::runtime_error(std::string("sdskv_get_multi returned ")
+                + std::to_string(ret));
     }
-    return py11::cast(values);
+    return py11::cast(val_sizes);
 }
 
 static py11::object pysdskv_length(
         pysdskv_provider_handle_t ph,
         sdskv_database_id_t id,
-        const std::string& key) 
+        py11::object key) 
 {
+    pysdskv_buffer k(key);
     hg_size_t vsize;
     int ret;
     Py_BEGIN_ALLOW_THREADS
-    ret = sdskv_length(ph, id, key.c_str(), key.size(), &vsize);
+    ret = sdskv_length(ph, id, k.data(), k.size(), &vsize);
     Py_END_ALLOW_THREADS
     if(ret == SDSKV_ERR_UNKNOWN_KEY) return py11::none();
     if(ret != SDSKV_SUCCESS) {
@@ -177,18 +335,20 @@ static py11::object pysdskv_length(
 static py11::object pysdskv_length_multi(
         pysdskv_provider_handle_t ph,
         sdskv_database_id_t id,
-        const std::vector<std::string>& keys)
+        const py11::sequence& keys)
 {
-    std::vector<hg_size_t> vsizes(keys.size());
-    std::vector<hg_size_t> keys_size(keys.size());
-    std::vector<const void*> keys_ptrs(keys.size());
-    for(unsigned i=0; i<keys.size(); i++) {
-        keys_ptrs[i] = keys[i].data();
-        keys_size[i] = keys[i].size();
+    std::vector<pysdskv_buffer> kbufs = pysdskv_buffers(keys);
+    size_t count = kbufs.size();
+    std::vector<hg_size_t> vsizes(count);
+    std::vector<hg_size_t> keys_size(count);
+    std::vector<const void*> keys_ptrs(count);
+    for(unsigned i=0; i<count; i++) {
+        keys_ptrs[i] = kbufs[i].data();
+        keys_size[i] = kbufs[i].size();
     }
     int ret;
     Py_BEGIN_ALLOW_THREADS
-    ret = sdskv_length_multi(ph, id, keys.size(),
+    ret = sdskv_length_multi(ph, id, count,
             keys_ptrs.data(), keys_size.data(), vsizes.data());
     Py_END_ALLOW_THREADS
     if(ret != SDSKV_SUCCESS) {
@@ -201,12 +361,14 @@ static py11::object pysdskv_length_multi(
 static void pysdskv_put(
         pysdskv_provider_handle_t ph,
         sdskv_database_id_t id,
-        const std::string& key,
-        const std::string& value) 
+        py11::object key,
+        py11::object value) 
 {
+    pysdskv_buffer k(key);
+    pysdskv_buffer v(value);
     int ret;
     Py_BEGIN_ALLOW_THREADS
-    ret = sdskv_put(ph, id, key.data(), key.size(), value.data(), value.size());
+    ret = sdskv_put(ph, id, k.data(), k.size(), v.data(), v.size());
     Py_END_ALLOW_THREADS
     if(ret != SDSKV_SUCCESS) 
         throw std::runtime_error(std::string("sdskv_put returned ")
@@ -216,22 +378,27 @@ static void pysdskv_put(
 static void pysdskv_put_multi(
         pysdskv_provider_handle_t ph,
         sdskv_database_id_t id,
-        const std::vector<std::string>& keys,
-        const std::vector<std::string>& values) 
+        const py11::sequence& keys,
+        const py11::sequence& values) 
 {
     int ret;
-    std::vector<const void*> keys_ptrs(keys.size());
-    std::vector<hg_size_t>   keys_size(keys.size());
-    std::vector<const void*> vals_ptrs(values.size());
-    std::vector<hg_size_t>   vals_size(values.size());
-    for(unsigned i=0; i < keys.size(); i++) {
-        keys_ptrs[i] = keys[i].data();
-        keys_size[i] = keys[i].size();
-        vals_ptrs[i] = values[i].data();
-        vals_size[i] = values[i].size();
+    std::vector<pysdskv_buffer> kbufs = pysdskv_buffers(keys);
+    std::vector<pysdskv_buffer> vbufs = pysdskv_buffers(values);
+    size_t count = kbufs.size();
+    if(vbufs.size() != count)
+        throw std::invalid_argument("Number of keys and values do not match");
+    std::vector<const void*> keys_ptrs(count);
+    std::vector<hg_size_t>   keys_size(count);
+    std::vector<const void*> vals_ptrs(count);
+    std::vector<hg_size_t>   vals_size(count);
+    for(unsigned i=0; i < count; i++) {
+        keys_ptrs[i] = kbufs[i].data();
+        keys_size[i] = kbufs[i].size();
+        vals_ptrs[i] = vbufs[i].data();
+        vals_size[i] = vbufs[i].size();
     }
     Py_BEGIN_ALLOW_THREADS
-    ret = sdskv_put_multi(ph, id, keys.size(),
+    ret = sdskv_put_multi(ph, id, count,
             keys_ptrs.data(), keys_size.data(),
             vals_ptrs.data(), vals_size.data());
     Py_END_ALLOW_THREADS
@@ -243,12 +410,13 @@ static void pysdskv_put_multi(
 static py11::object pysdskv_exists(
         pysdskv_provider_handle_t ph,
         sdskv_database_id_t id,
-        const std::string& key)
+        py11::object key)
 {
+    pysdskv_buffer k(key);
     hg_size_t len;
     int ret;
     Py_BEGIN_ALLOW_THREADS
-    ret = sdskv_length(ph, id, key.data(), key.size(), &len);
+    ret = sdskv_length(ph, id, k.data(), k.size(), &len);
     Py_END_ALLOW_THREADS
     if(ret == SDSKV_ERR_UNKNOWN_KEY) return py11::cast(false);
     if(ret == SDSKV_SUCCESS) return py11::cast(true);
@@ -259,134 +427,397 @@ static py11::object pysdskv_exists(
 static void pysdskv_erase(
         pysdskv_provider_handle_t ph,
         sdskv_database_id_t id,
-        const std::string& key) {
+        py11::object key) {
+    pysdskv_buffer k(key);
     int ret;
     Py_BEGIN_ALLOW_THREADS
-    ret = sdskv_erase(ph, id, key.data(), key.size());
+    ret = sdskv_erase(ph, id, k.data(), k.size());
     Py_END_ALLOW_THREADS
     if(ret == SDSKV_SUCCESS) return;
     throw std::runtime_error(std::string("sdskv_erase returned ")+std::to_string(ret));
 }
 
-static std::vector<std::string> pysdskv_list_keys(
+static void pysdskv_erase_multi(
         pysdskv_provider_handle_t ph,
         sdskv_database_id_t id,
-        const std::string& start_key,
-        const std::string& prefix,
+        const py11::sequence& keys) {
+    std::vector<pysdskv_buffer> kbufs = pysdskv_buffers(keys);
+    size_t count = kbufs.size();
+    std::vector<const void*> keys_ptrs(count);
+    std::vector<hg_size_t>   keys_size(count);
+    for(unsigned i=0; i < count; i++) {
+        keys_ptrs[i] = kbufs[i].data();
+        keys_size[i] = kbufs[i].size();
+    }
+    int ret;
+    Py_BEGIN_ALLOW_THREADS
+    ret = sdskv_erase_multi(ph, id, count, keys_ptrs.data(), keys_size.data());
+    Py_END_ALLOW_THREADS
+    if(ret == SDSKV_SUCCESS) return;
+    throw std::runtime_error(std::string("sdskv_erase_multi returned ")+std::to_string(ret));
+}
+
+/*
+ * Returns the number of records, among the first max_keys, whose keys (and
+ * values if val_sizes is not null) fit in max_bytes, keeping at least one
+ * record so that a scan always makes progress. A max_bytes of 0 means no limit.
+ */
+static hg_size_t pysdskv_budget(
+        const std::vector<hg_size_t>& key_sizes,
+        const std::vector<hg_size_t>* val_sizes,
         hg_size_t max_keys,
-        hg_size_t key_size) {
+        hg_size_t max_bytes)
+{
+    if(max_bytes == 0) return max_keys;
+    hg_size_t total = 0;
+    for(hg_size_t i = 0; i < max_keys; i++) {
+        total += key_sizes[i];
+        if(val_sizes) total += (*val_sizes)[i];
+        if(total > max_bytes) return i == 0 ? 1 : i;
+    }
+    return max_keys;
+}
+
+/*
+ * Same as pysdskv_budget when the sizes of the records are not known yet
+ * and the hints are used as their sizes.
+ */
+static hg_size_t pysdskv_budget_hint(
+        hg_size_t record_size,
+        hg_size_t max_keys,
+        hg_size_t max_bytes)
+{
+    if(max_bytes == 0 || record_size == 0) return max_keys;
+    return std::max<hg_size_t>(1, std::min(max_keys, max_bytes / record_size));
+}
+
+static py11::object pysdskv_list_keys(
+        pysdskv_provider_handle_t ph,
+        sdskv_database_id_t id,
+        py11::object start_key,
+        py11::object prefix,
+        hg_size_t max_keys,
+        hg_size_t key_size,
+        hg_size_t max_bytes) {
 
     int ret;
+    py11::list result;
     if(max_keys == 0)
-        return std::vector<std::string>();
+        return result;
 
+    pysdskv_buffer start(start_key);
+    pysdskv_buffer pfx(prefix);
+    if(key_size != 0)
+        max_keys = pysdskv_budget_hint(key_size, max_keys, max_bytes);
     std::vector<hg_size_t> key_sizes(max_keys, key_size);
-    std::vector<std::string> keys(max_keys);
+    std::vector<py11::object> keys(max_keys);
     std::vector<void*> keys_addr(max_keys, nullptr);
 
     if(key_size == 0) {
+        Py_BEGIN_ALLOW_THREADS
         ret = sdskv_list_keys_with_prefix(ph, id,
-                start_key.data(), start_key.size(),
-                prefix.data(), prefix.size(),
+                start.data(), start.size(),
+                pfx.data(), pfx.size(),
                 nullptr,
                 key_sizes.data(),
                 &max_keys);
+        Py_END_ALLOW_THREADS
         if(ret != SDSKV_SUCCESS && ret != SDSKV_ERR_SIZE) {
             throw std::runtime_error(std::string("sdskv_list_keys_with_prefix returned ")+std::to_string(ret));
         }
+        max_keys = pysdskv_budget(key_sizes, nullptr, max_keys, max_bytes);
     }
 
     for(unsigned i = 0; i < max_keys; i++) {
-        keys[i].resize(key_sizes[i]);
-        keys_addr[i] = const_cast<char*>(keys[i].data());
+        keys[i] = pysdskv_alloc_bytes(key_sizes[i]);
+        keys_addr[i] = PyBytes_AS_STRING(keys[i].ptr());
     }
 
+    Py_BEGIN_ALLOW_THREADS
     ret = sdskv_list_keys_with_prefix(ph, id,
-            start_key.data(), start_key.size(),
-            prefix.data(), prefix.size(),
+            start.data(), start.size(),
+            pfx.data(), pfx.size(),
             keys_addr.data(),
             key_sizes.data(),
             &max_keys);
-    keys.resize(max_keys);
-    for(unsigned i = 0; i < max_keys; i++) {
-        keys[i].resize(key_sizes[i]);
-    }
+    Py_END_ALLOW_THREADS
 
+    if(ret == SDSKV_ERR_SIZE)
+        throw pysdskv_size_error(std::string("sdskv_list_keys_with_prefix returned ")+std::to_string(ret));
     if(ret != SDSKV_SUCCESS)
         throw std::runtime_error(std::string("sdskv_list_keys_with_prefix returned ")+std::to_string(ret));
 
-    return keys;
+    for(unsigned i = 0; i < max_keys; i++) {
+        result.append(pysdskv_shrink_bytes(std::move(keys[i]), key_sizes[i]));
+    }
+    return result;
 }
 
-static std::pair<
-        std::vector<std::string>,
-        std::vector<std::string>
-        > pysdskv_list_keyvals(
+static py11::object pysdskv_list_keyvals(
             pysdskv_provider_handle_t ph,
             sdskv_database_id_t id,
-            const std::string& start_key,
-            const std::string& prefix,
+            py11::object start_key,
+            py11::object prefix,
             hg_size_t max_keys,
             hg_size_t key_size,
-            hg_size_t val_size) {
+            hg_size_t val_size,
+            hg_size_t max_bytes) {
 
     int ret;
-    std::vector<hg_size_t> key_sizes(max_keys, key_size);
-    std::vector<hg_size_t> val_sizes(max_keys, val_size);
-
-    std::pair<std::vector<std::string>,std::vector<std::string>> result;
+    py11::list result_keys;
+    py11::list result_vals;
     if(max_keys == 0)
-        return result;
-
-    result.first.resize(max_keys);
-    result.second.resize(max_keys);
+        return py11::make_tuple(result_keys, result_vals);
 
-    std::vector<std::string>& keys = result.first;
+    pysdskv_buffer start(start_key);
+    pysdskv_buffer pfx(prefix);
+    if(key_size != 0 && val_size != 0)
+        max_keys = pysdskv_budget_hint(key_size + val_size, max_keys, max_bytes);
+    std::vector<hg_size_t> key_sizes(max_keys, key_size);
+    std::vector<hg_size_t> val_sizes(max_keys, val_size);
+    std::vector<py11::object> keys(max_keys);
     std::vector<void*> keys_addr(max_keys, nullptr);
-    std::vector<std::string>& vals = result.second;
+    std::vector<py11::object> vals(max_keys);
     std::vector<void*> vals_addr(max_keys, nullptr);
 
     if(key_size == 0 || val_size == 0) {
+        Py_BEGIN_ALLOW_THREADS
         ret = sdskv_list_keyvals_with_prefix(ph, id,
-                start_key.data(), start_key.size(),
-                prefix.data(), prefix.size(),
+                start.data(), start.size(),
+                pfx.data(), pfx.size(),
                 nullptr,
                 key_sizes.data(),
                 nullptr,
                 val_sizes.data(),
                 &max_keys);
+        Py_END_ALLOW_THREADS
         if(ret != SDSKV_SUCCESS && ret != SDSKV_ERR_SIZE) {
             throw std::runtime_error(std::string("sdskv_list_keyvals_with_prefix returned ")+std::to_string(ret));
         }
+        max_keys = pysdskv_budget(key_sizes, &val_sizes, max_keys, max_bytes);
     }
 
     for(unsigned i = 0; i < max_keys; i++) {
-        keys[i].resize(key_sizes[i]);
-        keys_addr[i] = const_cast<char*>(keys[i].data());
-        vals[i].resize(val_sizes[i]);
-        vals_addr[i] = const_cast<char*>(vals[i].data());
+        keys[i] = pysdskv_alloc_bytes(key_sizes[i]);
+        keys_addr[i] = PyBytes_AS_STRING(keys[i].ptr());
+        vals[i] = pysdskv_alloc_bytes(val_sizes[i]);
+        vals_addr[i] = PyBytes_AS_STRING(vals[i].ptr());
     }
 
+    Py_BEGIN_ALLOW_THREADS
     ret = sdskv_list_keyvals_with_prefix(ph, id,
-            start_key.data(), start_key.size(),
-            prefix.data(), prefix.size(),
+            start.data(), start.size(),
+            pfx.data(), pfx.size(),
             keys_addr.data(),
             key_sizes.data(),
             vals_addr.data(),
             val_sizes.data(),
             &max_keys);
+    Py_END_ALLOW_THREADS
+
+    if(ret == SDSKV_ERR_SIZE)
+        throw pysdskv_size_error(std::string("sdskv_list_keyvals_with_prefix returned ")+std::to_string(ret));
+    if(ret != SDSKV_SUCCESS)
+        throw std::runtime_error(std::string("sdskv_list_keyvals_with_prefix returned ")+std::to_string(ret));
 
-    keys.resize(max_keys);
-    vals.resize(max_keys);
     for(unsigned i = 0; i < max_keys; i++) {
-        keys[i].resize(key_sizes[i]);
-        vals[i].resize(val_sizes[i]);
+        result_keys.append(pysdskv_shrink_bytes(std::move(keys[i]), key_sizes[i]));
+        result_vals.append(pysdskv_shrink_bytes(std::move(vals[i]), val_sizes[i]));
     }
+    return py11::make_tuple(result_keys, result_vals);
+}
 
+/*
+ * Checks that a packed buffer and its array of sizes are consistent
+ * and returns the number of items they describe.
+ */
+static size_t pysdskv_packed_count(
+        const pysdskv_buffer& data,
+        const pysdskv_buffer& sizes)
+{
+    if(sizes.size() % sizeof(hg_size_t) != 0)
+        throw std::invalid_argument("sizes should be an array of 64-bit unsigned integers");
+    size_t count = sizes.size() / sizeof(hg_size_t);
+    const hg_size_t* s = reinterpret_cast<const hg_size_t*>(sizes.data());
+    hg_size_t total = 0;
+    for(size_t i = 0; i < count; i++) total += s[i];
+    if(total > data.size())
+        throw std::invalid_argument("sizes exceed the size of the packed buffer");
+    return count;
+}
+
+static void pysdskv_put_packed(
+        pysdskv_provider_handle_t ph,
+        sdskv_database_id_t id,
+        py11::object keys,
+        py11::object key_sizes,
+        py11::object values,
+        py11::object value_sizes)
+{
+    pysdskv_buffer kbuf(keys);
+    pysdskv_buffer ksizes(key_sizes);
+    pysdskv_buffer vbuf(values);
+    pysdskv_buffer vsizes(value_sizes);
+    size_t count = pysdskv_packed_count(kbuf, ksizes);
+    if(pysdskv_packed_count(vbuf, vsizes) != count)
+        throw std::invalid_argument("Number of keys and values do not match");
+    if(count == 0) return;
+    int ret;
+    Py_BEGIN_ALLOW_THREADS
+    ret = sdskv_put_packed(ph, id, count,
+            kbuf.data(), reinterpret_cast<const hg_size_t*>(ksizes.data()),
+            vbuf.data(), reinterpret_cast<const hg_size_t*>(vsizes.data()));
+    Py_END_ALLOW_THREADS
     if(ret != SDSKV_SUCCESS)
-        throw std::runtime_error(std::string("sdskv_list_keys_with_prefix returned ")+std::to_string(ret));
+        throw std::runtime_error(std::string("sdskv_put_packed returned ")
+                + std::to_string(ret));
+}
 
-    return result;
+static py11::object pysdskv_get_packed(
+        pysdskv_provider_handle_t ph,
+        sdskv_database_id_t id,
+        py11::object keys,
+        py11::object key_sizes,
+        hg_size_t vbufsize)
+{
+    pysdskv_buffer kbuf(keys);
+    pysdskv_buffer ksizes(key_sizes);
+    size_t count = pysdskv_packed_count(kbuf, ksizes);
+    const hg_size_t* ksizes_ptr = reinterpret_cast<const hg_size_t*>(ksizes.data());
+    py11::object vsizes = pysdskv_alloc_bytes(count*sizeof(hg_size_t));
+    hg_size_t* vsizes_ptr = reinterpret_cast<hg_size_t*>(PyBytes_AS_STRING(vsizes.ptr()));
+    int ret;
+    if(vbufsize == 0) {
+        Py_BEGIN_ALLOW_THREADS
+        ret = sdskv_length_packed(ph, id, count, kbuf.data(), ksizes_ptr, vsizes_ptr);
+        Py_END_ALLOW_THREADS
+        if(ret != SDSKV_SUCCESS)
+            throw std::runtime_error(std::string("sdskv_length_packed returned ")
+                    + std::to_string(ret));
+        for(size_t i = 0; i < count; i++) vbufsize += vsizes_ptr[i];
+    }
+    py11::object values = pysdskv_alloc_bytes(vbufsize);
+    char* values_ptr = PyBytes_AS_STRING(values.ptr());
+    Py_BEGIN_ALLOW_THREADS
+    ret = sdskv_get_packed(ph, id, &count, kbuf.data(), ksizes_ptr,
+            vbufsize, values_ptr, vsizes_ptr);
+    Py_END_ALLOW_THREADS
+    if(ret == SDSKV_ERR_SIZE)
+        throw pysdskv_size_error(std::string("sdskv_get_packed returned ")+std::to_string(ret));
+    if(ret != SDSKV_SUCCESS)
+        throw std::runtime_error(std::string("sdskv_get_packed returned ")
+                + std::to_string(ret));
+    hg_size_t total = 0;
+    for(size_t i = 0; i < count; i++) total += vsizes_ptr[i];
+    if(total > vbufsize) total = vbufsize;
+    return py11::make_tuple(
+            pysdskv_shrink_bytes(std::move(values), total),
+            pysdskv_shrink_bytes(std::move(vsizes), count*sizeof(hg_size_t)));
+}
+
+/*
+ * Packs the entries a list_keyvals call wrote at the given capacities
+ * (offsets) into a contiguous sequence, and returns its total size.
+ */
+static hg_size_t pysdskv_compact(
+        char* data,
+        const std::vector<hg_size_t>& capacities,
+        const hg_size_t* sizes,
+        size_t count)
+{
+    hg_size_t src = 0, dst = 0;
+    for(size_t i = 0; i < count; i++) {
+        if(src != dst) std::memmove(data + dst, data + src, sizes[i]);
+        src += capacities[i];
+        dst += sizes[i];
+    }
+    return dst;
+}
+
+static py11::object pysdskv_list_keyvals_packed(
+            pysdskv_provider_handle_t ph,
+            sdskv_database_id_t id,
+            py11::object start_key,
+            py11::object prefix,
+            hg_size_t max_keys,
+            hg_size_t key_size,
+            hg_size_t val_size,
+            hg_size_t max_bytes) {
+
+    int ret;
+    pysdskv_buffer start(start_key);
+    pysdskv_buffer pfx(prefix);
+    if(key_size != 0 && val_size != 0)
+        max_keys = pysdskv_budget_hint(key_size + val_size, max_keys, max_bytes);
+    std::vector<hg_size_t> key_caps(max_keys, key_size);
+    std::vector<hg_size_t> val_caps(max_keys, val_size);
+
+    if(max_keys != 0 && (key_size == 0 || val_size == 0)) {
+        Py_BEGIN_ALLOW_THREADS
+        ret = sdskv_list_keyvals_with_prefix(ph, id,
+                start.data(), start.size(),
+                pfx.data(), pfx.size(),
+                nullptr,
+                key_caps.data(),
+                nullptr,
+                val_caps.data(),
+                &max_keys);
+        Py_END_ALLOW_THREADS
+        if(ret != SDSKV_SUCCESS && ret != SDSKV_ERR_SIZE) {
+            throw std::runtime_error(std::string("sdskv_list_keyvals_with_prefix returned ")+std::to_string(ret));
+        }
+        max_keys = pysdskv_budget(key_caps, &val_caps, max_keys, max_bytes);
+    }
+
+    hg_size_t keys_total = 0, vals_total = 0;
+    for(unsigned i = 0; i < max_keys; i++) {
+        keys_total += key_caps[i];
+        vals_total += val_caps[i];
+    }
+    py11::object keys = pysdskv_alloc_bytes(keys_total);
+    py11::object vals = pysdskv_alloc_bytes(vals_total);
+    py11::object key_sizes = pysdskv_alloc_bytes(max_keys*sizeof(hg_size_t));
+    py11::object val_sizes = pysdskv_alloc_bytes(max_keys*sizeof(hg_size_t));
+    char* keys_ptr = PyBytes_AS_STRING(keys.ptr());
+    char* vals_ptr = PyBytes_AS_STRING(vals.ptr());
+    hg_size_t* ksizes = reinterpret_cast<hg_size_t*>(PyBytes_AS_STRING(key_sizes.ptr()));
+    hg_size_t* vsizes = reinterpret_cast<hg_size_t*>(PyBytes_AS_STRING(val_sizes.ptr()));
+    std::vector<void*> keys_addr(max_keys, nullptr);
+    std::vector<void*> vals_addr(max_keys, nullptr);
+    hg_size_t koffset = 0, voffset = 0;
+    for(unsigned i = 0; i < max_keys; i++) {
+        keys_addr[i] = keys_ptr + koffset;
+        vals_addr[i] = vals_ptr + voffset;
+        ksizes[i] = key_caps[i];
+        vsizes[i] = val_caps[i];
+        koffset += key_caps[i];
+        voffset += val_caps[i];
+    }
+
+    if(max_keys != 0) {
+        Py_BEGIN_ALLOW_THREADS
+        ret = sdskv_list_keyvals_with_prefix(ph, id,
+                start.data(), start.size(),
+                pfx.data(), pfx.size(),
+                keys_addr.data(),
+                ksizes,
+                vals_addr.data(),
+                vsizes,
+                &max_keys);
+        Py_END_ALLOW_THREADS
+        if(ret == SDSKV_ERR_SIZE)
+            throw pysdskv_size_error(std::string("sdskv_list_keyvals_with_prefix returned ")+std::to_string(ret));
+        if(ret != SDSKV_SUCCESS)
+            throw std::runtime_error(std::string("sdskv_list_keyvals_with_prefix returned ")+std::to_string(ret));
+    }
+
+    keys_total = pysdskv_compact(keys_ptr, key_caps, ksizes, max_keys);
+    vals_total = pysdskv_compact(vals_ptr, val_caps, vsizes, max_keys);
+    return py11::make_tuple(
+            pysdskv_shrink_bytes(std::move(keys), keys_total),
+            pysdskv_shrink_bytes(std::move(key_sizes), max_keys*sizeof(hg_size_t)),
+            pysdskv_shrink_bytes(std::move(vals), vals_total),
+            pysdskv_shrink_bytes(std::move(val_sizes), max_keys*sizeof(hg_size_t)));
 }
 
 static void pysdskv_migrate_database(
@@ -410,6 +841,7 @@ static void pysdskv_migrate_database(
 
 PYBIND11_MODULE(_pysdskvclient, m)
 {
+    py11::register_exception<pysdskv_size_error>(m, "SizeError", PyExc_RuntimeError);
     m.def("client_init", &pysdskv_client_init);
     m.def("client_finalize", [](pysdskv_client_t clt) {
             return sdskv_client_finalize(clt); });
@@ -421,15 +853,29 @@ PYBIND11_MODULE(_pysdskvclient, m)
     m.def("open", &pysdskv_open);
     m.def("list_databases", &pysdskv_list_databases);
     m.def("get", &pysdskv_get);
+    m.def("get_into", &pysdskv_get_into);
     m.def("get_multi", &pysdskv_get_multi);
+    m.def("get_multi_into", &pysdskv_get_multi_into);
     m.def("length", &pysdskv_length);
     m.def("length_multi", &pysdskv_length_multi);
     m.def("put", &pysdskv_put);
     m.def("put_multi", &pysdskv_put_multi);
     m.def("exists", &pysdskv_exists);
     m.def("erase", &pysdskv_erase);
-    m.def("list_keys", &pysdskv_list_keys);
-    m.def("list_keyvals", &pysdskv_list_keyvals);
+    m.def("erase_multi", &pysdskv_erase_multi);
+    m.def("list_keys", &pysdskv_list_keys,
+            py11::arg("ph"), py11::arg("db_id"), py11::arg("start_key"), py11::arg("prefix"),
+            py11::arg("max_keys"), py11::arg("key_size"), py11::arg("max_bytes") = 0);
+    m.def("list_keyvals", &pysdskv_list_keyvals,
+            py11::arg("ph"), py11::arg("db_id"), py11::arg("start_key"), py11::arg("prefix"),
+            py11::arg("max_keys"), py11::arg("key_size"), py11::arg("val_size"),
+            py11::arg("max_bytes") = 0);
+    m.def("put_packed", &pysdskv_put_packed);
+    m.def("get_packed", &pysdskv_get_packed);
+    m.def("list_keyvals_packed", &pysdskv_list_keyvals_packed,
+            py11::arg("ph"), py11::arg("db_id"), py11::arg("start_key"), py11::arg("prefix"),
+            py11::arg("max_keys"), py11::arg("key_size"), py11::arg("val_size"),
+            py11::arg("max_bytes") = 0);
     m.def("migrate_database", &pysdskv_migrate_database);
     m.def("shutdown_service", [](pysdskv_client_t clt, pyhg_addr_t addr) {
             return sdskv_shutdown_service(clt, addr); });
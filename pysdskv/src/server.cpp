@@ -4,10 +4,14 @@
  * See COPYRIGHT in top-level directory.
  */
 #include <pybind11/pybind11.h>
+#include <pybind11/stl.h>
+#include <algorithm>
 #include <string>
+#include <tuple>
 #include <vector>
 #include <cstring>
 #include <iostream>
+#include <abt.h>
 #include <margo.h>
 #include <sdskv-common.h>
 #include <sdskv-server.h>
@@ -17,36 +21,180 @@ namespace py11 = pybind11;
 typedef py11::capsule pymargo_instance_id;
 typedef py11::capsule pyhg_addr_t;
 typedef py11::capsule pysdskv_provider_t;
+typedef std::tuple<std::string, std::string, sdskv_db_type_t, py11::object, bool> pysdskv_db_config;
 
 #define MID2CAPSULE(__mid)    py11::capsule((void*)(__mid),  "margo_instance_id")
 #define ADDR2CAPSULE(__addr)  py11::capsule((void*)(__addr), "hg_addr_t")
 #define SDSKVPR2CAPSULE(__pr) py11::capsule((void*)(__pr),   "pysdskv_provider_t")
 
-static pysdskv_provider_t pysdskv_provider_register(pymargo_instance_id mid, uint8_t provider_id) {
+/*
+ * Execution streams created for a provider, joined when margo finalizes.
+ */
+struct pysdskv_xstreams {
+    std::vector<ABT_xstream> xstreams;
+};
+
+static void pysdskv_free_xstreams(void* arg) {
+    pysdskv_xstreams* xs = static_cast<pysdskv_xstreams*>(arg);
+    for(auto& x : xs->xstreams) {
+        ABT_xstream_join(x);
+        ABT_xstream_free(&x);
+    }
+    delete xs;
+}
+
+/*
+ * Creates a pool served by num_xstreams new execution streams.
+ */
+static ABT_pool pysdskv_create_pool(margo_instance_id mid, unsigned num_xstreams) {
+    ABT_pool pool;
+    int ret = ABT_pool_create_basic(ABT_POOL_FIFO, ABT_POOL_ACCESS_MPMC, ABT_TRUE, &pool);
+    if(ret != ABT_SUCCESS)
+        throw std::runtime_error(std::string("ABT_pool_create_basic returned ")+std::to_string(ret));
+    pysdskv_xstreams* xs = new pysdskv_xstreams();
+    for(unsigned i = 0; i < num_xstreams; i++) {
+        ABT_xstream x;
+        ret = ABT_xstream_create_basic(ABT_SCHED_DEFAULT, 1, &pool, ABT_SCHED_CONFIG_NULL, &x);
+        if(ret != ABT_SUCCESS) {
+            pysdskv_free_xstreams(xs);
+            throw std::runtime_error(std::string("ABT_xstream_create_basic returned ")+std::to_string(ret));
+        }
+        xs->xstreams.push_back(x);
+    }
+    margo_push_finalize_callback(mid, pysdskv_free_xstreams, xs);
+    return pool;
+}
+
+static pysdskv_provider_t pysdskv_provider_register(
+        pymargo_instance_id mid,
+        uint8_t provider_id,
+        py11::object pool_obj,
+        unsigned num_xstreams) {
     sdskv_provider_t provider;
-    int ret = sdskv_provider_register(mid, provider_id, NULL, &provider);
+    ABT_pool pool = ABT_POOL_NULL;
+    if(!pool_obj.is_none()) {
+        py11::capsule pool_capsule = pool_obj.cast<py11::capsule>();
+        pool = static_cast<ABT_pool>(pool_capsule.get_pointer());
+    } else if(num_xstreams != 0) {
+        pool = pysdskv_create_pool(mid, num_xstreams);
+    }
+    int ret = sdskv_provider_register(mid, provider_id, pool, &provider);
     if(ret != 0) return py11::none();
     else return SDSKVPR2CAPSULE(provider);
 }
 
-static sdskv_database_id_t pysdskv_provider_attach_database(
+/*
+ * Comparators that can be registered on a provider by name and used to
+ * order the keys of its databases instead of the lexicographic order.
+ */
+static int pysdskv_compare_reverse(const void* k1, hg_size_t s1, const void* k2, hg_size_t s2) {
+    int c = std::memcmp(k1, k2, std::min(s1, s2));
+    if(c == 0) c = (s1 < s2) ? -1 : (s1 > s2 ? 1 : 0);
+    return -c;
+}
+
+/* Keys of sizeof(T) bytes are compared as native integers. Keys of different
+ * sizes are ordered by size (shorter keys sort before sizeof(T)-byte keys,
+ * longer ones after), and keys of the same other size by memcmp. */
+template<typename T>
+static int pysdskv_compare_integer(const void* k1, hg_size_t s1, const void* k2, hg_size_t s2) {
+    if(s1 != sizeof(T) || s2 != sizeof(T)) {
+        if(s1 != s2) return s1 < s2 ? -1 : 1;
+        return std::memcmp(k1, k2, s1);
+    }
+    T a, b;
+    std::memcpy(&a, k1, sizeof(T));
+    std::memcpy(&b, k2, sizeof(T));
+    return a < b ? -1 : (a > b ? 1 : 0);
+}
+
+static void pysdskv_provider_add_comparison_function(
         pysdskv_provider_t provider,
+        const std::string& name) {
+    sdskv_compare_fn fn;
+    if(name == "reverse")     fn = pysdskv_compare_reverse;
+    else if(name == "uint64") fn = pysdskv_compare_integer<uint64_t>;
+    else if(name == "int64")  fn = pysdskv_compare_integer<int64_t>;
+    else if(name == "uint32") fn = pysdskv_compare_integer<uint32_t>;
+    else if(name == "int32")  fn = pysdskv_compare_integer<int32_t>;
+    else throw std::invalid_argument(std::string("unknown comparator ")+name);
+    int ret = sdskv_provider_add_comparison_function(provider, name.c_str(), fn);
+    if(ret != SDSKV_SUCCESS)
+        throw std::runtime_error(std::string("sdskv_provider_add_comparison_function returned ")+std::to_string(ret));
+}
+
+static sdskv_database_id_t pysdskv_attach(
+        sdskv_provider_t provider,
         const std::string& name,
         const std::string& path,
-        sdskv_db_type_t type) {
+        sdskv_db_type_t type,
+        const char* comp_fn_name,
+        bool no_overwrite) {
     sdskv_database_id_t id;
     sdskv_config_t config;
     config.db_name = name.c_str();
     config.db_path = path.c_str();
     config.db_type = type;
-    config.db_comp_fn_name = NULL;
-    config.db_no_overwrite = 0;
+    config.db_comp_fn_name = comp_fn_name;
+    config.db_no_overwrite = no_overwrite ? 1 : 0;
     int ret = sdskv_provider_attach_database(
                 provider, &config, &id);
     if(ret != 0) return SDSKV_DATABASE_ID_INVALID;
     else return id;
 }
 
+static sdskv_database_id_t pysdskv_provider_attach_database(
+        pysdskv_provider_t provider,
+        const std::string& name,
+        const std::string& path,
+        sdskv_db_type_t type,
+        py11::object comparator,
+        bool no_overwrite) {
+    std::string comp_fn_name;
+    const char* comp_fn = NULL;
+    if(!comparator.is_none()) {
+        comp_fn_name = comparator.cast<std::string>();
+        comp_fn = comp_fn_name.c_str();
+    }
+    sdskv_provider_t pr = provider;
+    sdskv_database_id_t id;
+    Py_BEGIN_ALLOW_THREADS
+    id = pysdskv_attach(pr, name, path, type, comp_fn, no_overwrite);
+    Py_END_ALLOW_THREADS
+    return id;
+}
+
+/*
+ * Attaches a list of databases, given as (name, path, type, comparator,
+ * no_overwrite) tuples, with the GIL released. Returns the list of their
+ * ids, SDSKV_DATABASE_ID_INVALID standing for the databases that could
+ * not be attached.
+ */
+static std::vector<sdskv_database_id_t> pysdskv_provider_attach_databases(
+        pysdskv_provider_t provider,
+        const std::vector<pysdskv_db_config>& configs) {
+    std::vector<std::string> comparators(configs.size());
+    std::vector<bool> has_comparator(configs.size(), false);
+    for(size_t i = 0; i < configs.size(); i++) {
+        const py11::object& comparator = std::get<3>(configs[i]);
+        if(!comparator.is_none()) {
+            comparators[i] = comparator.cast<std::string>();
+            has_comparator[i] = true;
+        }
+    }
+    sdskv_provider_t pr = provider;
+    std::vector<sdskv_database_id_t> ids(configs.size(), SDSKV_DATABASE_ID_INVALID);
+    Py_BEGIN_ALLOW_THREADS
+    for(size_t i = 0; i < configs.size(); i++) {
+        ids[i] = pysdskv_attach(pr,
+                std::get<0>(configs[i]), std::get<1>(configs[i]), std::get<2>(configs[i]),
+                has_comparator[i] ? comparators[i].c_str() : NULL,
+                std::get<4>(configs[i]));
+    }
+    Py_END_ALLOW_THREADS
+    return ids;
+}
+
 static py11::object pysdskv_provider_list_databases(pysdskv_provider_t provider) {
     py11::list result;
     uint64_t num_db;
@@ -71,8 +219,14 @@ PYBIND11_MODULE(_pysdskvserver, m)
         .value("leveldb", KVDB_LEVELDB)
         .value("berkeleydb", KVDB_BERKELEYDB)
     ;
-    m.def("register", &pysdskv_provider_register);
-    m.def("attach_database", &pysdskv_provider_attach_database);
+    m.def("register", &pysdskv_provider_register,
+            py11::arg("mid"), py11::arg("provider_id"),
+            py11::arg("pool") = py11::none(), py11::arg("num_xstreams") = 0);
+    m.def("add_comparison_function", &pysdskv_provider_add_comparison_function);
+    m.def("attach_database", &pysdskv_provider_attach_database,
+            py11::arg("provider"), py11::arg("name"), py11::arg("path"), py11::arg("db_type"),
+            py11::arg("comparator") = py11::none(), py11::arg("no_overwrite") = false);
+    m.def("attach_databases", &pysdskv_provider_attach_databases);
     m.def("remove_database", [](pysdskv_provider_t pr, sdskv_database_id_t db_id) {
             return sdskv_provider_remove_database(pr, db_id); });
     m.def("remove_all_databases", [](pysdskv_provider_t pr) {
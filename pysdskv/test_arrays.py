@@ -0,0 +1,48 @@
+import unittest
+try:
+    import numpy
+except ImportError:
+    numpy = None
+from pysdskv import arrays
+
+@unittest.skipIf(numpy is None, "numpy is not available")
+class TestArrays(unittest.TestCase):
+
+    def check(self, a):
+        data = arrays.pack(a)
+        self.assertEqual(len(data) % arrays.ALIGNMENT, a.nbytes % arrays.ALIGNMENT)
+        b = arrays.unpack(bytes(data))
+        self.assertEqual(a.dtype, b.dtype)
+        self.assertEqual(a.shape, b.shape)
+        self.assertTrue(numpy.array_equal(a, b))
+        return b
+
+    def test_dtypes(self):
+        self.check(numpy.arange(100, dtype=numpy.float64))
+        self.check(numpy.arange(100, dtype='>i4'))
+        self.check(numpy.zeros((3, 4), dtype=[('x', '<f4'), ('y', '<u2')]))
+        self.check(numpy.array(3.5))
+        self.check(numpy.zeros((0, 5)))
+
+    def test_orders(self):
+        a = numpy.arange(24, dtype=numpy.int16).reshape(2, 3, 4)
+        self.assertTrue(self.check(a).flags.c_contiguous)
+        self.assertTrue(self.check(numpy.asfortranarray(a)).flags.f_contiguous)
+        self.check(a[:, ::2, 1:])
+
+    def test_zero_copy(self):
+        data = arrays.pack(numpy.arange(10))
+        b = arrays.unpack(data)
+        self.assertTrue(b.flags.writeable)
+        b[0] = 42
+        self.assertEqual(arrays.unpack(data)[0], 42)
+        self.assertFalse(arrays.unpack(bytes(data)).flags.writeable)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            arrays.unpack(b'not an array value')
+        with self.assertRaises(ValueError):
+            arrays.pack(numpy.array([object()]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import time
+import unittest
+from pysdskv.batch import SDSKVBatchWriter
+from pysdskv.client import _as_bytes
+from pysdskv.keys import TupleCodec
+
+class FakeDatabase():
+
+    def __init__(self, fail=False, key_codec=None):
+        self.data = {}
+        self.calls = []
+        self.fail = fail
+        self.key_codec = key_codec
+
+    def _key_bytes(self, key):
+        if(self.key_codec is not None):
+            key = self.key_codec.encode(key)
+        return _as_bytes(key)
+
+    def put_multi(self, keys, values):
+        if(self.fail):
+            raise RuntimeError("put_multi failed")
+        self.calls.append(('put_multi', len(keys)))
+        for k, v in zip(keys, values):
+            self.data[k] = v
+
+    def erase_multi(self, keys):
+        self.calls.append(('erase_multi', len(keys)))
+        for k in keys:
+            self.data.pop(k, None)
+
+class TestBatchWriter(unittest.TestCase):
+
+    def test_collapse(self):
+        db = FakeDatabase()
+        db.data['c'] = 'old'
+        with SDSKVBatchWriter(db, max_items=100) as batch:
+            batch['a'] = '1'
+            batch['a'] = '2'
+            batch['b'] = '3'
+            del batch['b']
+            del batch['c']
+            self.assertEqual(len(batch), 3)
+            self.assertEqual(db.calls, [])
+        self.assertEqual(db.data, { 'a': '2' })
+        self.assertEqual(db.calls, [('put_multi', 1), ('erase_multi', 2)])
+
+    def test_max_items(self):
+        db = FakeDatabase()
+        with SDSKVBatchWriter(db, max_items=10) as batch:
+            for i in range(25):
+                batch.put('key{}'.format(i), 'value')
+            self.assertEqual(batch.num_flushes, 2)
+        self.assertEqual(len(db.data), 25)
+        self.assertEqual(db.calls, [('put_multi', 10), ('put_multi', 10), ('put_multi', 5)])
+
+    def test_max_bytes(self):
+        db = FakeDatabase()
+        with SDSKVBatchWriter(db, max_items=1000, max_bytes=100) as batch:
+            for i in range(10):
+                batch.put('k{}'.format(i), b'x' * 48)
+        self.assertEqual([n for _, n in db.calls], [2, 2, 2, 2, 2])
+
+    def test_tuple_keys(self):
+        db = FakeDatabase(key_codec=TupleCodec())
+        with SDSKVBatchWriter(db, max_items=100) as batch:
+            batch.put((2020, 'a'), b'x')
+            # 'b' and ('b',) are stored as the same bytes
+            batch.put('b', b'y')
+            batch.put(('b',), b'z')
+            del batch[(2020, 'c')]
+            self.assertEqual(len(batch), 3)
+            self.assertEqual(batch._pending_bytes, 6 + 1 + 3 + 1 + 6)
+        self.assertEqual(db.data, { (2020, 'a'): b'x', ('b',): b'z' })
+
+    def test_background(self):
+        db = FakeDatabase()
+        batch = SDSKVBatchWriter(db, max_items=1000, max_delay=0.01, background=True)
+        batch.put('a', 'b')
+        deadline = time.monotonic() + 5
+        while(len(db.data) == 0 and time.monotonic() < deadline):
+            time.sleep(0.01)
+        self.assertEqual(db.data, { 'a': 'b' })
+        batch.close()
+
+    def test_error(self):
+        db = FakeDatabase(fail=True)
+        batch = SDSKVBatchWriter(db)
+        batch.put('a', 'b')
+        batch.put('c', 'd')
+        with self.assertRaises(RuntimeError):
+            batch.flush()
+        self.assertEqual(len(batch), 2)
+        batch.put('c', 'e')
+        db.fail = False
+        batch.close()
+        self.assertEqual(db.data, { 'a': 'b', 'c': 'e' })
+        self.assertEqual(len(batch), 0)
+
+    def test_background_error(self):
+        db = FakeDatabase(fail=True)
+        batch = SDSKVBatchWriter(db, max_items=1000, max_delay=0.01, background=True)
+        batch.put('a', 'b')
+        deadline = time.monotonic() + 5
+        while(batch._error is None and time.monotonic() < deadline):
+            time.sleep(0.01)
+        self.assertEqual(len(batch), 1)
+        db.fail = False
+        with self.assertRaises(RuntimeError):
+            batch.put('c', 'd')
+        batch.close()
+        self.assertEqual(db.data, { 'a': 'b' })
+
+if __name__ == '__main__':
+    unittest.main()
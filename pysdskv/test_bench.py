@@ -0,0 +1,52 @@
+import random
+import unittest
+from pysdskv.bench import ZipfianGenerator, make_key, percentiles, parse_args, \
+        proportions, scan_after
+
+class TestBench(unittest.TestCase):
+
+    def test_zipfian(self):
+        gen = ZipfianGenerator(1000, 0.99, random.Random(0))
+        counts = [0] * 1000
+        for _ in range(20000):
+            counts[gen.next()] += 1
+        self.assertGreater(counts[0], counts[10])
+        self.assertGreater(counts[10], counts[500])
+        self.assertGreater(sum(counts[:100]), 10000)
+
+    def test_make_key(self):
+        self.assertEqual(make_key(42, 10), b'user000042')
+        self.assertTrue(make_key(1, 10) < make_key(2, 10) < make_key(10, 10))
+
+    def test_percentiles(self):
+        stats = percentiles([ float(i) for i in range(1, 101) ])
+        self.assertEqual(stats['count'], 100)
+        self.assertEqual(stats['p50'], 50.0)
+        self.assertEqual(stats['p99'], 99.0)
+        self.assertEqual(stats['max'], 100.0)
+        self.assertEqual(percentiles([]), { 'count': 0 })
+
+    def test_parse_args(self):
+        args = parse_args(['--workload', 'b', '--batch-size', '8', '--distribution', 'zipfian'])
+        self.assertEqual(args.workload, 'b')
+        self.assertEqual(args.batch_size, 8)
+        self.assertIsNone(args.address)
+
+    def test_proportions(self):
+        self.assertEqual(proportions(parse_args(['--workload', 'b'])), (0.95, 0.05, 0.0))
+        read_p, update_p, scan_p = proportions(parse_args(['--workload', 'e', '--read-proportion', '0.05']))
+        self.assertEqual((read_p, scan_p), (0.05, 0.95))
+        self.assertAlmostEqual(update_p, 0.0)
+        with self.assertRaises(ValueError):
+            proportions(parse_args(['--workload', 'e', '--read-proportion', '0.5']))
+        with self.assertRaises(ValueError):
+            proportions(parse_args(['--read-proportion', '1.5']))
+
+    def test_scan_after(self):
+        records = [ make_key(i, 10) for i in range(20) ]
+        for index in [0, 1, 15]:
+            after = scan_after(index, 10)
+            self.assertEqual([ k for k in records if k > after ][0], records[index])
+
+if __name__ == '__main__':
+    unittest.main()
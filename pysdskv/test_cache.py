@@ -0,0 +1,101 @@
+import threading
+import unittest
+from pysdskv.cache import SDSKVCache
+
+class TestCache(unittest.TestCase):
+
+    def test_get_put(self):
+        cache = SDSKVCache(1024)
+        self.assertIsNone(cache.get(b'a'))
+        cache.put(b'a', b'value')
+        self.assertEqual(cache.get(b'a'), b'value')
+        stats = cache.stats
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['entries'], 1)
+
+    def test_lru_eviction(self):
+        entry = 1 + 100 + SDSKVCache.ENTRY_OVERHEAD
+        cache = SDSKVCache(3 * entry)
+        for k in [b'a', b'b', b'c']:
+            cache.put(k, b'x' * 100)
+        cache.get(b'a')
+        cache.put(b'd', b'x' * 100)
+        self.assertIsNone(cache.get(b'b'))
+        self.assertIsNotNone(cache.get(b'a'))
+        self.assertIsNotNone(cache.get(b'c'))
+        self.assertIsNotNone(cache.get(b'd'))
+        self.assertEqual(cache.stats['evictions'], 1)
+        self.assertLessEqual(cache.size, 3 * entry)
+
+    def test_too_large(self):
+        cache = SDSKVCache(100)
+        cache.put(b'a', b'x' * 200)
+        self.assertEqual(len(cache), 0)
+
+    def test_ttl(self):
+        now = [0.0]
+        cache = SDSKVCache(1024, ttl=10, clock=lambda: now[0])
+        cache.put(b'a', b'value')
+        now[0] = 5.0
+        self.assertEqual(cache.get(b'a'), b'value')
+        now[0] = 10.0
+        self.assertIsNone(cache.get(b'a'))
+        self.assertEqual(cache.stats['expirations'], 1)
+        self.assertEqual(cache.size, 0)
+
+    def test_invalidate(self):
+        cache = SDSKVCache(1024)
+        cache.put(b'a', b'value')
+        cache.put(b'b', b'value')
+        cache.invalidate(b'a')
+        self.assertIsNone(cache.get(b'a'))
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.size, 0)
+
+    def test_generation(self):
+        cache = SDSKVCache(1024)
+        generation = cache.generation()
+        cache.invalidate(b'a')
+        cache.put(b'a', b'old', generation)
+        cache.put(b'b', b'value', generation)
+        self.assertIsNone(cache.get(b'a'))
+        self.assertEqual(cache.get(b'b'), b'value')
+        cache.put(b'a', b'new', cache.generation())
+        self.assertEqual(cache.get(b'a'), b'new')
+
+    def test_generation_log(self):
+        cache = SDSKVCache(1024)
+        generation = cache.generation()
+        for i in range(SDSKVCache.INVALIDATION_LOG + 1):
+            cache.invalidate(str(i).encode())
+        cache.put(b'a', b'value', generation)
+        self.assertIsNone(cache.get(b'a'))
+        generation = cache.generation()
+        cache.clear()
+        cache.put(b'a', b'value', generation)
+        self.assertIsNone(cache.get(b'a'))
+
+    def test_fill_invalidate_race(self):
+        cache = SDSKVCache(1024)
+        store = { b'a': b'old' }
+        fetched = threading.Event()
+        written = threading.Event()
+        def read():
+            generation = cache.generation()
+            value = store[b'a']
+            fetched.set()
+            written.wait()
+            cache.put(b'a', value, generation)
+        reader = threading.Thread(target=read)
+        reader.start()
+        fetched.wait()
+        store[b'a'] = b'new'
+        cache.invalidate(b'a')
+        written.set()
+        reader.join()
+        self.assertIsNone(cache.get(b'a'))
+
+if __name__ == '__main__':
+    unittest.main()
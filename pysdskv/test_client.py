@@ -1,13 +1,23 @@
 import sys
 import os
 import tempfile
+import threading
+import time
 import shutil
 import unittest
+import asyncio
+try:
+    import numpy
+except ImportError:
+    numpy = None
 from pymargo.core import Engine, Address, Handle
 import pysdskv.server
 import pysdskv.client
 from pysdskv.server import *
 from pysdskv.client import *
+from pysdskv.keys import TupleCodec
+from pysdskv.compression import SDSKVCompression
+from pysdskv.retry import RetryPolicy, SDSKVTimeoutError
 
 class TestClient(unittest.TestCase):
 
@@ -34,6 +44,20 @@ class TestClient(unittest.TestCase):
         db = TestClient._ph.open("mydatabase")
         self.assertEqual(db.get_id(), TestClient._db_id)
 
+    def test_provider_handle_pool(self):
+        client = TestClient._client
+        ph1 = client.provider_handle('tcp://127.0.0.1:1234', 1)
+        ph2 = client.provider_handle('tcp://127.0.0.1:1234', 1)
+        self.assertIs(ph1._ph, ph2._ph)
+        db1 = ph1.open("mydatabase")
+        db2 = client.open('tcp://127.0.0.1:1234', "mydatabase", 1)
+        self.assertEqual(db1.get_id(), TestClient._db_id)
+        self.assertEqual(db2.get_id(), TestClient._db_id)
+        del ph1
+        db2.put('test_pool_key', 'value')
+        self.assertEqual(ph2.open("mydatabase").get('test_pool_key'), 'value')
+        db2.erase('test_pool_key')
+
     def test_list_databases(self):
         dbs = TestClient._ph.databases
         self.assertEqual(len(dbs), 1)
@@ -102,6 +126,49 @@ class TestClient(unittest.TestCase):
         for k in keys:
             db.erase(k)
 
+    def test_chunked_multi(self):
+        db = TestClient._ph.open("mydatabase")
+        keys = ['test_chunked_{:03d}'.format(i) for i in range(100)]
+        vals = ['value{}'.format(i) for i in range(100)]
+        db.put_multi(keys, vals, chunk_items=16, inflight=4)
+        self.assertEqual(db.get_multi(keys, chunk_items=16, inflight=4), vals)
+        self.assertEqual(db.get_multi(keys, value_sizes=16, chunk_bytes=256), vals)
+        self.assertEqual(list(db.iget_multi(keys, chunk_items=10)), vals)
+        db.erase_multi(keys)
+
+    def test_packed(self):
+        db = TestClient._ph.open("mydatabase", binary=True)
+        keys = [b'test_packed_1', b'test_packed_2', b'test_packed_3']
+        vals = [b'v1', b'value2', b'val3']
+        db.put_packed(b''.join(keys), [len(k) for k in keys],
+                b''.join(vals), [len(v) for v in vals])
+        self.assertEqual(db.get_multi(keys), vals)
+        values, sizes = db.get_packed(b''.join(keys), [len(k) for k in keys])
+        self.assertEqual(values, b''.join(vals))
+        self.assertEqual(list(sizes), [len(v) for v in vals])
+        packed = db.list_keyvals_packed(b'', num_keys=10, prefix=b'test_packed_')
+        self.assertEqual(packed[0], b''.join(keys))
+        self.assertEqual(list(packed[1]), [len(k) for k in keys])
+        self.assertEqual(packed[2], b''.join(vals))
+        self.assertEqual(list(packed[3]), [len(v) for v in vals])
+        packed = db.list_keyvals_packed(b'', num_keys=10, prefix=b'test_packed_',
+                key_size=32, val_size=32)
+        self.assertEqual(packed[2], b''.join(vals))
+        db.erase_multi(keys)
+
+    @unittest.skipIf(numpy is None, "numpy is not available")
+    def test_arrays(self):
+        db = TestClient._ph.open("mydatabase", binary=True)
+        a = numpy.arange(1000, dtype=numpy.float32).reshape(10, 100)
+        db.put_array('test_array', a)
+        b = db.get_array('test_array')
+        self.assertTrue(numpy.array_equal(a, b))
+        keys = ['test_arrays_1', 'test_arrays_2']
+        db.put_arrays(keys, [a, a.T])
+        for x, y in zip([a, a.T], db.get_arrays(keys)):
+            self.assertTrue(numpy.array_equal(x, y))
+        db.erase_multi(keys + ['test_array'])
+
     def test_length_multi(self):
         db = TestClient._ph.open("mydatabase")
         keys = ['test_length_multi_1', 'test_length_multi_2', 'test_length_multi_3']
@@ -208,6 +275,367 @@ class TestClient(unittest.TestCase):
         for k in keys:
             db.erase(k)
 
+    def test_binary(self):
+        db = TestClient._ph.open("mydatabase", binary=True)
+        value = bytes(range(256))
+        db.put(b'test_binary_1', value)
+        db.put(bytearray(b'test_binary_2'), memoryview(value)[:16])
+        self.assertEqual(db.get(b'test_binary_1'), value)
+        self.assertEqual(db.get('test_binary_2'), value[:16])
+        self.assertEqual(db.list_keys('test_binary', num_keys=10, prefix='test_binary'),
+                [b'test_binary_1', b'test_binary_2'])
+        db.erase(b'test_binary_1')
+        db.erase(b'test_binary_2')
+
+    def test_get_into(self):
+        db = TestClient._ph.open("mydatabase", binary=True)
+        keys = [b'test_get_into_1', b'test_get_into_2']
+        vals = [b'value1', b'value22']
+        db.put_multi(keys, vals)
+        buf = bytearray(32)
+        self.assertEqual(db.get_into(keys[0], buf), len(vals[0]))
+        self.assertEqual(bytes(buf[:len(vals[0])]), vals[0])
+        with self.assertRaises(KeyError):
+            db.get_into(b'test_get_into_unknown', buf)
+        bufs = [bytearray(16), bytearray(16)]
+        sizes = db.get_multi_into(keys, bufs)
+        self.assertEqual(sizes, [len(v) for v in vals])
+        for b, v in zip(bufs, vals):
+            self.assertEqual(bytes(b[:len(v)]), v)
+        for k in keys:
+            db.erase(k)
+
+    def test_size_hints(self):
+        policy = SizeHintPolicy(min_samples=1)
+        db = TestClient._ph.open("mydatabase", size_hints=policy)
+        keys = ['test_hints_{}'.format(i) for i in range(8)]
+        vals = ['x' * (10 * i) for i in range(1, 9)]
+        db.put_multi(keys, vals)
+        for k, v in zip(keys, vals):
+            self.assertEqual(db.get(k), v)
+        self.assertEqual(db.get_multi(keys), vals)
+        db.put('test_hints_big', 'y' * 4096)
+        self.assertEqual(db.get('test_hints_big'), 'y' * 4096)
+        keys_out, vals_out = db.list_keyvals('', num_keys=8, prefix='test_hints_')
+        self.assertEqual(keys_out, sorted(keys)[:8])
+        stats = policy.stats
+        self.assertGreaterEqual(stats['probes'], 1)
+        self.assertGreaterEqual(stats['hits'], 1)
+        self.assertGreaterEqual(stats['misses'], 1)
+        for k in keys + ['test_hints_big']:
+            db.erase(k)
+
+    def test_cache(self):
+        cache = SDSKVCache(1 << 20)
+        db = TestClient._ph.open("mydatabase", cache=cache)
+        keys = ['test_cache_1', 'test_cache_2', 'test_cache_3']
+        vals = ['value1', 'value2', 'value3']
+        db.put_multi(keys, vals)
+        self.assertEqual(db.get(keys[0]), vals[0])
+        self.assertEqual(db.get(keys[0]), vals[0])
+        self.assertEqual(cache.stats['hits'], 1)
+        self.assertEqual(db.get_multi(keys), vals)
+        self.assertEqual(cache.stats['hits'], 2)
+        db.put(keys[0], 'newvalue')
+        self.assertEqual(db.get(keys[0]), 'newvalue')
+        db.erase(keys[1])
+        with self.assertRaises(KeyError):
+            db.get(keys[1])
+        for k in [keys[0], keys[2]]:
+            db.erase(k)
+
+    def test_erase_multi(self):
+        db = TestClient._ph.open("mydatabase")
+        keys = ['test_erase_multi_1', 'test_erase_multi_2', 'test_erase_multi_3']
+        db.put_multi(keys, ['value1', 'value2', 'value3'])
+        db.erase_multi(keys[:2])
+        self.assertFalse(db.exists(keys[0]))
+        self.assertFalse(db.exists(keys[1]))
+        self.assertTrue(db.exists(keys[2]))
+        db.erase(keys[2])
+
+    def test_batch_writer(self):
+        db = TestClient._ph.open("mydatabase")
+        db.put('test_batch_erased', 'value')
+        with db.batch_writer(max_items=8) as batch:
+            for i in range(20):
+                batch['test_batch_{:02d}'.format(i)] = 'value{}'.format(i)
+            del batch['test_batch_erased']
+        self.assertEqual(db.get('test_batch_07'), 'value7')
+        self.assertFalse(db.exists('test_batch_erased'))
+        db.erase_multi(['test_batch_{:02d}'.format(i) for i in range(20)])
+
+    def test_async_put_get(self):
+        db = TestClient._ph.open("mydatabase")
+        keys = ['test_async_{}'.format(i) for i in range(32)]
+        vals = ['value_{}'.format(i) for i in range(32)]
+        async def run():
+            await asyncio.gather(*[db.aput(k, v) for k, v in zip(keys, vals)])
+            vals_out = await asyncio.gather(*[db.aget(k) for k in keys])
+            self.assertEqual(vals, list(vals_out))
+            self.assertTrue(await db.aexists(keys[0]))
+            with self.assertRaises(KeyError):
+                await db.aget('test_async_unknown_key')
+            await asyncio.gather(*[db.aerase(k) for k in keys])
+        asyncio.run(run())
+
+    def test_async_iterator(self):
+        db = TestClient._ph.open("mydatabase")
+        keys = ['test_aiter_1', 'test_aiter_2', 'test_aiter_3', 'test_aiter_4', 'test_aiter_5']
+        vals = ['val1', 'val2', 'val3', 'val4', 'val5']
+        async def run():
+            await db.aput_multi(keys, vals)
+            keys_out = [k async for k in db.akeys(prefix='test_aiter', keys_per_request=2)]
+            self.assertEqual(keys, keys_out)
+            items_out = [kv async for kv in db.aitems(prefix='test_aiter', keys_per_request=2)]
+            self.assertEqual(list(zip(keys, vals)), items_out)
+            ranged = [k async for k in db.akeys(start='test_aiter_2', end='test_aiter_5',
+                keys_per_request=2, prefetch=False)]
+            self.assertEqual(keys[1:4], ranged)
+            items_out = [kv async for kv in db.aitems(prefix='test_aiter', target_bytes=64)]
+            self.assertEqual(list(zip(keys, vals)), items_out)
+            items_out = [kv async for kv in db.aitems(prefix='test_aiter', keys_per_request=5,
+                max_bytes=len(keys[0]) + len(vals[0]))]
+            self.assertEqual(list(zip(keys, vals)), items_out)
+            for k in keys:
+                await db.aerase(k)
+        asyncio.run(run())
+
+    def test_iterator_pages(self):
+        db = TestClient._ph.open("mydatabase")
+        keys = ['test_pages_{:02d}'.format(i) for i in range(25)]
+        vals = ['val{}'.format(i) for i in range(25)]
+        db.put_multi(keys, vals)
+        self.assertEqual(list(db.keys(prefix='test_pages_', keys_per_request=4)), keys)
+        self.assertEqual(list(db.keys(prefix='test_pages_', keys_per_request=4, prefetch=False)), keys)
+        self.assertEqual(list(db.items(prefix='test_pages_', keys_per_request=4)),
+                list(zip(keys, vals)))
+        it = db.items(prefix='test_pages_', keys_per_request=2, target_bytes=200)
+        self.assertEqual(list(it), list(zip(keys, vals)))
+        self.assertGreater(it.items_per_request, 2)
+        for k in keys:
+            db.erase(k)
+
+    def test_parallel_scan(self):
+        db = TestClient._ph.open("mydatabase")
+        # the key equal to the prefix belongs to the first range
+        keys = ['test_pscan_'] + ['test_pscan_{:03d}'.format(i) for i in range(100)]
+        vals = ['val{}'.format(i) for i in range(101)]
+        db.put_multi(keys, vals)
+        items = list(db.parallel_scan(['test_pscan_025', 'test_pscan_050', 'test_pscan_075'],
+            workers=2, prefix='test_pscan_', keys_per_request=8))
+        self.assertEqual(items, list(zip(keys, vals)))
+        keys_out = list(db.parallel_scan(16, workers=4, prefix='test_pscan_',
+            include_values=False, keys_per_request=8))
+        self.assertEqual(keys_out, keys)
+        keys_out = list(db.parallel_scan(['test_pscan_050'], prefix='test_pscan_',
+            include_values=False, keys_per_request=100))
+        self.assertEqual(keys_out, keys)
+        for k in keys:
+            db.erase(k)
+
+    def test_key_codec(self):
+        db = TestClient._ph.open("mydatabase", key_codec=TupleCodec())
+        keys = [ ('test_codec', year, month) for year in (2019, 2020) for month in range(1, 13) ]
+        vals = [ 'val{}'.format(i) for i in range(len(keys)) ]
+        db.put_multi(keys, vals)
+        self.assertEqual(db.get(('test_codec', 2020, 3)), 'val14')
+        self.assertEqual(list(db.keys(prefix=('test_codec',), keys_per_request=5)), keys)
+        self.assertEqual(db.list_keys(prefix=('test_codec', 2020), num_keys=2),
+                [ ('test_codec', 2020, 1), ('test_codec', 2020, 2) ])
+        items = list(db.items(start=('test_codec', 2019, 11), end=('test_codec', 2020, 2),
+            keys_per_request=2))
+        self.assertEqual(items, list(zip(keys[10:13], vals[10:13])))
+        self.assertEqual(list(db.keys(start=('test_codec', 2019, 12, 0),
+            end=('test_codec', 2020, 2))), keys[12:13])
+        db.erase_multi(keys)
+
+    def test_metrics(self):
+        metrics = SDSKVMetrics()
+        db = TestClient._ph.open("mydatabase", metrics=metrics)
+        db.put('test_metrics_key', 'value')
+        self.assertEqual(db.get('test_metrics_key'), 'value')
+        self.assertEqual(db.get('test_metrics_key', 16), 'value')
+        db.erase('test_metrics_key')
+        snap = metrics.snapshot()
+        self.assertEqual(snap['ops']['get']['count'], 2)
+        self.assertEqual(snap['rpcs'], { 'put': 1, 'length': 1, 'get': 2, 'erase': 1 })
+        self.assertEqual(snap['probes'], 1)
+        self.assertEqual(snap['bytes']['mydatabase']['value_in'], 10)
+        db.metrics = None
+        db.put('test_metrics_key', 'value')
+        db.erase('test_metrics_key')
+        self.assertEqual(metrics.snapshot()['rpcs']['put'], 1)
+
+    def test_stats(self):
+        db = TestClient._ph.open("mydatabase")
+        db.put_multi(['test_stats_1', 'test_stats_2'], ['a', 'bcd'])
+        stats = db.stats(count_keys=True)
+        self.assertEqual(stats['id'], TestClient._db_id)
+        self.assertEqual(stats['name'], "mydatabase")
+        self.assertEqual(stats['type'], "leveldb")
+        self.assertGreaterEqual(stats['num_keys'], 2)
+        self.assertGreaterEqual(stats['value_bytes'], 4)
+        self.assertIsNone(TestClient._ph.stats()[0]['num_keys'])
+        db.erase_multi(['test_stats_1', 'test_stats_2'])
+
+    def test_max_bytes(self):
+        db = TestClient._ph.open("mydatabase")
+        keys = ['test_max_bytes_{}'.format(i) for i in range(10)]
+        db.put_multi(keys, ['x' * 100] * 10)
+        self.assertEqual(db.list_keyvals(num_keys=10, prefix='test_max_bytes_', max_bytes=300)[0],
+                keys[:2])
+        self.assertEqual(db.list_keyvals(num_keys=10, prefix='test_max_bytes_',
+            key_size=16, val_size=100, max_bytes=300)[0], keys[:2])
+        self.assertEqual(db.list_keyvals(num_keys=10, prefix='test_max_bytes_', max_bytes=1)[0],
+                keys[:1])
+        self.assertEqual(db.list_keys(num_keys=10, prefix='test_max_bytes_', max_bytes=40),
+                keys[:2])
+        self.assertEqual([ k for k, _ in db.items(keys_per_request=10,
+            prefix='test_max_bytes_', max_bytes=300) ], keys)
+        self.assertEqual(list(db.keys(keys_per_request=4, prefix='test_max_bytes_',
+            max_bytes=40)), keys)
+        db.erase_multi(keys)
+
+    def test_timeout(self):
+        client = TestClient._client
+        with self.assertRaises(SDSKVTimeoutError):
+            client.call(lambda: time.sleep(0.5), timeout=0.05)
+        with self.assertRaises(TimeoutError):
+            client.call(lambda: time.sleep(0.5), deadline=time.monotonic() + 0.05)
+        attempts = []
+        def flaky():
+            attempts.append(1)
+            if(len(attempts) < 3):
+                raise SDSKVTimeoutError()
+            return 'done'
+        self.assertEqual(client.call(flaky, retry=RetryPolicy(max_attempts=3, backoff=0.001)), 'done')
+        db = TestClient._ph.open("mydatabase")
+        db.put('test_timeout', 'value', timeout=5.0)
+        self.assertEqual(db.get('test_timeout', timeout=5.0), 'value')
+        self.assertEqual(db.get_multi(['test_timeout'], deadline=time.monotonic() + 5.0), ['value'])
+        with self.assertRaises(KeyError):
+            db.get('test_timeout_missing', timeout=5.0)
+        with self.assertRaises(SDSKVTimeoutError):
+            db.get('test_timeout', deadline=time.monotonic() - 1.0)
+        # operations issuing several RPCs
+        self.assertEqual(list(db.iget_multi(['test_timeout'], timeout=5.0)), ['value'])
+        self.assertEqual(list(db.items(prefix='test_timeout', timeout=5.0)), [('test_timeout', 'value')])
+        self.assertEqual(list(db.parallel_scan(4, prefix='test_timeout', include_values=False,
+            timeout=5.0)), ['test_timeout'])
+        with self.assertRaises(SDSKVTimeoutError):
+            list(db.parallel_scan(4, prefix='test_timeout', deadline=time.monotonic() - 1.0))
+        with self.assertRaises(SDSKVTimeoutError):
+            next(db.keys(prefix='test_timeout', deadline=time.monotonic() - 1.0))
+        keys = [ 'test_timeout_{}'.format(i) for i in range(8) ]
+        db.put_multi(keys, keys, chunk_items=2, inflight=2, timeout=5.0)
+        self.assertEqual(db.get_multi(keys, chunk_items=2, inflight=2, timeout=5.0), keys)
+        self.assertEqual(db.erase_range('test_timeout_0', 'test_timeout_4', timeout=5.0), 4)
+        self.assertEqual(db.erase_prefix('test_timeout_', keys_per_request=2, timeout=5.0), 4)
+        with self.assertRaises(SDSKVTimeoutError):
+            db.erase_multi(keys, chunk_items=2, deadline=time.monotonic() - 1.0)
+        async def run():
+            self.assertEqual(await db.aget('test_timeout', timeout=5.0), 'value')
+            with self.assertRaises(SDSKVTimeoutError):
+                await db.aget('test_timeout', deadline=time.monotonic() - 1.0)
+        asyncio.run(run())
+        db.erase('test_timeout')
+
+    def test_abandoned(self):
+        client = SDSKVClient(TestClient._engine, max_workers=4, max_abandoned=1)
+        stuck = threading.Event()
+        provider = ('stuck_address', 1)
+        with self.assertRaises(SDSKVTimeoutError):
+            client.call(stuck.wait, timeout=0.05, provider=provider)
+        self.assertEqual(client.abandoned, { provider: 1 })
+        # further calls to the stuck provider fail without taking a thread
+        with self.assertRaises(SDSKVTimeoutError):
+            client.call(lambda: 'done', timeout=5.0, provider=provider)
+        self.assertEqual(client.call(lambda: 'done', timeout=5.0, provider=('other_address', 1)), 'done')
+        stuck.set()
+        deadline = time.monotonic() + 5.0
+        while(len(client.abandoned) != 0 and time.monotonic() < deadline):
+            time.sleep(0.01)
+        self.assertEqual(client.call(lambda: 'done', timeout=5.0, provider=provider), 'done')
+
+    def test_colocated(self):
+        ph = TestClient._client.provider_handle(TestClient._addr, 1)
+        self.assertIs(ph.colocated, TestClient._provider)
+        self.assertEqual(str(ph._addr), str(TestClient._engine.addr()))
+        self.assertIsNone(TestClient._client.provider_handle(TestClient._addr, 2).colocated)
+        db = ph.open("mydatabase")
+        db.put('test_colocated', 'value')
+        self.assertEqual(db.get('test_colocated'), 'value')
+        requests = TestClient._provider.counters['stats_requests']
+        self.assertEqual(db.stats(count_keys=False)['name'], "mydatabase")
+        self.assertEqual(TestClient._provider.counters['stats_requests'], requests)
+        remote = SDSKVClient(TestClient._engine, colocated=False)
+        rph = remote.create_provider_handle(TestClient._addr, 1)
+        self.assertIsNone(rph.colocated)
+        self.assertEqual(rph.open("mydatabase").get('test_colocated'), 'value')
+        self.assertEqual(rph.stats(count_keys=False)[0]['name'], "mydatabase")
+        self.assertEqual(TestClient._provider.counters['stats_requests'], requests + 1)
+        db.erase('test_colocated')
+        del rph
+        del remote
+
+    def test_export_import(self):
+        db = TestClient._ph.open("mydatabase")
+        keys = ['test_export_{:03d}'.format(i) for i in range(100)]
+        vals = ['val{}'.format(i) * (i % 5) for i in range(100)]
+        db.put_multi(keys, vals)
+        path = os.path.join(tempfile.mkdtemp(), 'export.bin')
+        count = db.export(path, prefix='test_export_', compression='zlib',
+                block_bytes=256, keys_per_request=16)
+        self.assertEqual(count, 100)
+        db.erase_multi(keys)
+        self.assertEqual(db.import_(path, inflight=2), 100)
+        self.assertEqual(db.get_multi(keys), vals)
+        db.erase_multi(keys)
+        shutil.rmtree(os.path.dirname(path))
+
+    def test_exists_multi(self):
+        db = TestClient._ph.open("mydatabase")
+        db.put_multi(['test_exists_multi_a', 'test_exists_multi_b'], ['value', ''])
+        self.assertEqual(db.exists_multi(['test_exists_multi_a', 'test_exists_multi_b',
+            'test_exists_multi_c']), [True, True, False])
+        self.assertEqual(db.exists_multi(['test_exists_multi_a', 'test_exists_multi_b',
+            'test_exists_multi_c'], empty_values=False), [True, False, False])
+        self.assertEqual(db.exists_multi([]), [])
+        db.erase_multi(['test_exists_multi_a', 'test_exists_multi_b'], chunk_items=1, inflight=2)
+        self.assertEqual(db.exists_multi(['test_exists_multi_a', 'test_exists_multi_b']),
+                [False, False])
+
+    def test_erase_prefix_range(self):
+        db = TestClient._ph.open("mydatabase")
+        keys = ['test_erase_pfx{:03d}'.format(i) for i in range(100)]
+        db.put_multi(keys + ['test_erase_pfx'], ['v'] * 101)
+        self.assertEqual(db.erase_range('test_erase_pfx010', 'test_erase_pfx020',
+            keys_per_request=4), 10)
+        self.assertEqual(db.exists_multi(keys[9:21]), [True] + [False] * 10 + [True])
+        self.assertEqual(db.erase_prefix('test_erase_pfx', keys_per_request=8), 91)
+        self.assertEqual(db.list_keys(prefix='test_erase_pfx', num_keys=10), [])
+
+    def test_compression(self):
+        db = TestClient._ph.open("mydatabase", binary=True,
+                compression=SDSKVCompression('zlib', threshold=64))
+        big = b'0123456789' * 100
+        db.put('test_compression_a', big)
+        db.put_multi(['test_compression_b', 'test_compression_c'], [b'small', b''])
+        self.assertEqual(db.get('test_compression_a'), big)
+        self.assertLess(db.length('test_compression_a'), len(big))
+        self.assertEqual(db.length('test_compression_b'), 6)
+        self.assertEqual(db.get_multi(['test_compression_a', 'test_compression_b',
+            'test_compression_c']), [big, b'small', b''])
+        keys, vals = db.list_keyvals(num_keys=3, prefix='test_compression_')
+        self.assertEqual(vals, [big, b'small', b''])
+        self.assertEqual([ v for _, v in db.items(keys_per_request=2, prefix='test_compression_') ],
+                [big, b'small', b''])
+        buf = bytearray(2000)
+        self.assertEqual(db.get_into('test_compression_a', buf), len(big))
+        self.assertEqual(bytes(buf[:len(big)]), big)
+        db.erase_prefix('test_compression_')
+
 
 if __name__ == '__main__':
     unittest.main()
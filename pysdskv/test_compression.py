@@ -0,0 +1,53 @@
+import unittest
+import zlib
+from pysdskv.compression import SDSKVCompression, register_codec, codecs
+
+class TestCompression(unittest.TestCase):
+
+    def test_roundtrip(self):
+        for codec in ('zlib', 'lzma'):
+            c = SDSKVCompression(codec, threshold=16)
+            for value in [ b'', b'short', b'a' * 1000, bytes(range(256)) ]:
+                self.assertEqual(c.decode(c.encode(value)), value)
+            self.assertEqual(c.decode(c.encode('héllo' * 100)), ('héllo' * 100).encode('utf-8'))
+
+    def test_threshold(self):
+        c = SDSKVCompression('zlib', threshold=100)
+        self.assertEqual(c.encode(b'a' * 99), b'\x00' + b'a' * 99)
+        self.assertEqual(c.encode(b'a' * 100)[0], 1)
+        self.assertLess(len(c.encode(b'a' * 1000)), 100)
+        # values that do not shrink are stored as they are
+        incompressible = zlib.compress(bytes(range(256)) * 4)
+        self.assertEqual(c.encode(incompressible)[0], 0)
+        # missing values returned by get_multi are empty
+        self.assertEqual(c.decode(b''), b'')
+
+    def test_mixed_codecs(self):
+        values = [ b'x' * 500, b'y' * 10, b'z' * 2000 ]
+        stored = SDSKVCompression('lzma', threshold=100).encode_multi(values)
+        self.assertEqual(SDSKVCompression('zlib').decode_multi(stored), values)
+
+    def test_parallel(self):
+        c = SDSKVCompression('zlib', threshold=0, workers=3, parallel_bytes=1000)
+        values = [ bytes([i]) * (100 + i) for i in range(100) ]
+        stored = c.encode_multi(values)
+        self.assertEqual(len(stored), len(values))
+        self.assertEqual(c.decode_multi(stored), values)
+
+    def test_register(self):
+        # drops the leading b'a' of the values
+        register_codec(200, 'test_strip', lambda data, level: bytes(data[1:]),
+                lambda data: b'a' + bytes(data))
+        self.assertIn('test_strip', codecs())
+        c = SDSKVCompression('test_strip', threshold=0)
+        self.assertEqual(c.encode(b'abc')[0], 200)
+        self.assertEqual(c.decode(c.encode(b'abc')), b'abc')
+        with self.assertRaises(ValueError):
+            register_codec(1, 'other', None, None)
+        with self.assertRaises(ValueError):
+            SDSKVCompression('unknown')
+        with self.assertRaises(ValueError):
+            c.decode(b'\xfe...')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import os
+import tempfile
+import shutil
+import unittest
+from pysdskv.export import _Writer, SDSKVExportFile
+
+class TestExport(unittest.TestCase):
+
+    def setUp(self):
+        self._dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._dir)
+
+    def _write(self, records, **kwargs):
+        path = os.path.join(self._dir, 'export.bin')
+        with open(path, 'wb') as f:
+            writer = _Writer(f, kwargs.get('compression'), None, kwargs.get('block_bytes', 64))
+            for i in range(0, len(records), 7):
+                page = records[i:i+7]
+                writer.write([ k for k, _ in page ], [ v for _, v in page ])
+            writer.close()
+        return path
+
+    def test_roundtrip(self):
+        records = [ ('key{:03d}'.format(i).encode(), os.urandom(i % 20)) for i in range(100) ]
+        for compression in [ None, 'zlib', 'lzma' ]:
+            path = self._write(records, compression=compression)
+            with SDSKVExportFile(path) as f:
+                self.assertEqual(len(f), 100)
+                self.assertGreater(len(f.index), 1)
+                self.assertEqual(f.index[0][2], b'key000')
+                self.assertEqual(list(f), records)
+
+    def test_empty(self):
+        path = self._write([])
+        with SDSKVExportFile(path) as f:
+            self.assertEqual(len(f), 0)
+            self.assertEqual(list(f), [])
+
+    def test_close_with_live_blocks(self):
+        records = [ ('key{:03d}'.format(i).encode(), b'value') for i in range(10) ]
+        path = self._write(records)
+        with self.assertRaises(KeyError):
+            with SDSKVExportFile(path) as f:
+                keys, vals = f.block(0)
+                raise KeyError('original error')
+        self.assertEqual(bytes(keys[0]), b'key000')
+
+    def test_invalid(self):
+        path = os.path.join(self._dir, 'invalid.bin')
+        with open(path, 'wb') as f:
+            f.write(b'not an export file at all')
+        with self.assertRaises(ValueError):
+            SDSKVExportFile(path)
+
+    def test_truncated(self):
+        records = [ ('key{:03d}'.format(i).encode(), b'value') for i in range(10) ]
+        with open(self._write(records), 'rb') as f:
+            data = f.read()
+        path = os.path.join(self._dir, 'truncated.bin')
+        # shorter than the header, header only, and trailer pointing to a missing index
+        broken = [ data[:3], data[:8], data[:8] + data[-20:] ]
+        for content in broken:
+            with open(path, 'wb') as f:
+                f.write(content)
+            with self.assertRaises(ValueError):
+                SDSKVExportFile(path)
+
+if __name__ == '__main__':
+    unittest.main()
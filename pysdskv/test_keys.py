@@ -0,0 +1,76 @@
+import unittest
+import random
+from pysdskv.keys import pack, unpack, strinc, prefix_range, TupleCodec
+
+class TestKeys(unittest.TestCase):
+
+    def test_roundtrip(self):
+        keys = [ (), (None,), (b'a\x00b',), ('café', 'x\x00'), (0, 1, -1, 255, -256, 2**63, -2**63),
+                (1.5, -0.0, float('inf'), -1e300), (True, False), ((1, None, ('a',)), None, 'z') ]
+        for k in keys:
+            self.assertEqual(unpack(pack(k)), k)
+        self.assertEqual(unpack(pack('abc')), ('abc',))
+
+    def test_order(self):
+        rng = random.Random(42)
+        def element():
+            kind = rng.randrange(4)
+            if(kind == 0):
+                return rng.randrange(-2**40, 2**40) >> rng.randrange(40)
+            if(kind == 1):
+                return rng.uniform(-1e6, 1e6)
+            if(kind == 2):
+                return ''.join(rng.choice('ab\x00') for _ in range(rng.randrange(4)))
+            return bytes(rng.choice(b'\x00\x01\xff') for _ in range(rng.randrange(4)))
+        for _ in range(2000):
+            kind = rng.randrange(4)
+            a = tuple(element() for _ in range(rng.randrange(1, 3)))
+            b = tuple(element() for _ in range(rng.randrange(1, 3)))
+            # only compare tuples whose elements have the same types
+            if([ type(x) for x in a[:len(b)] ] != [ type(x) for x in b[:len(a)] ]):
+                continue
+            self.assertEqual(a < b, pack(a) < pack(b), (a, b))
+
+    def test_types_order(self):
+        values = [ None, b'', '', ((),), -1, 0, 1, -1.0, 1.0, False, True ]
+        encoded = [ pack(v) for v in values ]
+        self.assertEqual(encoded, sorted(encoded))
+
+    def test_prefix(self):
+        begin, end = prefix_range((2020, 'a'))
+        self.assertTrue(begin <= pack((2020, 'a')) < end)
+        self.assertTrue(begin <= pack((2020, 'a', 5)) < end)
+        self.assertFalse(begin <= pack((2020, 'ab')) < end)
+        self.assertFalse(begin <= pack((2021,)) < end)
+        # elements extended with NUL bytes do not start with the prefix
+        begin, end = prefix_range(('a',))
+        self.assertTrue(begin <= pack(('a', None)) < end)
+        self.assertTrue(begin <= pack(('a', True)) < end)
+        self.assertFalse(begin <= pack(('a\x00',)) < end)
+        self.assertFalse(begin <= pack(('a\x00\x00', 1)) < end)
+        begin, end = prefix_range(((b'x', None),))
+        self.assertTrue(begin <= pack(((b'x', None),)) < end)
+        self.assertTrue(begin <= pack(((b'x', None), 'y')) < end)
+        self.assertFalse(begin <= pack(((b'x', None, None),)) < end)
+        self.assertFalse(begin <= pack(((b'x\x00', None),)) < end)
+        self.assertFalse(begin <= pack(((b'x', None, ()),)) < end)
+        begin, end = prefix_range(())
+        self.assertTrue(begin <= pack((True, 1.0)) < end)
+        self.assertEqual(strinc(b'a\xff\xff'), b'b')
+        with self.assertRaises(ValueError):
+            strinc(b'\xff')
+
+    def test_errors(self):
+        with self.assertRaises(OverflowError):
+            pack(2**64)
+        with self.assertRaises(TypeError):
+            pack(object())
+        with self.assertRaises(ValueError):
+            unpack(pack(12345)[:-1])
+
+    def test_codec(self):
+        codec = TupleCodec()
+        self.assertEqual(codec.decode(codec.encode((1, 'a'))), (1, 'a'))
+
+if __name__ == '__main__':
+    unittest.main()
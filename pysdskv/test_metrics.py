@@ -0,0 +1,58 @@
+import math
+import unittest
+from pysdskv.metrics import SDSKVMetrics
+
+class TestMetrics(unittest.TestCase):
+
+    def test_buckets(self):
+        m = SDSKVMetrics(min_latency=1e-6, num_buckets=8)
+        self.assertEqual(m._bucket(0.5e-6), 0)
+        self.assertEqual(m._bucket(1e-6), 0)
+        self.assertEqual(m._bucket(1.5e-6), 1)
+        self.assertEqual(m._bucket(2e-6), 1)
+        self.assertEqual(m._bucket(3e-6), 2)
+        self.assertEqual(m._bucket(10.0), 7)
+        self.assertEqual(m.bucket_bound(2), 4e-6)
+        self.assertEqual(m.bucket_bound(7), math.inf)
+
+    def test_ops(self):
+        m = SDSKVMetrics(min_latency=1e-3)
+        for _ in range(98):
+            m.record_op('db', 'get', 0.5e-3)
+        m.record_op('db', 'get', 3e-3)
+        m.record_op('db', 'get', 0.1, error=True)
+        ops = m.snapshot()['ops']
+        self.assertEqual(ops['get']['count'], 100)
+        self.assertEqual(ops['get']['errors'], 1)
+        self.assertEqual(ops['get']['p50'], 1e-3)
+        self.assertEqual(ops['get']['p99'], 4e-3)
+        self.assertEqual(ops['get']['max_seconds'], 0.1)
+        self.assertEqual(ops['get']['histogram'], [(1e-3, 98), (4e-3, 1), (0.128, 1)])
+
+    def test_rpcs_and_bytes(self):
+        m = SDSKVMetrics()
+        m.record_rpc('length', probe=True)
+        m.record_rpc('get')
+        m.record_rpc('get')
+        m.record_bytes('db', key_out=3, value_in=10)
+        m.record_bytes('db', key_out=3)
+        snap = m.snapshot()
+        self.assertEqual(snap['rpcs'], { 'length': 1, 'get': 2 })
+        self.assertEqual(snap['probes'], 1)
+        self.assertEqual(snap['bytes'], { 'db': { 'key_out': 6, 'value_out': 0,
+            'key_in': 0, 'value_in': 10 } })
+        m.reset()
+        self.assertEqual(m.snapshot(), { 'ops': {}, 'rpcs': {}, 'probes': 0, 'bytes': {} })
+
+    def test_hooks(self):
+        m = SDSKVMetrics()
+        events = []
+        hook = lambda *args: events.append(args)
+        m.add_hook(hook)
+        m.record_op('db', 'put', 0.25)
+        m.remove_hook(hook)
+        m.record_op('db', 'put', 0.25)
+        self.assertEqual(events, [('db', 'put', 0.25, False)])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,174 @@
+# (C) 2018 The University of Chicago
+# See COPYRIGHT in top-level directory.
+import tempfile
+import shutil
+import threading
+import time
+import unittest
+from pymargo.core import Engine
+import pysdskv.server
+from pysdskv.server import SDSKVProvider
+from pysdskv.client import SDSKVClient
+from pysdskv.replicated import ReplicatedDatabase
+from pysdskv.retry import SDSKVTimeoutError
+
+class TestReplicated(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls._engine = Engine('tcp://127.0.0.1:1234')
+        cls._provider = SDSKVProvider(cls._engine, 1)
+        cls._path = tempfile.mkdtemp()
+        cls._db_names = ['replica0', 'replica1']
+        for name in cls._db_names:
+            cls._provider.attach_database(name, cls._path, pysdskv.server.stdmap)
+        cls._client = SDSKVClient(cls._engine)
+        cls._addr = str(cls._engine.addr())
+
+    @classmethod
+    def tearDownClass(cls):
+        del cls._client
+        del cls._provider
+        cls._engine.finalize()
+        shutil.rmtree(cls._path)
+
+    def _open(self, **kwargs):
+        return ReplicatedDatabase(TestReplicated._client,
+                [ (TestReplicated._addr, 1, name) for name in TestReplicated._db_names ], **kwargs)
+
+    def test_writes(self):
+        db = self._open()
+        db['test_replicated_key'] = 'value'
+        db.put_multi(['test_replicated_a', 'test_replicated_b'], ['a', 'b'])
+        for replica in db.replicas:
+            self.assertEqual(replica.get('test_replicated_key'), 'value')
+            self.assertEqual(replica.get_multi(['test_replicated_a', 'test_replicated_b']), ['a', 'b'])
+        del db['test_replicated_key']
+        db.erase_multi(['test_replicated_a', 'test_replicated_b'])
+        for replica in db.replicas:
+            self.assertFalse(replica.exists('test_replicated_key'))
+            self.assertEqual(replica.exists_multi(['test_replicated_a']), [False])
+
+    def test_reads(self):
+        db = self._open(hedge_percentile=None)
+        db.put_multi(['test_replicated_r{}'.format(i) for i in range(10)], ['v'] * 10)
+        for i in range(10):
+            self.assertEqual(db.get('test_replicated_r{}'.format(i)), 'v')
+        with self.assertRaises(KeyError):
+            db.get('test_replicated_missing')
+        self.assertEqual(db.length_multi(['test_replicated_r0', 'test_replicated_missing']), [1, 0])
+        self.assertEqual(db.list_keys(prefix='test_replicated_r', num_keys=3),
+                ['test_replicated_r0', 'test_replicated_r1', 'test_replicated_r2'])
+        stats = db.stats
+        # the missing key was looked up on both replicas
+        self.assertEqual(sum(s['reads'] for s in stats), 14)
+        self.assertEqual(sum(s['wins'] for s in stats), 12)
+        db.erase_multi(['test_replicated_r{}'.format(i) for i in range(10)])
+
+    def test_missing_on_one_replica(self):
+        db = self._open(hedge_percentile=None)
+        db.replicas[1].put('test_replicated_lagging', 'value')
+        for _ in range(2):
+            self.assertEqual(db.get('test_replicated_lagging'), 'value')
+        db.erase('test_replicated_lagging')
+
+    def test_put_multi_inflight(self):
+        db = self._open()
+        keys = ['test_replicated_i{}'.format(i) for i in range(64)]
+        db.put_multi(keys, ['v'] * 64, chunk_items=1, inflight=32)
+        for replica in db.replicas:
+            self.assertEqual(replica.exists_multi(keys), [True] * 64)
+        db.erase_multi(keys)
+
+    def test_hedging(self):
+        db = self._open(initial_hedge_delay=0.01)
+        db.put('test_replicated_hedge', 'value')
+        slow = db.replicas[0]
+        get = slow.get
+        release = threading.Event()
+        def slow_get(*args):
+            release.wait()
+            return get(*args)
+        slow.get = slow_get
+        try:
+            # replica 0 answers none of the reads until released: the first
+            # read completes by being hedged on replica 1, the next ones are
+            # sent to replica 1 first since the read pending on replica 0 is
+            # older than the latency of replica 1
+            for _ in range(4):
+                self.assertEqual(db.get('test_replicated_hedge'), 'value')
+            stats = db.stats
+            self.assertEqual(stats[1]['wins'], 4)
+            self.assertEqual(stats[1]['hedges'], 1)
+            self.assertEqual(stats[0]['reads'], 1)
+            self.assertEqual(stats[0]['pending'], 1)
+            self.assertEqual(stats[0]['wins'], 0)
+        finally:
+            release.set()
+        deadline = time.monotonic() + 10
+        while(db.stats[0]['mean_seconds'] is None and time.monotonic() < deadline):
+            time.sleep(0.01)
+        stats = db.stats
+        self.assertGreater(stats[0]['mean_seconds'], stats[1]['mean_seconds'])
+        db.erase('test_replicated_hedge')
+
+class FakeReplica():
+    """Replica answering from a dict, which hangs from a given read on."""
+
+    def __init__(self, data):
+        self.data = data
+        self.num_reads = 0
+        self.hang_from = None
+        self.release = threading.Event()
+        self.delay = 0.0
+
+    def get(self, key, value_size=0):
+        self.num_reads += 1
+        if(self.hang_from is not None and self.num_reads >= self.hang_from):
+            self.release.wait()
+        time.sleep(self.delay)
+        return self.data[key]
+
+class FakeClient():
+
+    def __init__(self):
+        self.replicas = {}
+
+    def open(self, addr, db_name, provider_id, **kwargs):
+        return self.replicas.setdefault(db_name, FakeReplica({ 'key': 'value' }))
+
+class TestWedgedReplica(unittest.TestCase):
+
+    def test_wedged_replica(self):
+        client = FakeClient()
+        db = ReplicatedDatabase(client, [ ('addr', 1, 'replica0'), ('addr', 1, 'replica1') ],
+                workers_per_replica=2, initial_hedge_delay=0.01, read_timeout=0.5)
+        # replica 0 is the fastest until its read #3 hangs
+        wedged = client.replicas['replica0']
+        wedged.hang_from = 3
+        client.replicas['replica1'].delay = 0.005
+        try:
+            start = time.monotonic()
+            for _ in range(50):
+                self.assertEqual(db.get('key'), 'value')
+            # replica 0 is demoted as soon as its pending read is older than
+            # the latency of replica 1, and no longer asked once its 2 threads
+            # are stuck, instead of delaying every read by the hedge delay
+            self.assertLess(time.monotonic() - start, 2.0)
+            stats = db.stats
+            self.assertGreaterEqual(wedged.num_reads, 3)
+            self.assertIn(stats[0]['pending'], (1, 2))
+            self.assertEqual(wedged.num_reads, 2 + stats[0]['pending'])
+            self.assertEqual(stats[0]['wins'] + stats[1]['wins'], 50)
+            # with both replicas wedged, reads time out instead of hanging
+            client.replicas['replica1'].hang_from = 0
+            start = time.monotonic()
+            with self.assertRaises(SDSKVTimeoutError):
+                db.get('key')
+            self.assertLess(time.monotonic() - start, 2.0)
+        finally:
+            wedged.release.set()
+            client.replicas['replica1'].release.set()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,26 @@
+import unittest
+from pysdskv.retry import RetryPolicy, SDSKVTimeoutError
+
+class TestRetry(unittest.TestCase):
+
+    def test_should_retry(self):
+        policy = RetryPolicy(max_attempts=3)
+        self.assertTrue(policy.should_retry(SDSKVTimeoutError(), 1))
+        self.assertTrue(policy.should_retry(SDSKVTimeoutError(), 2))
+        self.assertFalse(policy.should_retry(SDSKVTimeoutError(), 3))
+        self.assertFalse(policy.should_retry(KeyError('key'), 1))
+        policy = RetryPolicy(retry_on=(SDSKVTimeoutError, RuntimeError))
+        self.assertTrue(policy.should_retry(RuntimeError(), 1))
+        with self.assertRaises(ValueError):
+            RetryPolicy(max_attempts=0)
+
+    def test_delay(self):
+        policy = RetryPolicy(backoff=0.01, multiplier=2.0, max_backoff=0.05, jitter=0.0)
+        self.assertEqual([ policy.delay(n) for n in range(1, 5) ], [0.01, 0.02, 0.04, 0.05])
+        policy = RetryPolicy(backoff=0.1, jitter=0.5)
+        for _ in range(100):
+            self.assertTrue(0.05 <= policy.delay(1) <= 0.15)
+        self.assertTrue(issubclass(SDSKVTimeoutError, TimeoutError))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,6 @@
 import sys
 import os
+import json
 import tempfile
 import shutil
 import unittest
@@ -40,6 +41,100 @@ class TestServer(unittest.TestCase):
         provider.remove_all_databases()
         self.assertEqual(len(provider.databases), 0)
         shutil.rmtree(path)
+    def test_stats(self):
+        provider = SDSKVProvider(TestServer._engine, 3)
+        path = tempfile.mkdtemp()
+        db_id1 = provider.attach_database("mydatabase1", path, pysdskv.server.leveldb)
+        db_id2 = provider.attach_database("mydatabase2", path, pysdskv.server.stdmap)
+        stats = provider.stats(count_keys=True)
+        self.assertEqual([ s['id'] for s in stats ], [db_id1, db_id2])
+        self.assertEqual(stats[0]['name'], "mydatabase1")
+        self.assertEqual(stats[0]['type'], "leveldb")
+        self.assertEqual(stats[1]['type'], "map")
+        self.assertEqual(stats[1]['num_keys'], 0)
+        self.assertTrue(stats[1]['complete'])
+        self.assertEqual(stats[1]['size'], 0)
+        self.assertIsNone(stats[1]['rates'])
+        self.assertIsNotNone(provider.stats(db_id2, count_keys=True)['rates'])
+        self.assertIsNone(provider.stats(db_id1)['num_keys'])
+        self.assertEqual(provider.counters['attached'], 2)
+        provider.remove_all_databases()
+        shutil.rmtree(path)
+
+    def test_stats_max_keys(self):
+        provider = SDSKVProvider(TestServer._engine, 7, max_scan_keys=8)
+        db_id = provider.attach_database("scanned", "", pysdskv.server.stdmap)
+        from pysdskv.client import SDSKVClient
+        client = SDSKVClient(TestServer._engine)
+        db = client.open(str(TestServer._engine.addr()), "scanned", 7)
+        db.put_multi([ 'key{:02d}'.format(i) for i in range(10) ], [ 'v' ] * 10)
+        stats = provider.stats(db_id, count_keys=True, max_keys=4)
+        self.assertEqual(stats['num_keys'], 4)
+        self.assertFalse(stats['complete'])
+        self.assertIsNone(stats['rates'])
+        # the provider's limit applies to the callers without one
+        self.assertEqual(db.stats(count_keys=True)['num_keys'], 8)
+        stats = provider.stats(db_id, count_keys=True, max_keys=20)
+        self.assertEqual(stats['num_keys'], 8)
+        self.assertFalse(stats['complete'])
+        db.erase_multi([ 'key{:02d}'.format(i) for i in range(2, 10) ])
+        stats = provider.stats(db_id, count_keys=True)
+        self.assertEqual(stats['num_keys'], 2)
+        self.assertTrue(stats['complete'])
+        del db
+        del client
+        provider.remove_all_databases()
+
+    def test_database_options(self):
+        provider = SDSKVProvider(TestServer._engine, 4, num_xstreams=1)
+        db_id = provider.attach_database("reversed", "", 'map',
+                comparator='reverse', no_overwrite=True)
+        info = provider.stats(db_id)
+        self.assertEqual(info['type'], "map")
+        self.assertEqual(info['comparator'], "reverse")
+        self.assertTrue(info['no_overwrite'])
+        from pysdskv.client import SDSKVClient
+        client = SDSKVClient(TestServer._engine)
+        db = client.open(str(TestServer._engine.addr()), "reversed", 4)
+        db.put_multi(['a', 'b', 'c'], ['1', '2', '3'])
+        self.assertEqual(db.list_keys(num_keys=3), ['c', 'b', 'a'])
+        # ranges are bounded bytewise on the client side
+        self.assertEqual(db.comparator, 'reverse')
+        self.assertEqual(list(db.keys(keys_per_request=2)), ['c', 'b', 'a'])
+        self.assertEqual(list(db.parallel_scan(1, include_values=False)), ['c', 'b', 'a'])
+        with self.assertRaises(ValueError):
+            db.keys(start='b')
+        with self.assertRaises(ValueError):
+            db.items(end='b')
+        with self.assertRaises(ValueError):
+            db.erase_range('c', 'a')
+        with self.assertRaises(ValueError):
+            db.parallel_scan(['b'])
+        with self.assertRaises(ValueError):
+            db.copy_to(db, start='b')
+        del db
+        del client
+        with self.assertRaises(ValueError):
+            provider.attach_database("bad", "", 'unknown')
+        with self.assertRaises(ValueError):
+            SDSKVProvider(TestServer._engine, 5, pool=object(), num_xstreams=1)
+        provider.remove_all_databases()
+
+    def test_attach_from_config(self):
+        provider = SDSKVProvider(TestServer._engine, 6)
+        path = tempfile.mkdtemp()
+        config = { 'databases': [
+            { 'name': 'config_db{}'.format(i), 'path': path, 'type': 'leveldb' } for i in range(5)
+        ] + [ { 'name': 'config_map', 'comparator': 'uint64' } ] }
+        ids = provider.attach_from_config(json.dumps(config))
+        self.assertEqual(sorted(ids), sorted([ 'config_db{}'.format(i) for i in range(5) ] + ['config_map']))
+        self.assertEqual(sorted(ids.values()), sorted(provider.databases))
+        self.assertEqual(provider.stats(ids['config_map'], count_keys=False)['comparator'], 'uint64')
+        with self.assertRaises(ValueError):
+            provider.attach_from_config({ 'databases': [ { 'path': path } ] })
+        provider.remove_all_databases()
+        shutil.rmtree(path)
+
 
 if __name__ == '__main__':
     unittest.main()
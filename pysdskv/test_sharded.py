@@ -0,0 +1,62 @@
+import tempfile
+import shutil
+import unittest
+from pymargo.core import Engine
+import pysdskv.server
+from pysdskv.server import SDSKVProvider
+from pysdskv.client import SDSKVClient
+from pysdskv.sharded import ShardedDatabase
+
+class TestSharded(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls._engine = Engine('tcp://127.0.0.1:1234')
+        cls._provider = SDSKVProvider(cls._engine, 1)
+        cls._path = tempfile.mkdtemp()
+        cls._db_names = ['shard0', 'shard1', 'shard2']
+        for name in cls._db_names:
+            cls._provider.attach_database(name, cls._path, pysdskv.server.stdmap)
+        cls._client = SDSKVClient(cls._engine)
+        addr = str(cls._engine.addr())
+        cls._db = ShardedDatabase(cls._client, [ (addr, 1, name) for name in cls._db_names ])
+
+    @classmethod
+    def tearDownClass(cls):
+        del cls._db
+        del cls._client
+        del cls._provider
+        cls._engine.finalize()
+        shutil.rmtree(cls._path)
+
+    def test_routing(self):
+        db = TestSharded._db
+        keys = ['key{}'.format(i) for i in range(300)]
+        counts = [0, 0, 0]
+        for k in keys:
+            counts[db.shard_index(k)] += 1
+            self.assertEqual(db.shard_index(k), db.shard_index(k.encode()))
+        for c in counts:
+            self.assertGreater(c, 0)
+
+    def test_put_get(self):
+        db = TestSharded._db
+        db['test_sharded_key'] = 'value'
+        self.assertEqual(db['test_sharded_key'], 'value')
+        self.assertTrue(db.shard('test_sharded_key').exists('test_sharded_key'))
+        del db['test_sharded_key']
+        self.assertFalse(db.exists('test_sharded_key'))
+
+    def test_multi(self):
+        db = TestSharded._db
+        keys = ['test_sharded_multi_{}'.format(i) for i in range(100)]
+        vals = ['value{}'.format(i) for i in range(100)]
+        db.put_multi(keys, vals)
+        self.assertEqual(db.get_multi(keys), vals)
+        self.assertEqual(db.length_multi(keys), [len(v) for v in vals])
+        db.erase_multi(keys)
+        for k in keys[:10]:
+            self.assertFalse(db.exists(k))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+from pysdskv.sizing import SizeHintPolicy
+
+class TestSizeHintPolicy(unittest.TestCase):
+
+    def test_no_hint_before_min_samples(self):
+        policy = SizeHintPolicy(min_samples=4)
+        for i in range(3):
+            policy.record_value('key', 100)
+            self.assertEqual(policy.value_hint('key'), 0)
+        policy.record_value('key', 100)
+        self.assertEqual(policy.value_hint('key'), 125)
+
+    def test_percentile(self):
+        policy = SizeHintPolicy(percentile=0.9, slack=1.0, min_samples=1, window=100)
+        for size in range(1, 101):
+            policy.record_value(None, size)
+        self.assertEqual(policy.value_hint(), 91)
+
+    def test_max_hint(self):
+        policy = SizeHintPolicy(min_samples=1, max_hint=64)
+        policy.record_value(None, 1000)
+        self.assertEqual(policy.value_hint(), 64)
+
+    def test_prefixes(self):
+        policy = SizeHintPolicy(slack=1.0, min_samples=2, prefix_length=2)
+        for i in range(4):
+            policy.record_value('a:{}'.format(i), 10)
+            policy.record_value('b:{}'.format(i), 1000)
+        self.assertEqual(policy.value_hint('a:x'), 10)
+        self.assertEqual(policy.value_hint('b:x'), 1000)
+        self.assertEqual(policy.value_hint('c:x'), 1000)
+
+    def test_key_hint(self):
+        policy = SizeHintPolicy(slack=1.0, min_samples=1)
+        self.assertEqual(policy.key_hint(), 0)
+        policy.record_key(12)
+        self.assertEqual(policy.key_hint(), 12)
+
+    def test_stats(self):
+        policy = SizeHintPolicy()
+        policy.record_hit()
+        policy.record_hit()
+        policy.record_miss()
+        policy.record_probe()
+        stats = policy.stats
+        self.assertEqual(stats['hits'], 2)
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['probes'], 1)
+        self.assertEqual(stats['hit_rate'], 0.5)
+        policy.reset_stats()
+        self.assertEqual(policy.stats['hits'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
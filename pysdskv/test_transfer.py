@@ -0,0 +1,89 @@
+import os
+import json
+import tempfile
+import shutil
+import unittest
+from pymargo.core import Engine
+import pysdskv.server
+from pysdskv.server import SDSKVProvider
+from pysdskv.client import SDSKVClient
+
+class TestTransfer(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls._engine = Engine('tcp://127.0.0.1:1234')
+        cls._provider = SDSKVProvider(cls._engine, 1)
+        cls._path = tempfile.mkdtemp()
+        for name in ['source', 'dest']:
+            cls._provider.attach_database(name, cls._path, pysdskv.server.stdmap)
+        cls._client = SDSKVClient(cls._engine)
+        addr = str(cls._engine.addr())
+        cls._source = cls._client.open(addr, 'source', 1)
+        cls._dest = cls._client.open(addr, 'dest', 1)
+
+    @classmethod
+    def tearDownClass(cls):
+        del cls._source
+        del cls._dest
+        del cls._client
+        del cls._provider
+        cls._engine.finalize()
+        shutil.rmtree(cls._path)
+
+    def setUp(self):
+        self._keys = ['key{:03d}'.format(i) for i in range(200)]
+        self._vals = ['val{}'.format(i) for i in range(200)]
+        TestTransfer._source.put_multi(self._keys, self._vals)
+
+    def tearDown(self):
+        TestTransfer._source.erase_multi(self._keys)
+        TestTransfer._dest.erase_multi(self._keys)
+
+    def test_copy(self):
+        source, dest = TestTransfer._source, TestTransfer._dest
+        reports = []
+        stats = source.copy_to(dest, boundaries=['key050', 'key100', 'key150'],
+                workers=2, keys_per_request=16, progress=reports.append)
+        self.assertEqual(stats['records'], 200)
+        self.assertEqual(stats['ranges_done'], 4)
+        self.assertGreater(len(reports), 0)
+        self.assertEqual(dest.get_multi(self._keys), self._vals)
+        self.assertEqual(source.get_multi(self._keys), self._vals)
+
+    def test_resume(self):
+        source, dest = TestTransfer._source, TestTransfer._dest
+        checkpoint = os.path.join(TestTransfer._path, 'checkpoint.json')
+        def interrupt(stats):
+            if(stats['records'] >= 40):
+                raise RuntimeError('interrupted')
+        with self.assertRaises(RuntimeError):
+            source.copy_to(dest, boundaries=4, workers=1, keys_per_request=16,
+                    checkpoint=checkpoint, progress=interrupt)
+        with open(checkpoint) as f:
+            # all the keys are in the second range, which was interrupted
+            self.assertIsNot(json.load(f)['state'][1], True)
+        stats = source.copy_to(dest, boundaries=4, workers=1, keys_per_request=16,
+                checkpoint=checkpoint)
+        self.assertLessEqual(stats['records'], 160 + 16)
+        self.assertEqual(dest.get_multi(self._keys), self._vals)
+        os.remove(checkpoint)
+
+    def test_prefix_and_start(self):
+        source, dest = TestTransfer._source, TestTransfer._dest
+        # start is outside of the prefix, only the keys matching it are copied
+        stats = source.copy_to(dest, prefix='key1', start='key000', keys_per_request=16)
+        self.assertEqual(stats['records'], 100)
+        self.assertFalse(dest.exists('key000'))
+        self.assertEqual(dest.list_keys(num_keys=200), self._keys[100:])
+
+    def test_rebalance(self):
+        source, dest = TestTransfer._source, TestTransfer._dest
+        stats = source.rebalance(dest, start='key050', end='key100', keys_per_request=16)
+        self.assertEqual(stats['records'], 50)
+        self.assertEqual(dest.list_keys(num_keys=100), self._keys[50:100])
+        self.assertFalse(source.exists('key050'))
+        self.assertTrue(source.exists('key100'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,165 @@
+# (C) 2018 The University of Chicago
+# See COPYRIGHT in top-level directory.
+import bisect
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from .client import _as_bytes
+
+
+class SDSKVTransfer():
+    """
+    The SDSKVTransfer copies the entries of a key range of a database into
+    another database, possibly held by another provider, using list_keyvals
+    and put_multi. It is created by SDSKVDatabase.copy_to() and rebalance().
+
+    The range is split into sub-ranges [lo, hi) copied concurrently, each
+    worker holding at most one page of entries. The progress of each
+    sub-range (last key copied) can be saved in a checkpoint file after each
+    page, so that an interrupted transfer resumes where it stopped.
+    """
+
+    VERSION = 1
+
+    def __init__(self, source, dest, boundaries=1, prefix='', start=None, end=None,
+            workers=4, keys_per_request=1024, key_size=0, val_size=0,
+            checkpoint=None, progress=None, erase_source=False):
+        """
+        Constructor. Should not be called by users.
+        Users should call copy_to() or rebalance() on the Database instance.
+        """
+        self._source = source
+        self._dest = dest
+        self._prefix = _as_bytes(source._encode_bound(prefix))
+        lo = self._prefix if start is None else source._key_bytes(start)
+        hi = None if end is None else source._key_bytes(end)
+        splits = source._split_keys(boundaries, self._prefix)
+        if(start is not None or end is not None or len(splits) != 0):
+            source._check_bytewise('copying a range of keys')
+        splits = [ b for b in splits if b > lo and (hi is None or b < hi) ]
+        self._ranges = list(zip([ lo ] + splits, splits + [ hi ]))
+        self._workers = workers
+        self._keys_per_request = keys_per_request
+        self._key_size = key_size
+        self._val_size = val_size
+        self._checkpoint = checkpoint
+        self._progress = progress
+        self._erase_source = erase_source
+        self._lock = threading.Lock()
+        self._stop = False
+        self._records = 0
+        self._bytes = 0
+        self._start_time = None
+        # per range: None (not started), last key copied (bytes), or True (done)
+        self._state = self._load_checkpoint()
+
+    def _load_checkpoint(self):
+        if(self._checkpoint is None or not os.path.exists(self._checkpoint)):
+            return [ None ] * len(self._ranges)
+        with open(self._checkpoint) as f:
+            saved = json.load(f)
+        ranges = [ [ lo.hex(), None if hi is None else hi.hex() ] for lo, hi in self._ranges ]
+        if(saved.get('version') != self.VERSION or saved.get('ranges') != ranges):
+            raise ValueError("checkpoint {} was created for different ranges".format(self._checkpoint))
+        return [ s if s is None or s is True else bytes.fromhex(s) for s in saved['state'] ]
+
+    def _save_checkpoint(self):
+        """Writes the checkpoint file (called with the lock held)."""
+        if(self._checkpoint is None):
+            return
+        saved = {
+            'version': self.VERSION,
+            'source': self._source.name,
+            'dest': self._dest.name,
+            'ranges': [ [ lo.hex(), None if hi is None else hi.hex() ] for lo, hi in self._ranges ],
+            'state': [ s if s is None or s is True else s.hex() for s in self._state ]
+        }
+        tmp = self._checkpoint + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(saved, f)
+        os.replace(tmp, self._checkpoint)
+
+    @property
+    def stats(self):
+        """
+        Dictionary with the number of records and bytes (keys and values) copied
+        by this run, the elapsed time, the throughput, and the number of ranges done.
+        """
+        with self._lock:
+            seconds = 0.0
+            if(self._start_time is not None):
+                seconds = time.monotonic() - self._start_time
+            return {
+                'records': self._records,
+                'bytes': self._bytes,
+                'seconds': seconds,
+                'records_per_second': self._records / seconds if seconds > 0 else 0.0,
+                'bytes_per_second': self._bytes / seconds if seconds > 0 else 0.0,
+                'ranges_done': sum(1 for s in self._state if s is True),
+                'ranges_total': len(self._ranges)
+            }
+
+    def run(self):
+        """Copies the ranges not done yet and returns the final statistics."""
+        self._start_time = time.monotonic()
+        pending = [ i for i, s in enumerate(self._state) if s is not True ]
+        if(len(pending) != 0):
+            with ThreadPoolExecutor(max_workers=self._workers) as executor:
+                futures = [ executor.submit(self._copy_range, i) for i in pending ]
+                try:
+                    for f in futures:
+                        f.result()
+                except BaseException:
+                    self._stop = True
+                    raise
+        return self.stats
+
+    def _copy_range(self, index):
+        source = self._source
+        lo, hi = self._ranges[index]
+        after = self._state[index]
+        if(after is None and hi is not None and lo >= hi):
+            after = True
+        if(after is None):
+            after = lo
+            # listing starts strictly after lo, which belongs to the range
+            # if it matches the prefix (start may be outside of it)
+            if(len(lo) != 0 and lo.startswith(self._prefix)):
+                val = source._get_stored(lo)
+                if(val is not None):
+                    self._write(index, [ lo ], [ val ])
+        while(after is not True and not self._stop):
+            keys, vals = source._list_keyvals(after, self._prefix, self._keys_per_request,
+                    self._key_size, self._val_size)
+            done = len(keys) < self._keys_per_request
+            if(hi is not None and len(keys) != 0 and keys[-1] >= hi):
+                count = bisect.bisect_left(keys, hi)
+                keys = keys[:count]
+                vals = vals[:count]
+                done = True
+            if(len(keys) != 0):
+                self._write(index, keys, vals)
+                after = keys[-1]
+            if(done):
+                break
+        if(not self._stop):
+            with self._lock:
+                self._state[index] = True
+                self._save_checkpoint()
+
+    def _write(self, index, keys, vals):
+        self._dest._put_multi(keys, vals)
+        if(self._erase_source):
+            self._source._erase_multi(keys)
+        with self._lock:
+            self._records += len(keys)
+            self._bytes += sum(map(len, keys)) + sum(map(len, vals))
+            self._state[index] = keys[-1]
+            self._save_checkpoint()
+        if(self._progress is not None):
+            self._progress(self.stats)
+
+
+Transfer = SDSKVTransfer